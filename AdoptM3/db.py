@@ -0,0 +1,70 @@
+"""
+Gerenciamento das conexões com o banco, aplicado em settings.DATABASES.
+
+- Conexões persistentes (CONN_MAX_AGE): o worker reaproveita a conexão TLS
+  entre requisições em vez de abrir uma nova a cada uma.
+- Health checks (CONN_HEALTH_CHECKS): uma conexão reaproveitada é testada no
+  início da requisição e reaberta se o servidor/pooler a derrubou.
+- Modo do pooler (DB_POOL_MODE):
+    session      conexão direta ou pooler em modo sessão (Supabase porta 5432)
+    transaction  pooler em modo transação (PgBouncer/Supavisor, porta 6543):
+                 sem cursores nomeados nem parâmetros de sessão, que não
+                 sobrevivem à troca de conexão do servidor entre transações
+- statement_timeout: no modo sessão vai nos parâmetros de conexão; no modo
+  transação deve ser definido no papel do banco
+  (ALTER ROLE ... SET statement_timeout = '30s').
+
+Execute `python benchmarks/db_connections.py` para medir o custo por requisição.
+"""
+import os
+
+POOL_MODES = ('session', 'transaction')
+
+
+def _env_bool(name, default):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes')
+
+
+def connection_options():
+    """Parâmetros de conexão lidos do ambiente (com defaults para produção)"""
+    pool_mode = os.environ.get('DB_POOL_MODE', 'session').lower()
+    if pool_mode not in POOL_MODES:
+        raise ValueError('DB_POOL_MODE deve ser um de: {}'.format(', '.join(POOL_MODES)))
+    return {
+        'conn_max_age': int(os.environ.get('DB_CONN_MAX_AGE', '600')),
+        'health_checks': _env_bool('DB_CONN_HEALTH_CHECKS', True),
+        'pool_mode': pool_mode,
+        'statement_timeout_ms': int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', '30000')),
+        'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', '5')),
+    }
+
+
+def configure_database(config, conn_max_age=600, health_checks=True, pool_mode='session',
+                       statement_timeout_ms=30000, connect_timeout=5):
+    """Aplica a política de conexões a um item de DATABASES (retorna o próprio dict)"""
+    config['CONN_MAX_AGE'] = conn_max_age
+    config['CONN_HEALTH_CHECKS'] = health_checks and conn_max_age != 0
+
+    if 'postgresql' not in config.get('ENGINE', ''):
+        return config
+
+    options = config.setdefault('OPTIONS', {})
+    options.setdefault('connect_timeout', connect_timeout)
+    # Detecta conexões mortas (NAT/pooler remoto) sem esperar o timeout do TCP
+    options.setdefault('keepalives', 1)
+    options.setdefault('keepalives_idle', 60)
+    options.setdefault('keepalives_interval', 10)
+    options.setdefault('keepalives_count', 3)
+    if config.get('HOST') not in (None, '', 'localhost', '127.0.0.1'):
+        options.setdefault('sslmode', 'require')
+
+    if pool_mode == 'transaction':
+        # Cursores nomeados (.iterator()) exigem a mesma conexão do servidor
+        # durante toda a iteração; o pooler em modo transação não garante isso.
+        # O psycopg2 não usa prepared statements, então nada mais a desativar.
+        config['DISABLE_SERVER_SIDE_CURSORS'] = True
+    elif statement_timeout_ms:
+        options['options'] = '{} -c statement_timeout={}'.format(
+            options.get('options', ''), statement_timeout_ms
+        ).strip()
+    return config
@@ -11,8 +11,11 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 import os
+import sys
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -47,14 +50,18 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'debug_toolbar.middleware.DebugToolbarMiddleware',  # Django Debug Toolbar - deve estar no topo
+    'records.middleware.MetricsMiddleware',  # Métricas por view em /metrics (records/metrics.py)
+    'records.middleware.QueryWatchMiddleware',  # N+1 e queries lentas no log (records/querywatch.py)
     'django.middleware.security.SecurityMiddleware',
+    'records.middleware.ReplicaRoutingMiddleware',  # Leituras na réplica / principal após escrita (records/routers.py)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    # 'records.middleware.GroupMiddleware',  # Comentado temporariamente
+    'records.middleware.GroupMiddleware',  # Grupo do usuário vem do cache (records/groups.py)
+    'records.middleware.CachePolicyMiddleware',  # Páginas em cache conforme CACHE_POLICIES
 ]
 
 ROOT_URLCONF = 'AdoptM3.urls'
@@ -75,6 +82,17 @@ TEMPLATES = [
     },
 ]
 
+# Em produção os templates compilados ficam em memória (loader em cache);
+# em desenvolvimento o Django recarrega os arquivos alterados.
+if not DEBUG:
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'AdoptM3.wsgi.application'
 
 
@@ -123,6 +141,83 @@ else:
         }
 
 
+# Réplica de leitura (records/routers.py): listas e painel leem dela nos GETs.
+# Localmente: REPLICA_DATABASE_URL=sqlite:///replica.sqlite3 + manage.py sync_replica
+if os.environ.get('REPLICA_DATABASE_URL'):
+    import dj_database_url
+    DATABASES['replica'] = dj_database_url.parse(os.environ['REPLICA_DATABASE_URL'])
+    # Nos testes a réplica é o próprio banco de teste
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['records.routers.ReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', '15'))  # leituras no principal após uma escrita
+
+
+# Conexões persistentes, health checks, modo do pooler e statement_timeout
+# (AdoptM3/db.py). Variáveis: DB_CONN_MAX_AGE, DB_CONN_HEALTH_CHECKS,
+# DB_POOL_MODE (session/transaction), DB_STATEMENT_TIMEOUT_MS, DB_CONNECT_TIMEOUT.
+from AdoptM3.db import configure_database, connection_options
+
+DATABASE_CONNECTION_OPTIONS = connection_options()
+for database in DATABASES.values():
+    configure_database(database, **DATABASE_CONNECTION_OPTIONS)
+
+
+# Cache
+# CACHE_URL escolhe o backend:
+#   redis://host:6379/0  -> compartilhado entre as instâncias (Memorystore/Redis; requer o pacote redis)
+#   file:///caminho      -> arquivos locais (sobrevive a reinícios do worker)
+#   locmem://            -> memória do processo (desenvolvimento e testes)
+# Sem CACHE_URL: locmem em desenvolvimento. Em produção é obrigatório: com várias
+# instâncias um cache local deixa as versões (cards, galeria, estatísticas) e as
+# páginas em cache diferentes em cada uma, e as invalidações só valem para uma.
+# Para uma única instância, file:///tmp/adoptm3-cache precisa ser explícito.
+CACHE_URL = os.environ.get('CACHE_URL', 'locmem://' if DEBUG else '')
+if not CACHE_URL:
+    raise ImproperlyConfigured(
+        'Defina CACHE_URL em produção (ex.: redis://10.0.0.3:6379/0, ver app.yaml). '
+        'Um cache por instância só com CACHE_URL=file:///tmp/adoptm3-cache explícito.'
+    )
+
+if CACHE_URL.startswith(('redis://', 'rediss://')):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+elif CACHE_URL.startswith('file://'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_URL[len('file://'):],
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': CACHE_URL[len('locmem://'):] or 'adoptm3',
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+CACHES['default']['KEY_PREFIX'] = 'adoptm3'
+
+# Política de cache por view (records/cache_policy.py), pelo nome da URL.
+# 'anonymous': segundos da página inteira para visitantes (0 = não guardar);
+# 'authenticated': idem, guardada por usuário. As chaves incluem as marcas
+# d'água dos modelos exibidos, então alterações aparecem na hora; o tempo só
+# limita páginas sem modelos (About) e o uso de memória.
+CACHE_POLICIES = {
+    'pages-HomePage': {'anonymous': 60 * 10, 'authenticated': 60},
+    'pages-AboutPage': {'anonymous': 60 * 60, 'authenticated': 60 * 60},
+    'records:StateList': {'anonymous': 60 * 60, 'authenticated': 60 * 10},
+    'records:CityList': {'anonymous': 60 * 60, 'authenticated': 60 * 10},
+    'records:RelicList': {'anonymous': 60 * 10, 'authenticated': 60},
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -165,6 +260,47 @@ STATICFILES_DIRS = [BASE_DIR / 'static',]
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Arquivos enviados para importação e relatórios de erros (nomes, e-mails,
+# datas de nascimento): fora do MEDIA_ROOT, que é servido sem autenticação.
+# O relatório é baixado pelo admin (ImportRunAdmin.report_view).
+IMPORTS_ROOT = os.environ.get('IMPORTS_ROOT', os.path.join(BASE_DIR, 'private', 'imports'))
+
+# Fila de tarefas em segundo plano (records/tasks.py)
+# Em produção as tarefas são executadas por `python manage.py run_workers`;
+# sem worker (desenvolvimento) elas rodam no próprio processo após o commit.
+TASKS_EAGER = os.environ.get('TASKS_EAGER', str(DEBUG)).lower() in ('1', 'true', 'yes')
+
+# Variantes assíncronas de IndexView, ProfileView e RelicList (records/concurrency.py),
+# com as consultas independentes em paralelo. Só compensam servidas por ASGI
+# (perfil uvicorn em app.yaml); no WSGI cada requisição ganharia um event loop.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'false').lower() in ('1', 'true', 'yes')
+
+# Métricas por view (records/metrics.py), expostas em /metrics para o Prometheus.
+# Com METRICS_TOKEN definido o scraper envia "Authorization: Bearer <token>";
+# sem token só staff e INTERNAL_IPS têm acesso.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_MAX_VIEWS = 200  # views distintas guardadas; as demais vão para "other"
+
+# Detector de N+1 e queries lentas (records/querywatch.py)
+QUERY_WATCH_SAMPLE_RATE = float(os.environ.get('QUERY_WATCH_SAMPLE_RATE', '1.0' if DEBUG else '0.05'))
+QUERY_WATCH_THRESHOLD = 5  # repetições da mesma forma de query para considerar N+1
+QUERY_WATCH_STACK_DEPTH = 8
+SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS', '200'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'records.querywatch.JsonFormatter'},
+    },
+    'handlers': {
+        'queries': {'class': 'logging.StreamHandler', 'formatter': 'json'},
+    },
+    'loggers': {
+        'records.queries': {'handlers': ['queries'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -181,8 +317,14 @@ INTERNAL_IPS = [
     'localhost',
 ]
 
+# Os testes rodam com DEBUG=False e a toolbar se recusa a carregar: fica de fora
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+if TESTING:
+    INSTALLED_APPS.remove('debug_toolbar')
+    MIDDLEWARE.remove('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 # Configurações do Debug Toolbar
-if DEBUG:
+if DEBUG and not TESTING:
     DEBUG_TOOLBAR_CONFIG = {
         'SHOW_TOOLBAR_CALLBACK': lambda request: DEBUG,
         'INTERCEPT_REDIRECTS': False,
@@ -19,9 +19,13 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from pages.views import SignUpView
-from records.views import ProfileView
+from records.views import ApiDetailView, ApiListView, AsyncProfileView, ProfileView, metrics_view
 from debug_toolbar.toolbar import debug_toolbar_urls
 
+# Views assíncronas no perfil ASGI (settings.ASYNC_VIEWS)
+if settings.ASYNC_VIEWS:
+    ProfileView = AsyncProfileView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('pages.urls')),
@@ -29,6 +33,10 @@ urlpatterns = [
     path('accounts/', include('django.contrib.auth.urls')),  # Para login, logout, etc.
     path('accounts/signup/', SignUpView.as_view(), name='signup'),  # Signup padronizado
     path('accounts/profile/', ProfileView.as_view(), name='profile'),  # Profile na URL accounts
+    path('metrics', metrics_view, name='metrics'),  # Prometheus (records/metrics.py)
+    # API JSON somente leitura, versionada (records/api.py)
+    path('api/v1/<str:resource>/', ApiListView.as_view(), name='api-v1-list'),
+    path('api/v1/<str:resource>/<int:pk>/', ApiDetailView.as_view(), name='api-v1-detail'),
 ] + debug_toolbar_urls()  # Django Debug Toolbar
 
 # Adicionar suporte para arquivos de media em desenvolvimento
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+Latência (p50/p99) das views síncronas x assíncronas: IndexView, ProfileView e RelicList.
+
+Chama as views diretamente (sem middleware) com o usuário informado, no banco
+configurado em settings (defina DATABASE_URL para medir o PostgreSQL/pooler de
+produção: com SQLite local as consultas são rápidas demais para o paralelismo
+aparecer). As síncronas rodam em um pool de threads, como os workers gthread
+do gunicorn; as assíncronas no event loop, como no uvicorn, com as consultas
+independentes em paralelo (records/concurrency.py). --cold limpa o cache antes
+de cada requisição, para medir as consultas e não o cache.
+
+Execute:
+    python benchmarks/async_views.py --user admin
+    DATABASE_URL=postgres://... python benchmarks/async_views.py --requests 300 --concurrency 8 --cold
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import django
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'AdoptM3.settings')
+django.setup()
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory
+
+from pages.views import AsyncIndexView, IndexView
+from records.views import AsyncProfileView, AsyncRelicList, ProfileView, RelicList
+
+PAGES = [
+    ('index', '/', IndexView, AsyncIndexView),
+    ('perfil', '/accounts/profile/', ProfileView, AsyncProfileView),
+    ('lista de relíquias', '/records/list/relic', RelicList, AsyncRelicList),
+]
+
+
+def make_request(path, user):
+    request = RequestFactory().get(path)
+    request.user = user
+    return request
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return timings[len(timings) // 2], timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+
+
+def run_sync(view, path, user, requests, concurrency, cold):
+    def one(_):
+        if cold:
+            cache.clear()
+        started = time.perf_counter()
+        view(make_request(path, user)).render()
+        return (time.perf_counter() - started) * 1000
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        return list(executor.map(one, range(requests)))
+
+
+async def run_async(view, path, user, requests, concurrency, cold):
+    semaphore = asyncio.Semaphore(concurrency)
+    render = sync_to_async(lambda response: response.render())
+
+    async def one():
+        async with semaphore:
+            if cold:
+                cache.clear()
+            started = time.perf_counter()
+            # Como no handler ASGI: a view no event loop, o template em uma thread
+            await render(await view(make_request(path, user)))
+            return (time.perf_counter() - started) * 1000
+
+    return await asyncio.gather(*(one() for _ in range(requests)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--user', default=None, help='Usuário das requisições (default: primeiro superusuário)')
+    parser.add_argument('--requests', type=int, default=100, help='Requisições por view e modo (default: 100)')
+    parser.add_argument('--concurrency', type=int, default=4, help='Requisições simultâneas (default: 4)')
+    parser.add_argument('--cold', action='store_true', help='Limpar o cache antes de cada requisição')
+    options = parser.parse_args()
+
+    users = User.objects.filter(username=options.user) if options.user else User.objects.filter(is_superuser=True)
+    user = users.order_by('pk').first()
+    if user is None:
+        sys.exit('Usuário não encontrado: informe --user.')
+
+    settings_dict = connection.settings_dict
+    print(f"Banco: {settings_dict['ENGINE'].rsplit('.', 1)[-1]} {settings_dict.get('HOST') or settings_dict['NAME']}")
+    print(f'Usuário: {user.username}  requisições: {options.requests}  concorrência: {options.concurrency}'
+          f"{'  (cache limpo a cada requisição)' if options.cold else ''}\n")
+
+    print(f'{"VIEW":<20} {"SYNC P50":>9} {"SYNC P99":>9} {"ASYNC P50":>10} {"ASYNC P99":>10}')
+    print('-' * 62)
+    for label, path, sync_view, async_view in PAGES:
+        # Uma requisição de aquecimento por modo (conexões, templates, cache)
+        run_sync(sync_view.as_view(), path, user, 1, 1, options.cold)
+        asyncio.run(run_async(async_view.as_view(), path, user, 1, 1, options.cold))
+
+        sync_p50, sync_p99 = percentiles(run_sync(
+            sync_view.as_view(), path, user, options.requests, options.concurrency, options.cold
+        ))
+        async_p50, async_p99 = percentiles(asyncio.run(run_async(
+            async_view.as_view(), path, user, options.requests, options.concurrency, options.cold
+        )))
+        print(f'{label:<20} {sync_p50:>9.2f} {sync_p99:>9.2f} {async_p50:>10.2f} {async_p99:>10.2f}')
+    print('\nTempos em ms.')
+
+
+if __name__ == "__main__":
+    main()
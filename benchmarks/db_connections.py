@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+Custo de conexão por requisição: conexões novas x persistentes.
+
+Simula o ciclo de requisições do gunicorn (sinais request_started/finished,
+que fecham ou reaproveitam a conexão conforme CONN_MAX_AGE) executando uma
+query simples por "requisição", contra o banco configurado em settings
+(defina DATABASE_URL para medir o pooler de produção).
+
+Execute:
+    python benchmarks/db_connections.py
+    DATABASE_URL=postgres://... python benchmarks/db_connections.py --requests 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import django
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'AdoptM3.settings')
+django.setup()
+
+from django.core.signals import request_finished, request_started
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+
+def run(requests, conn_max_age, health_checks):
+    connection.close()
+    connection.settings_dict['CONN_MAX_AGE'] = conn_max_age
+    connection.settings_dict['CONN_HEALTH_CHECKS'] = health_checks
+
+    connects = []
+    counter = lambda **kwargs: connects.append(1)
+    connection_created.connect(counter)
+    timings = []
+    try:
+        for _ in range(requests):
+            started = time.perf_counter()
+            request_started.send(sender=None)
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+            request_finished.send(sender=None)
+            timings.append((time.perf_counter() - started) * 1000)
+    finally:
+        connection_created.disconnect(counter)
+        connection.close()
+
+    timings.sort()
+    return {
+        'connects': len(connects),
+        'mean': statistics.mean(timings),
+        'p50': timings[len(timings) // 2],
+        'p95': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=200, help='Requisições simuladas por cenário (default: 200)')
+    options = parser.parse_args()
+
+    configured = dict(connection.settings_dict)
+    settings_dict = connection.settings_dict
+    print(f"Banco: {settings_dict['ENGINE'].rsplit('.', 1)[-1]} {settings_dict.get('HOST') or settings_dict['NAME']}")
+    print(f"Configurado: CONN_MAX_AGE={configured['CONN_MAX_AGE']} "
+          f"CONN_HEALTH_CHECKS={configured['CONN_HEALTH_CHECKS']}\n")
+
+    scenarios = [
+        ('conexão nova por requisição', 0, False),
+        ('persistente', configured['CONN_MAX_AGE'] or 600, False),
+        ('persistente + health check', configured['CONN_MAX_AGE'] or 600, True),
+    ]
+    print(f'{"CENÁRIO":<30} {"CONEXÕES":>9} {"MÉDIA ms":>9} {"P50 ms":>9} {"P95 ms":>9}')
+    print('-' * 70)
+    results = []
+    for label, conn_max_age, health_checks in scenarios:
+        result = run(options.requests, conn_max_age, health_checks)
+        results.append(result)
+        print(f"{label:<30} {result['connects']:>9} {result['mean']:>9.3f} {result['p50']:>9.3f} {result['p95']:>9.3f}")
+
+    saved = results[0]['mean'] - results[2]['mean']
+    print(f'\nEconomia por requisição com conexões persistentes (com health check): {saved:.3f} ms')
+
+
+if __name__ == "__main__":
+    main()
@@ -1,101 +1,297 @@
 #!/usr/bin/env python
 """
-Script para testar e visualizar queries do Django para verificar otimizações.
-Execute: python debug_queries.py
+Benchmark de queries das views (orçamento de queries por página).
+
+Renderiza todas as URLs de records/urls.py e pages/urls.py com o test client,
+em um banco de teste populado por `populate_db --bulk`, e registra para cada
+view: número de queries, tempo de SQL, tempo total e pico de memória.
+O resultado é gravado em JSON e comparado com o baseline versionado em
+benchmarks/baseline.json: se uma view passar a fazer mais queries (N+1) ou
+mudar de status, o script termina com erro.
+
+Execute:
+    python debug_queries.py                          # compara com o baseline
+    python debug_queries.py --update-baseline        # grava um novo baseline
+    python debug_queries.py --relics 100000 --output resultado.json
 """
+import argparse
+import json
 import os
+import platform
+import statistics
 import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from importlib import import_module
+from io import StringIO
+from pathlib import Path
+
 import django
-from django.conf import settings
-from django.db import connection, reset_queries
 
 # Configurar o ambiente Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'AdoptM3.settings')
 django.setup()
 
-def test_queries():
-    """Testa as queries das principais views otimizadas"""
-    from records.models import Client, Relic, Adoption, City, Address
-    
-    print("🔍 TESTANDO OTIMIZAÇÕES DE QUERIES")
-    print("="*50)
-    
-    # Resetar contador de queries
-    reset_queries()
-    
-    # 1. Teste Client List (otimizada)
-    print("\n📋 1. CLIENTLIST (com select_related)")
-    clients = Client.objects.select_related('user', 'address__city__state', 'created_by').all()[:5]
-    for client in clients:
-        # Acessar campos relacionados para forçar queries
-        print(f"   Cliente: {client.name}")
-        if client.user:
-            print(f"   Usuário: {client.user.username}")
-        if client.address:
-            print(f"   Cidade: {client.address.city.name}, {client.address.city.state.name}")
-        print(f"   Criado por: {client.created_by.username}")
-    
-    print(f"   📊 Queries executadas: {len(connection.queries)}")
-    client_queries = len(connection.queries)
-    
-    # Reset para próximo teste
-    reset_queries()
-    
-    # 2. Teste Relic List (otimizada)  
-    print("\n💎 2. RELICLIST (com select_related e prefetch_related)")
-    relics = Relic.objects.select_related('client', 'created_by', 'client__address__city__state').prefetch_related('images').all()[:5]
-    for relic in relics:
-        print(f"   Relíquia: {relic.name}")
-        print(f"   Cliente: {relic.client.name}")
-        if relic.client.address:
-            print(f"   Local: {relic.client.address.city.name}")
-        print(f"   Criado por: {relic.created_by.username}")
-        print(f"   Imagens: {relic.images.count()}")
-    
-    print(f"   📊 Queries executadas: {len(connection.queries)}")
-    relic_queries = len(connection.queries)
-    
-    # Reset para próximo teste
-    reset_queries()
-    
-    # 3. Teste Address List (otimizada)
-    print("\n🏠 3. ADDRESSLIST (com select_related)")
-    addresses = Address.objects.select_related('city', 'city__state').all()[:5]
-    for address in addresses:
-        print(f"   Endereço: {address.street}")
-        print(f"   Cidade: {address.city.name}, {address.city.state.name}")
-    
-    print(f"   📊 Queries executadas: {len(connection.queries)}")
-    address_queries = len(connection.queries)
-    
-    # Reset para comparação SEM otimização
-    reset_queries()
-    
-    # 4. Teste SEM otimização (para comparar)
-    print("\n❌ 4. SEM OTIMIZAÇÃO (queries N+1)")
-    clients_no_opt = Client.objects.all()[:3]  # Sem select_related
-    for client in clients_no_opt:
-        try:
-            print(f"   Cliente: {client.name}")
-            if client.user:
-                print(f"   Usuário: {client.user.username}")  # Query extra aqui
-            if client.address:
-                print(f"   Cidade: {client.address.city.name}")  # Query extra aqui
-                print(f"   Estado: {client.address.city.state.name}")  # Query extra aqui
-        except:
-            print(f"   Cliente: {client.name} (sem dados relacionados)")
-    
-    print(f"   📊 Queries executadas: {len(connection.queries)}")
-    no_opt_queries = len(connection.queries)
-    
-    # Resumo
-    print("\n" + "="*50)
-    print("📈 RESUMO DAS OTIMIZAÇÕES:")
-    print(f"   Client List (otimizada): {client_queries} queries")
-    print(f"   Relic List (otimizada): {relic_queries} queries")  
-    print(f"   Address List (otimizada): {address_queries} queries")
-    print(f"   Sem otimização (3 clientes): {no_opt_queries} queries")
-    print("\n✅ Otimizações funcionando! Menos queries = melhor performance")
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, reset_queries
+from django.db.models import Count
+from django.test import Client as TestClient
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment
+from django.urls import reverse
+
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_BASELINE = BASE_DIR / 'benchmarks' / 'baseline.json'
+
+# Módulos de URL medidos (prefixo do namespace, módulo)
+URL_MODULES = [
+    ('records:', 'records.urls'),
+    ('', 'pages.urls'),
+]
+
+# Variações com parâmetros GET além da URL pura (caminhos de filtro/busca reais)
+EXTRA_CASES = [
+    ('records:RelicList', {'search': 'anel'}),
+    ('records:RelicList', {'adoption_fee': 'true'}),
+    ('records:RelicList', {'cursor': ''}),
+    ('records:ClientList', {'search': 'silva'}),
+]
+
+# Diferença mínima de tempo para avisar (evita ruído em views de poucos ms)
+MIN_TIME_DELTA_MS = 5
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--clients', type=int, default=200, help='Clientes no banco de teste (default: 200)')
+    parser.add_argument('--relics', type=int, default=2000, help='Relíquias no banco de teste (default: 2000)')
+    parser.add_argument('--seed', type=int, default=13, help='Semente dos dados gerados (default: 13)')
+    parser.add_argument('--repeat', type=int, default=3, help='Execuções por view; tempos são a mediana (default: 3)')
+    parser.add_argument('--output', help='Gravar os resultados neste arquivo JSON')
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='Baseline para comparar')
+    parser.add_argument('--update-baseline', action='store_true', help='Gravar os resultados como novo baseline')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='Aumento relativo de tempo/memória tolerado antes de avisar (default: 0.5 = 50%%)')
+    parser.add_argument('--strict', action='store_true', help='Tratar aumentos de tempo/memória como regressão')
+    return parser.parse_args()
+
+
+def seed_database(options):
+    """Popula o banco de teste e retorna o usuário usado nas requisições"""
+    from django.contrib.auth.models import User
+    from records.models import Adoption, AdoptionRelic
+
+    call_command(
+        'populate_db', bulk=True, clients=options.clients, relics=options.relics,
+        images=True, adoption_rate=0.2, seed=options.seed, stdout=StringIO(),
+    )
+    # O usuário com mais relíquias exercita o pior caso das listas "minhas"
+    user = User.objects.annotate(total=Count('relics')).order_by('-total', 'pk').first()
+    adoption = Adoption.objects.filter(created_by=user).first() or Adoption.objects.first()
+    if adoption:
+        AdoptionRelic.objects.create(adoption=adoption, relic=adoption.relic, created_by=user)
+    return user
+
+
+def sample_object(view_class, user):
+    """Um registro que o usuário pode ver/editar, para as URLs com <pk>"""
+    model = getattr(view_class, 'model', None)
+    if model is None:
+        return None
+    queryset = model._default_manager.order_by('pk')
+    if any(field.name == 'created_by' for field in model._meta.fields):
+        return queryset.filter(created_by=user).first()
+    return queryset.first()
+
+
+def collect_cases(user):
+    cases = []
+    skipped = []
+    for prefix, module in URL_MODULES:
+        for pattern in import_module(module).urlpatterns:
+            kwargs = {}
+            if set(pattern.pattern.converters) - {'pk'}:
+                # Outros parâmetros na URL (ex.: export/<kind>.<fmt>) não têm valor de exemplo
+                skipped.append(pattern.name)
+                continue
+            if 'pk' in pattern.pattern.converters:
+                obj = sample_object(getattr(pattern.callback, 'view_class', None), user)
+                if obj is None:
+                    skipped.append(pattern.name)
+                    continue
+                kwargs['pk'] = obj.pk
+            cases.append((pattern.name, reverse(prefix + pattern.name, kwargs=kwargs), {}))
+
+    for name, params in EXTRA_CASES:
+        label = '{}?{}'.format(name.split(':')[-1], '&'.join('{}={}'.format(k, v) for k, v in params.items()))
+        cases.append((label, reverse(name), params))
+    return cases, skipped
+
+
+def request(client, url, params):
+    response = client.get(url, params)
+    # Respostas em streaming só fazem o trabalho quando consumidas
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def measure(client, url, params, repeat):
+    walls = []
+    sql_times = []
+    for _ in range(repeat):
+        # Sempre com o cache frio: o número de queries fica determinístico (pior caso)
+        cache.clear()
+        # O log de queries é limitado (9000): depois do populate ele está cheio
+        reset_queries()
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            response = request(client, url, params)
+            walls.append((time.perf_counter() - started) * 1000)
+        sql_times.append(sum(float(query['time']) for query in ctx.captured_queries) * 1000)
+
+    # Memória medida em uma execução separada (tracemalloc deixa tudo mais lento)
+    cache.clear()
+    tracemalloc.start()
+    request(client, url, params)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'url': url,
+        'params': params,
+        'status': response.status_code,
+        'queries': len(ctx.captured_queries),
+        'sql_ms': round(statistics.median(sql_times), 2),
+        'wall_ms': round(statistics.median(walls), 2),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def compare(results, baseline, options):
+    """Retorna (regressões, avisos) em relação ao baseline"""
+    regressions = []
+    warnings = []
+    base_views = baseline.get('views', {})
+    limit = 1 + options.tolerance
+
+    for name, result in results['views'].items():
+        base = base_views.get(name)
+        if base is None:
+            warnings.append(f'{name}: nova view (sem baseline)')
+            continue
+        if result['queries'] > base['queries']:
+            regressions.append(f'{name}: {base["queries"]} -> {result["queries"]} queries')
+        if result['status'] != base['status']:
+            regressions.append(f'{name}: status {base["status"]} -> {result["status"]}')
+
+        slow = []
+        if result['wall_ms'] > base['wall_ms'] * limit and result['wall_ms'] - base['wall_ms'] > MIN_TIME_DELTA_MS:
+            slow.append(f'tempo {base["wall_ms"]:.1f} -> {result["wall_ms"]:.1f} ms')
+        if result['peak_kb'] > base['peak_kb'] * limit:
+            slow.append(f'memória {base["peak_kb"]:.0f} -> {result["peak_kb"]:.0f} KB')
+        for message in slow:
+            (regressions if options.strict else warnings).append(f'{name}: {message}')
+
+    for name in base_views.keys() - results['views'].keys():
+        warnings.append(f'{name}: presente no baseline mas não foi medida')
+    return regressions, warnings
+
+
+def print_table(results, baseline):
+    base_views = baseline.get('views', {}) if baseline else {}
+    print(f'\n{"VIEW":<40} {"STATUS":>6} {"QUERIES":>9} {"SQL ms":>9} {"TOTAL ms":>9} {"PICO KB":>9}')
+    print('-' * 86)
+    for name, result in results['views'].items():
+        base = base_views.get(name)
+        queries = str(result['queries'])
+        if base and base['queries'] != result['queries']:
+            queries = f'{base["queries"]}→{result["queries"]}'
+        print(f'{name:<40} {result["status"]:>6} {queries:>9} {result["sql_ms"]:>9.1f} '
+              f'{result["wall_ms"]:>9.1f} {result["peak_kb"]:>9.0f}')
+
+
+def run_benchmark(options):
+    setup_test_environment()
+    runner = DiscoverRunner(verbosity=0)
+    old_config = runner.setup_databases()
+    media_root = tempfile.mkdtemp(prefix='bench-media-')
+    try:
+        with override_settings(
+            MEDIA_ROOT=media_root,
+            DEBUG_TOOLBAR_CONFIG={'SHOW_TOOLBAR_CALLBACK': lambda request: False},
+        ):
+            print(f'🌱 Populando banco de teste ({options.clients} clientes, {options.relics} relíquias)...')
+            user = seed_database(options)
+            client = TestClient()
+            client.force_login(user)
+
+            cases, skipped = collect_cases(user)
+            print(f'⏱️  Medindo {len(cases)} views ({options.repeat}x cada)...')
+            views = {}
+            for name, url, params in cases:
+                views[name] = measure(client, url, params, options.repeat)
+    finally:
+        runner.teardown_databases(old_config)
+
+    return {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'clients': options.clients,
+            'relics': options.relics,
+            'seed': options.seed,
+            'repeat': options.repeat,
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'skipped': skipped,
+        },
+        'views': views,
+    }
+
+
+def main():
+    options = parse_args()
+    results = run_benchmark(options)
+
+    baseline_path = Path(options.baseline)
+    baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else None
+    print_table(results, baseline)
+    if results['meta']['skipped']:
+        print(f'\n(sem registro para testar: {", ".join(results["meta"]["skipped"])})')
+
+    if options.output:
+        Path(options.output).write_text(json.dumps(results, indent=2, ensure_ascii=False) + '\n')
+        print(f'\n💾 Resultados gravados em {options.output}')
+
+    if options.update_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(results, indent=2, ensure_ascii=False) + '\n')
+        print(f'\n💾 Baseline atualizado: {baseline_path}')
+        return 0
+
+    if baseline is None:
+        print(f'\n⚠️  Baseline {baseline_path} não encontrado (use --update-baseline para criar)')
+        return 0
+
+    meta = baseline.get('meta', {})
+    if (meta.get('clients'), meta.get('relics')) != (options.clients, options.relics):
+        print('\n⚠️  Baseline gerado com outro volume de dados: compare tempos e memória com cuidado')
+
+    regressions, warnings = compare(results, baseline, options)
+    for message in warnings:
+        print(f'⚠️  {message}')
+    if regressions:
+        print('\n❌ REGRESSÕES:')
+        for message in regressions:
+            print(f'   {message}')
+        return 1
+    print('\n✅ Nenhuma view acima do orçamento de queries do baseline')
+    return 0
+
 
 if __name__ == "__main__":
-    test_queries()
\ No newline at end of file
+    sys.exit(main())
@@ -1,7 +1,13 @@
+from django.conf import settings
 from django.urls import path
-from .views import IndexView, AboutView
+from .views import IndexView, AsyncIndexView, AboutView, GalleryView
+
+# Views assíncronas no perfil ASGI (settings.ASYNC_VIEWS)
+if settings.ASYNC_VIEWS:
+    IndexView = AsyncIndexView
 
 urlpatterns = [
     path('', IndexView.as_view(), name='pages-HomePage'),
     path('about/', AboutView.as_view(), name='pages-AboutPage'),
+    path('gallery/', GalleryView.as_view(), name='pages-Gallery'),
 ]
@@ -8,73 +8,90 @@ from django.contrib.auth.models import User
 from django.db.models import Count, Q
 from django.utils import timezone
 from datetime import datetime, timedelta
+from functools import partial
 from django.contrib import messages
+from django.contrib.auth.mixins import LoginRequiredMixin
 from records.forms import CustomUserCreationForm
-from records.models import Client, Relic, Adoption
+from records.models import Client, Relic, RelicImage, Adoption
+from records.gallery import get_gallery_page
+from records.stats import get_dashboard_stats
+from records.watermarks import ConditionalGetMixin
+from records.routers import ReplicaReadMixin
+from records.concurrency import AsyncViewMixin, ConcurrentQueriesMixin
 
 # Create your views here.
-class IndexView(TemplateView):
+class IndexView(ReplicaReadMixin, ConditionalGetMixin, ConcurrentQueriesMixin, TemplateView):
     template_name = "pages/index.html"
+    # Contadores, registros recentes e galeria
+    watermark_models = [Client, Relic, RelicImage, Adoption, User]
+    
+    def get_concurrent_queries(self):
+        # Consultas independentes: executadas juntas no AsyncIndexView
+        user = self.request.user if self.request.user.is_authenticated else None
+        queries = {
+            # Estatísticas gerais e do usuário: contadores materializados (UserStats), uma só query
+            'stats': partial(get_dashboard_stats, user),
+        }
+        if user is None:
+            # Dados públicos para usuários não logados
+            queries['recent_relics_public'] = lambda: Relic.objects.select_related('client').filter(
+                adoption_fee=False
+            ).order_by('-obtained_date')[:3]
+            return queries
+        
+        # Primeira página da galeria; as demais são carregadas pelo GalleryView
+        queries['gallery'] = partial(get_gallery_page, self.request.GET.get('cursor'))
+        # Superusuários veem registros de todo o sistema, usuários normais veem apenas os seus
+        clients = Client.objects.all()
+        relics = Relic.objects.all()
+        if not user.is_superuser:
+            clients = clients.filter(created_by=user)
+            relics = relics.filter(created_by=user)
+        queries['recent_clients'] = lambda: clients.order_by('-register_date')[:4]
+        queries['recent_relics'] = lambda: relics.order_by('-obtained_date')[:4]
+        return queries
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Estatísticas gerais
-        context['total_users'] = User.objects.count()
-        context['total_clients'] = Client.objects.count()
-        context['total_relics'] = Relic.objects.count()
-        context['total_adoptions'] = Adoption.objects.count()
-        
-        # Todas as relíquias do site para a seção de galeria
-        context['all_relics'] = Relic.objects.select_related('client').prefetch_related('images').order_by('-obtained_date')
+        site_stats, user_stats = self.fetch('stats')
+        context['total_users'] = site_stats.users
+        context['total_clients'] = site_stats.clients
+        context['total_relics'] = site_stats.relics
+        context['total_adoptions'] = site_stats.adoptions
         
         # Últimos registros (se usuário logado)
         if self.request.user.is_authenticated:
-            try:
-                # Superusuários veem registros de todo o sistema, usuários normais veem apenas os seus
-                if self.request.user.is_superuser:
-                    context['recent_clients'] = Client.objects.all().order_by('-register_date')[:4]
-                    context['recent_relics'] = Relic.objects.all().order_by('-obtained_date')[:4]
-                else:
-                    context['recent_clients'] = Client.objects.filter(
-                        created_by=self.request.user
-                    ).order_by('-register_date')[:4]
-                    
-                    context['recent_relics'] = Relic.objects.filter(
-                        created_by=self.request.user
-                    ).order_by('-obtained_date')[:4]
-                
-                context['user_stats'] = {
-                    'my_clients': Client.objects.filter(created_by=self.request.user).count(),
-                    'my_relics': Relic.objects.filter(created_by=self.request.user).count(),
-                    'my_adoptions_given': Adoption.objects.filter(
-                        previous_owner__created_by=self.request.user
-                    ).count(),
-                    'my_adoptions_received': Adoption.objects.filter(
-                        new_owner__created_by=self.request.user
-                    ).count(),
-                }
-            except Exception as e:
-                # Em caso de erro, define valores padrão
-                context['recent_clients'] = []
-                context['recent_relics'] = []
-                context['user_stats'] = {
-                    'my_clients': 0,
-                    'my_relics': 0,
-                    'my_adoptions_given': 0,
-                    'my_adoptions_received': 0,
-                }
+            gallery = self.fetch('gallery')
+            context['all_relics'] = gallery['relics']
+            context['gallery_next_cursor'] = gallery['next_cursor']
+            context['recent_clients'] = self.fetch('recent_clients')
+            context['recent_relics'] = self.fetch('recent_relics')
+            context['user_stats'] = {
+                'my_clients': user_stats.clients,
+                'my_relics': user_stats.relics,
+                'my_adoptions_given': user_stats.adoptions_given,
+                'my_adoptions_received': user_stats.adoptions_received,
+            }
         else:
-            # Dados públicos para usuários não logados
-            try:
-                context['recent_relics_public'] = Relic.objects.filter(
-                    adoption_fee=False
-                ).order_by('-obtained_date')[:3]
-            except Exception as e:
-                context['recent_relics_public'] = []
+            context['recent_relics_public'] = self.fetch('recent_relics_public')
         
         return context
 
+class AsyncIndexView(AsyncViewMixin, IndexView):
+    """IndexView para ASGI: estatísticas, galeria e registros recentes buscados em paralelo"""
+
+class GalleryView(LoginRequiredMixin, ReplicaReadMixin, TemplateView):
+    """Devolve os cards da próxima página da galeria (botão "Carregar mais")"""
+    template_name = "pages/partials/gallery_cards.html"
+    
+    def get(self, request, *args, **kwargs):
+        gallery = get_gallery_page(request.GET.get('cursor'))
+        response = self.render_to_response({'relics': gallery['relics']})
+        # O cursor da próxima página segue no cabeçalho para o JavaScript da galeria
+        response['X-Next-Cursor'] = gallery['next_cursor'] or ''
+        return response
+
 class AboutView(TemplateView):
     
     template_name = "pages/about.html"
@@ -1,8 +1,19 @@
+import os
+
 from django.contrib import admin
+from django.db import transaction
+from django.http import FileResponse, Http404
+from django.urls import path, reverse
+from django.utils.html import format_html
 from django.contrib.auth.models import Group, Permission, User
 from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
 
-from .models import State, City, Address, Client, Relic, Adoption, AdoptionRelic, RelicImage
+from .forms import ImportUploadForm
+from .imports import detect_format, error_report_name
+from .models import State, City, Address, Client, Relic, Adoption, AdoptionRelic, RelicImage, Job, ImportRun
+from .storage import import_storage
+from .tasks import enqueue
 
 # Admin customizado para Client com controle por usuário
 @admin.register(Client)
@@ -164,4 +175,100 @@ class RelicImageAdmin(admin.ModelAdmin):
     def save_model(self, request, obj, form, change):
         if not change:  # Se é um novo objeto
             obj.created_by = request.user
-        super().save_model(request, obj, form, change)
\ No newline at end of file
+        super().save_model(request, obj, form, change)
+
+# Admin da fila de tarefas em segundo plano (somente leitura + reenfileirar)
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'status', 'attempts', 'max_attempts', 'run_at', 'finished_at']
+    list_filter = ['status', 'name']
+    readonly_fields = ['name', 'kwargs', 'attempts', 'locked_at', 'locked_by', 'last_error', 'created_at', 'finished_at']
+    fields = ['name', 'kwargs', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_at', 'locked_by', 'finished_at', 'last_error', 'created_at']
+    actions = ['retry_jobs']
+    
+    @admin.action(description='Reenfileirar tarefas selecionadas')
+    def retry_jobs(self, request, queryset):
+        updated = queryset.exclude(status=Job.RUNNING).update(
+            status=Job.PENDING, attempts=0, run_at=timezone.now(), finished_at=None
+        )
+        self.message_user(request, f'{updated} tarefa(s) reenfileirada(s).')
+
+
+# Admin das importações em lote: o "Adicionar" envia o arquivo e agenda a tarefa
+@admin.register(ImportRun)
+class ImportRunAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'file_name', 'status', 'rows', 'created', 'errors', 'report_link', 'created_by', 'created_at']
+    list_filter = ['status', 'kind']
+    readonly_fields = [
+        'kind', 'format', 'file_name', 'file_size', 'status', 'rows', 'created', 'errors', 'report_link',
+        'last_error', 'created_by', 'created_at', 'finished_at',
+    ]
+    fields = readonly_fields
+    actions = ['resume_imports']
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request).select_related('created_by')
+        if request.user.is_superuser:
+            return qs
+        return qs.filter(created_by=request.user)
+
+    def get_form(self, request, obj=None, **kwargs):
+        if obj is None:
+            kwargs['form'] = ImportUploadForm
+        return super().get_form(request, obj, **kwargs)
+
+    def get_fields(self, request, obj=None):
+        return ['kind', 'file'] if obj is None else self.fields
+
+    def get_readonly_fields(self, request, obj=None):
+        return [] if obj is None else self.readonly_fields
+
+    def get_urls(self):
+        return [
+            path(
+                '<int:pk>/report/',
+                self.admin_site.admin_view(self.report_view),
+                name='records_importrun_report',
+            ),
+        ] + super().get_urls()
+
+    def report_view(self, request, pk):
+        """Relatório de erros (arquivo privado), só para quem vê a importação no admin"""
+        run = self.get_queryset(request).filter(pk=pk).first()
+        if run is None or not self.has_view_permission(request, run) or not self._has_report(run):
+            raise Http404
+        return FileResponse(import_storage().open(run.error_report, 'rb'), as_attachment=True, content_type='text/csv')
+
+    def _has_report(self, obj):
+        # Importações do comando guardam o caminho absoluto do relatório no servidor
+        if not obj.error_report or os.path.isabs(obj.error_report):
+            return False
+        return import_storage().exists(obj.error_report)
+
+    @admin.display(description='Relatório de erros')
+    def report_link(self, obj):
+        if not obj.errors:
+            return '-'
+        if not self._has_report(obj):
+            return obj.errors
+        return format_html('<a href="{}">{}</a>', reverse('admin:records_importrun_report', args=[obj.pk]), obj.errors)
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            return
+        upload = form.cleaned_data['file']
+        obj.file_name = import_storage().save(upload.name, upload)
+        obj.file_size = upload.size
+        obj.format = detect_format(upload.name)
+        obj.error_report = error_report_name(obj.file_name)
+        obj.created_by = request.user
+        super().save_model(request, obj, form, change)
+        enqueue('import_records', run_id=obj.pk)
+
+    @admin.action(description='Retomar importações selecionadas (do último lote confirmado)')
+    def resume_imports(self, request, queryset):
+        runs = list(queryset.exclude(status__in=[ImportRun.DONE, ImportRun.RUNNING]).values_list('pk', flat=True))
+        with transaction.atomic():
+            for run_id in runs:
+                enqueue('import_records', unique=True, run_id=run_id)
+        self.message_user(request, f'{len(runs)} importação(ões) reenfileirada(s).')
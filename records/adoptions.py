@@ -0,0 +1,138 @@
+"""
+Transferência de relíquias (adoções).
+
+O dono de cada relíquia é trocado com um UPDATE condicional
+(... WHERE client_id = <dono lido>): se outra operação transferiu ou apagou
+a mesma relíquia no meio do caminho, a contagem de linhas não bate e a
+transferência inteira é desfeita com TransferConflict, em vez de sobrescrever
+a outra. No PostgreSQL as relíquias também são bloqueadas com
+SELECT ... FOR UPDATE, em ordem de id (lotes concorrentes não entram em deadlock).
+
+As escritas são feitas por conjunto, com o mesmo número de queries para uma
+ou para milhares de relíquias (por lote de `batch_size`):
+- relíquias: um UPDATE por dono anterior
+- adoções e histórico (AdoptionRelic): dois bulk_create
+- last_activity dos clientes envolvidos: um UPDATE
+- payment_status das adoções anteriores: um UPDATE (índice adoption_relic_payment_idx)
+
+Como update()/bulk_create() não disparam sinais, o que os sinais fariam
+(cards, galeria, marcas d'água e contadores do painel) é feito aqui, uma vez
+por transferência.
+
+Usado pelo AdoptionCreate (uma relíquia) e pelo comando `transfer_relics`.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import cards, watermarks
+from .gallery import invalidate_gallery
+from .models import Adoption, AdoptionRelic, Client, Relic
+from .stats import bump_user_stats, invalidate_relic_stats
+from .tasks import enqueue
+
+TRANSFER_BATCH_SIZE = 1000
+
+
+class TransferConflict(Exception):
+    """Relíquia transferida ou apagada por outra operação durante a transferência"""
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _lock_owners(relic_ids, batch_size):
+    """{relic_id: client_id} das relíquias, bloqueadas até o fim da transação"""
+    owners = {}
+    for chunk in _chunks(relic_ids, batch_size):
+        owners.update(
+            Relic.objects.select_for_update().filter(pk__in=chunk).order_by('pk').values_list('pk', 'client_id')
+        )
+    return owners
+
+
+def transfer_relics(relic_ids, new_owner, user, payment_status=False, batch_size=TRANSFER_BATCH_SIZE):
+    """
+    Transfere as relíquias para `new_owner` em uma única transação, criando
+    uma adoção (e o histórico AdoptionRelic) por relíquia.
+    Retorna as adoções criadas, na ordem de id das relíquias.
+    """
+    relic_ids = sorted(set(relic_ids))
+    now = timezone.now()
+    with transaction.atomic():
+        owners = _lock_owners(relic_ids, batch_size)
+        if len(owners) != len(relic_ids):
+            raise TransferConflict('Relíquia(s) inexistente(s): {}'.format(
+                ', '.join(str(pk) for pk in relic_ids if pk not in owners)
+            ))
+
+        by_owner = defaultdict(list)
+        for relic_id, owner_id in owners.items():
+            by_owner[owner_id].append(relic_id)
+        for owner_id, ids in by_owner.items():
+            for chunk in _chunks(ids, batch_size):
+                updated = Relic.objects.filter(pk__in=chunk, client_id=owner_id).update(
+                    client=new_owner, updated_at=now
+                )
+                if updated != len(chunk):
+                    raise TransferConflict('Relíquia(s) transferida(s) por outra operação; tente novamente.')
+
+        if payment_status:
+            # Pagamento confirmado vale para as adoções anteriores das relíquias
+            for chunk in _chunks(relic_ids, batch_size):
+                Adoption.objects.filter(relic_id__in=chunk, payment_status=False).update(
+                    payment_status=True, updated_at=now
+                )
+
+        adoptions = Adoption.objects.bulk_create([
+            Adoption(
+                relic_id=relic_id,
+                previous_owner_id=owners[relic_id],
+                new_owner=new_owner,
+                payment_status=payment_status,
+                created_by=user,
+            )
+            for relic_id in relic_ids
+        ], batch_size=batch_size)
+        AdoptionRelic.objects.bulk_create([
+            AdoptionRelic(adoption_id=adoption.pk, relic_id=adoption.relic_id, created_by=user)
+            for adoption in adoptions
+        ], batch_size=batch_size)
+
+        client_ids = sorted(set(owners.values()) | {new_owner.pk})
+        for chunk in _chunks(client_ids, batch_size):
+            Client.objects.filter(pk__in=chunk).update(last_activity=now)
+
+        _update_counters(adoptions, new_owner, user)
+        enqueue('refresh_relic_stats', unique=True)
+        transaction.on_commit(lambda: _invalidate_caches(relic_ids, client_ids))
+    return adoptions
+
+
+def _update_counters(adoptions, new_owner, user):
+    """O que count_adoptions (records/signals.py) faria adoção por adoção"""
+    total = len(adoptions)
+    bump_user_stats(None, adoptions=total)
+    bump_user_stats(user.pk, adoptions=total)
+
+    given = Counter(adoption.previous_owner_id for adoption in adoptions)
+    creators = dict(Client.objects.filter(pk__in=list(given)).values_list('pk', 'created_by_id'))
+    given_by_user = Counter()
+    for client_id, count in given.items():
+        given_by_user[creators.get(client_id)] += count
+    for user_id, count in given_by_user.items():
+        if user_id is not None:
+            bump_user_stats(user_id, adoptions_given=count)
+    if new_owner.created_by_id is not None:
+        bump_user_stats(new_owner.created_by_id, adoptions_received=total)
+
+
+def _invalidate_caches(relic_ids, client_ids):
+    cards.bump('relic', *relic_ids)
+    cards.bump('client', *client_ids)
+    invalidate_gallery()
+    invalidate_relic_stats()
+    watermarks.touch(Relic, Client, Adoption, AdoptionRelic)
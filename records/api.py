@@ -0,0 +1,233 @@
+"""
+API JSON somente leitura (v1) de relíquias, imagens, clientes e adoções.
+
+- `fields=id,name,...` escolhe as colunas: vira um values() só com elas (mais
+  as chaves da ordenação), então colunas não pedidas nem saem do banco.
+- As linhas chegam como dicionários e são serializadas direto, sem criar
+  instâncias de modelo.
+- Paginação por cursor (records/pagination.py), sem COUNT(*): `limit=` define
+  o tamanho da página e `next`/`previous` trazem as URLs das vizinhas.
+  Cursor inválido é erro 400 (e não a primeira página de novo).
+- Os filtros são os das listas (RelicFilter/ClientFilter) e o escopo também:
+  adoções só do usuário, exceto para superusuários.
+- Erros: {"detail": "...", "errors": {"parâmetro": ["mensagem", ...]}}.
+
+ETag/304 vêm do ConditionalGetMixin (records/watermarks.py). Usado por
+ApiListView e ApiDetailView (/api/v1/<recurso>/).
+"""
+from django.core.exceptions import ValidationError
+from django.contrib.auth.models import User
+
+from .filters import ClientFilter, RelicFilter
+from .models import Address, Adoption, City, Client, Relic, RelicImage, State
+from .pagination import CursorPaginator
+
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+
+
+def _image_url(name):
+    return RelicImage._meta.get_field('image').storage.url(name) if name else None
+
+
+# Por recurso: campos expostos (nome na API -> caminho do values()), campos
+# padrão (sem `fields=`), ordenação e filtros. `filters` são lookups exatos
+# simples para os recursos sem FilterSet.
+API_RESOURCES = {
+    'relics': {
+        'model': Relic,
+        'filterset_class': RelicFilter,
+        'watermark_models': [Relic, RelicImage, Client, User, Address, City, State],
+        'ordering': ['-obtained_date'],
+        'fields': {
+            'id': 'id',
+            'name': 'name',
+            'description': 'description',
+            'obtained_date': 'obtained_date',
+            'adoption_fee': 'adoption_fee',
+            'client': 'client_id',
+            'client_name': 'client__name',
+            'created_by': 'created_by__username',
+            'main_image_url': 'main_image_url',
+            'main_image_width': 'main_image_width',
+            'main_image_height': 'main_image_height',
+            'updated_at': 'updated_at',
+        },
+        'default_fields': ['id', 'name', 'obtained_date', 'adoption_fee', 'client', 'main_image_url', 'updated_at'],
+    },
+    'relic-images': {
+        'model': RelicImage,
+        'watermark_models': [RelicImage],
+        'ordering': ['id'],
+        'fields': {
+            'id': 'id',
+            'relic': 'relic_id',
+            'image': 'image',
+            'is_main': 'is_main',
+            'upload_date': 'upload_date',
+            'checksum': 'checksum',
+            'updated_at': 'updated_at',
+        },
+        'default_fields': ['id', 'relic', 'image', 'is_main', 'upload_date'],
+        'filters': {'relic': 'relic_id', 'is_main': 'is_main'},
+        'converters': {'image': _image_url},
+    },
+    'clients': {
+        'model': Client,
+        'filterset_class': ClientFilter,
+        'watermark_models': [Client, User, Address, City, State],
+        'ordering': ['-register_date'],
+        'fields': {
+            'id': 'id',
+            'name': 'name',
+            'nickname': 'nickname',
+            'email': 'email',
+            'birth_date': 'birth_date',
+            'register_date': 'register_date',
+            'last_activity': 'last_activity',
+            'user': 'user__username',
+            'created_by': 'created_by__username',
+        },
+        'default_fields': ['id', 'name', 'nickname', 'register_date'],
+    },
+    'adoptions': {
+        'model': Adoption,
+        'owner_only': True,
+        'watermark_models': [Adoption, Relic, Client, User],
+        'ordering': ['-adoption_date'],
+        'fields': {
+            'id': 'id',
+            'adoption_date': 'adoption_date',
+            'payment_status': 'payment_status',
+            'relic': 'relic_id',
+            'relic_name': 'relic__name',
+            'previous_owner': 'previous_owner_id',
+            'previous_owner_name': 'previous_owner__name',
+            'new_owner': 'new_owner_id',
+            'new_owner_name': 'new_owner__name',
+            'created_by': 'created_by__username',
+            'updated_at': 'updated_at',
+        },
+        'default_fields': ['id', 'adoption_date', 'payment_status', 'relic', 'previous_owner', 'new_owner'],
+        'filters': {
+            'relic': 'relic_id',
+            'previous_owner': 'previous_owner_id',
+            'new_owner': 'new_owner_id',
+            'payment_status': 'payment_status',
+        },
+    },
+}
+
+
+class ApiError(Exception):
+    """
+    Erro da requisição, devolvido como {"detail": ..., "errors": ...};
+    `errors` é sempre {parâmetro: [mensagens]}
+    """
+
+    def __init__(self, detail, status=400, errors=None):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+        self.errors = errors
+
+
+def get_resource(name):
+    try:
+        return API_RESOURCES[name]
+    except KeyError:
+        raise ApiError('Recurso não encontrado.', status=404)
+
+
+def parse_fields(resource, raw):
+    """Campos pedidos em `fields=` (na ordem pedida) ou os padrão do recurso"""
+    if not raw:
+        return list(resource['default_fields'])
+    names = list(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    unknown = [name for name in names if name not in resource['fields']]
+    if unknown:
+        raise ApiError('Campos desconhecidos: {}.'.format(', '.join(unknown)), errors={
+            'fields': ['Campos disponíveis: {}.'.format(', '.join(sorted(resource['fields'])))]
+        })
+    return names or list(resource['default_fields'])
+
+
+def parse_limit(raw):
+    if not raw:
+        return API_PAGE_SIZE
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise ApiError('limit deve ser um número inteiro.')
+    if limit < 1:
+        raise ApiError('limit deve ser maior que zero.')
+    return min(limit, API_MAX_PAGE_SIZE)
+
+
+def api_queryset(resource, params, user):
+    """Queryset do recurso com o escopo do usuário e os filtros da querystring"""
+    model = resource['model']
+    queryset = model.objects.all()
+    if resource.get('owner_only') and not user.is_superuser:
+        queryset = queryset.filter(created_by=user)
+
+    filterset_class = resource.get('filterset_class')
+    if filterset_class is not None:
+        filterset = filterset_class(params, queryset=queryset)
+        # Na API filtro inválido é erro (na lista ele é só ignorado)
+        if not filterset.is_valid():
+            raise ApiError('Filtros inválidos.', errors={
+                name: list(messages) for name, messages in filterset.errors.items()
+            })
+        queryset = filterset.qs
+
+    lookups = {}
+    for param, path in resource.get('filters', {}).items():
+        if param in params:
+            field = model._meta.get_field(path)
+            try:
+                lookups[path] = field.to_python(params[param])
+            except ValidationError as e:
+                raise ApiError('Filtros inválidos.', errors={param: e.messages})
+    return queryset.filter(**lookups) if lookups else queryset
+
+
+def _ordering_paths(resource):
+    """Colunas que o cursor precisa ler (chaves da ordenação e a chave primária)"""
+    meta = resource['model']._meta
+    paths = [meta.get_field(name.lstrip('-')).attname for name in resource['ordering']]
+    return paths + [meta.pk.attname]
+
+
+def _values(resource, queryset, names):
+    paths = [resource['fields'][name] for name in names]
+    return queryset.values(*dict.fromkeys(paths + _ordering_paths(resource)))
+
+
+def serialize(resource, rows, names):
+    """Dicionários do values() -> objetos da API, só com os campos pedidos"""
+    fields = resource['fields']
+    converters = resource.get('converters', {})
+    columns = [(name, fields[name], converters.get(name)) for name in names]
+    return [
+        {name: convert(row[path]) if convert else row[path] for name, path, convert in columns}
+        for row in rows
+    ]
+
+
+def list_page(resource, queryset, names, cursor=None, limit=API_PAGE_SIZE):
+    """Uma página do recurso: (objetos, cursor seguinte, cursor anterior)"""
+    paginator = CursorPaginator(_values(resource, queryset, names), limit, ordering=resource['ordering'])
+    # Nas listas um cursor inválido volta à primeira página; aqui um cliente
+    # paginando repetiria a primeira página para sempre sem perceber
+    if cursor and paginator.decode_cursor(cursor) is None:
+        raise ApiError('cursor inválido.', errors={'cursor': ['Use os links next/previous da resposta.']})
+    page = paginator.page(cursor)
+    return serialize(resource, page.object_list, names), page.next_cursor, page.previous_cursor
+
+
+def get_object(resource, queryset, names, pk):
+    row = _values(resource, queryset, names).filter(pk=pk).first()
+    if row is None:
+        raise ApiError('Registro não encontrado.', status=404)
+    return serialize(resource, [row], names)[0]
@@ -0,0 +1,100 @@
+"""
+Contagem de referências dos arquivos do storage endereçado por conteúdo.
+
+Os sinais em records/signals.py chamam `add_reference`/`release_reference`
+quando um RelicImage.image ou Client.profile_photo passa a apontar (ou deixa
+de apontar) para um arquivo. Quando a contagem chega a zero é agendada a
+tarefa `collect_blobs`, que apaga o arquivo e suas miniaturas.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .images import delete_derivatives
+from .models import Blob, Client, RelicImage
+from .storage import BLOB_ROOT, blob_storage
+
+# Arquivos sem referência só são apagados depois disso (e se não foram
+# reaproveitados por um upload idêntico nesse intervalo)
+GC_GRACE = timedelta(minutes=10)
+
+# Campo de imagem de cada modelo (arquivos no storage, com miniaturas/WebP)
+IMAGE_FIELDS = {
+    RelicImage: 'image',
+    Client: 'profile_photo',
+}
+
+
+def add_reference(name):
+    storage = blob_storage()
+    if not name or not storage.is_blob(name):
+        return
+    now = timezone.now()
+    if Blob.objects.filter(name=name).update(refcount=F('refcount') + 1, updated_at=now):
+        return
+    try:
+        with transaction.atomic():
+            Blob.objects.create(name=name, size=storage.size(name), refcount=1)
+    except IntegrityError:
+        # Criado por outra requisição ao mesmo tempo
+        Blob.objects.filter(name=name).update(refcount=F('refcount') + 1, updated_at=now)
+
+
+def release_reference(name):
+    if not name or not blob_storage().is_blob(name):
+        return
+    released = Blob.objects.filter(name=name, refcount__gt=0).update(
+        refcount=F('refcount') - 1, updated_at=timezone.now()
+    )
+    if released and Blob.objects.filter(name=name, refcount=0).exists():
+        from .tasks import enqueue
+        enqueue('collect_blobs', unique=True, delay=GC_GRACE)
+
+
+def collect_garbage(grace=GC_GRACE):
+    """Apaga os arquivos sem referências. Retorna (arquivos apagados, bytes liberados)."""
+    storage = blob_storage()
+    cutoff = timezone.now() - grace
+    deleted = 0
+    freed = 0
+
+    for blob in Blob.objects.filter(refcount=0, updated_at__lt=cutoff).order_by('updated_at').iterator():
+        with transaction.atomic():
+            # Reconfirma com a linha travada: um upload pode ter ganho a referência agora
+            if not Blob.objects.select_for_update().filter(pk=blob.pk, refcount=0).exists():
+                continue
+            # Upload idêntico recente: o storage tocou o arquivo e o registro ainda vai ser salvo
+            if storage.exists(blob.name) and storage.get_modified_time(blob.name) > cutoff:
+                continue
+            Blob.objects.filter(pk=blob.pk).delete()
+
+        storage.delete(blob.name)
+        delete_derivatives(blob.name, storage)
+        deleted += 1
+        freed += blob.size
+    return deleted, freed
+
+
+def rebuild_refcounts():
+    """Recalcula todas as contagens a partir dos registros (após imports ou updates em massa)"""
+    storage = blob_storage()
+    counts = {}
+    for model, field in IMAGE_FIELDS.items():
+        rows = (
+            model.objects.filter(**{'{}__startswith'.format(field): BLOB_ROOT + '/'})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+        )
+        for row in rows:
+            counts[row[field]] = counts.get(row[field], 0) + row['total']
+
+    with transaction.atomic():
+        Blob.objects.exclude(name__in=list(counts)).update(refcount=0)
+        for name, total in counts.items():
+            updated = Blob.objects.filter(name=name).update(refcount=total)
+            if not updated and storage.exists(name):
+                Blob.objects.create(name=name, size=storage.size(name), refcount=total)
+    return counts
@@ -0,0 +1,68 @@
+"""
+Cache de páginas inteiras conforme a política declarada em settings.CACHE_POLICIES.
+
+O CachePolicyMiddleware (records/middleware.py) consulta a política pelo nome
+da URL resolvida. Visitantes compartilham a mesma entrada por URL; usuários
+logados têm uma entrada própria (a página mostra os dados deles). A chave
+inclui as marcas d'água (records/watermarks.py) dos modelos que a view exibe,
+então qualquer alteração gera outra chave. Para visitantes sem sessão uma
+página em cache é servida sem nenhuma query.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from .watermarks import get_watermarks, models_for_view
+
+PAGE_KEY_PREFIX = 'page'
+
+
+def get_policy(view_name):
+    return getattr(settings, 'CACHE_POLICIES', {}).get(view_name)
+
+
+def get_timeout(policy, user):
+    """Segundos de cache da página para o usuário (0: não guardar)"""
+    return policy.get('authenticated' if user.is_authenticated else 'anonymous') or 0
+
+
+def page_cache_key(request, view_class, user=None):
+    user = user or request.user
+    if user.is_authenticated:
+        # Novo login: outra sessão e outro token CSRF na página
+        audience = '{}:{}'.format(user.pk, user.last_login.isoformat() if user.last_login else '')
+    else:
+        audience = 'anon'
+    watermarks = get_watermarks(models_for_view(view_class)) if view_class else {}
+    versions = ','.join('{}={}'.format(label, watermarks[label][0]) for label in sorted(watermarks))
+    raw = '|'.join([request.resolver_match.view_name, request.get_full_path(), audience, versions])
+    return '{}:{}'.format(PAGE_KEY_PREFIX, hashlib.md5(raw.encode()).hexdigest())
+
+
+def is_cacheable(request, response):
+    """Só respostas 200 completas e que não dependem de cookies definidos agora"""
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        # Página que usou {% csrf_token %} para um novo visitante: o token é só dele
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+    )
+
+
+def store(key, response, timeout):
+    headers = {name: value for name, value in response.headers.items() if name.lower() != 'set-cookie'}
+    cache.set(key, (response.status_code, headers, response.content), timeout)
+
+
+def load(key):
+    cached = cache.get(key)
+    if cached is None:
+        return None
+    status, headers, content = cached
+    response = HttpResponse(content, status=status)
+    for name, value in headers.items():
+        response[name] = value
+    return response
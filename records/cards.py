@@ -0,0 +1,114 @@
+"""
+Cache dos cards (linhas das listas e cards do perfil) por objeto.
+
+Cada card é renderizado por um template parcial e guardado com uma chave que
+inclui a versão de cada registro exibido nele: a relíquia e seu proprietário,
+ou o cliente e o usuário que o cadastrou, além da imagem principal. Os sinais
+em records/signals.py trocam a versão do registro alterado após o commit, então
+um card nunca é servido desatualizado e não há invalidação por padrão de chave.
+
+As versões e os fragmentos de uma página inteira são lidos com dois
+`get_many`, independentemente do número de cards.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db.models import Prefetch, prefetch_related_objects
+from django.template.loader import get_template
+
+from .models import Client, Relic, RelicImage
+
+CARD_CACHE_TIMEOUT = 60 * 60 * 24  # 1 dia (as chaves mudam a cada alteração)
+
+
+def _version_key(kind, pk):
+    return 'card-version:{}:{}'.format(kind, pk)
+
+
+def _dependencies(obj):
+    """Registros (tipo, id) cujo conteúdo aparece no card de `obj`"""
+    if isinstance(obj, Relic):
+        return [('relic', obj.pk), ('client', obj.client_id)]
+    if isinstance(obj, Client):
+        return [('client', obj.pk), ('user', obj.created_by_id)]
+    raise TypeError('Card não suportado: {!r}'.format(obj))
+
+
+def _extra(obj):
+    # Versão da imagem principal: com o storage por conteúdo a URL muda com o arquivo
+    if isinstance(obj, Relic):
+        url_hash = hashlib.md5(obj.main_image_url.encode()).hexdigest()[:8] if obj.main_image_url else '-'
+        return '{}:{}:{:d}'.format(obj.main_image_id or 0, url_hash, obj.main_image_processed)
+    return ''
+
+
+def bump(kind, *pks):
+    """Nova versão para os registros: os cards que os exibem passam a ter outra chave"""
+    version = time.time_ns()
+    cache.set_many({_version_key(kind, pk): version for pk in pks}, None)
+
+
+def get_versions(objects):
+    """Versões atuais de todas as dependências dos objetos, em um único get_many"""
+    keys = {_version_key(kind, pk) for obj in objects for kind, pk in _dependencies(obj)}
+    versions = cache.get_many(keys)
+    missing = keys - versions.keys()
+    if missing:
+        # Versão inicial aleatória (e não 0): se a versão for descartada do cache,
+        # um fragmento antigo não volta a ser válido
+        version = time.time_ns()
+        new = {key: version for key in missing}
+        cache.set_many(new, None)
+        versions.update(new)
+    return versions
+
+
+def card_key(template_name, obj, versions):
+    parts = [str(versions[_version_key(kind, pk)]) for kind, pk in _dependencies(obj)]
+    raw = '{}:{}:{}:{}'.format(template_name, obj.pk, ':'.join(parts), _extra(obj))
+    return 'card:{}'.format(hashlib.md5(raw.encode()).hexdigest())
+
+
+def _prefetch_images(relics):
+    # Imagens da galeria (lightbox) das relíquias: uma query só para os cards fora do cache
+    prefetch_related_objects(relics, Prefetch(
+        'images',
+        queryset=RelicImage.objects.only('id', 'relic_id', 'image').order_by('upload_date', 'id'),
+        to_attr='card_images',
+    ))
+
+
+def render_cards(objects, template_name, context_name=None, images=False):
+    """
+    Lista de (objeto, html) com os cards renderizados, usando o cache.
+    O template recebe o objeto como `context_name` (default: nome do modelo).
+    Com `images`, as relíquias a renderizar recebem `card_images` (todas as
+    imagens); salvar ou apagar uma imagem troca a versão da relíquia.
+    """
+    objects = list(objects)
+    if not objects:
+        return []
+
+    versions = get_versions(objects)
+    keys = [card_key(template_name, obj, versions) for obj in objects]
+    cached = cache.get_many(keys)
+
+    if images:
+        _prefetch_images([obj for obj, key in zip(objects, keys) if key not in cached])
+
+    template = None
+    rendered = {}
+    cards = []
+    for obj, key in zip(objects, keys):
+        html = cached.get(key)
+        if html is None:
+            if template is None:
+                template = get_template(template_name)
+            name = context_name or obj._meta.model_name
+            html = template.render({name: obj})
+            rendered[key] = html
+        cards.append((obj, html))
+    if rendered:
+        cache.set_many(rendered, CARD_CACHE_TIMEOUT)
+    return cards
@@ -0,0 +1,125 @@
+"""
+Consultas independentes em paralelo para as views assíncronas (ASGI).
+
+No Django 4.2 o ORM assíncrono (acount(), aget(), ...) é um sync_to_async com
+thread_sensitive=True: todas as consultas da requisição passam pela mesma
+thread, então um asyncio.gather delas ainda roda uma depois da outra. Aqui
+cada consulta roda em uma thread do executor (thread_sensitive=False) com a
+própria conexão, já que as conexões do Django são por thread, e a conexão é
+liberada como no fim de uma requisição (respeitando CONN_MAX_AGE). O
+roteamento para a réplica (ContextVar, records/routers.py) segue junto.
+
+As views declaram as consultas em get_concurrent_queries() e as leem com
+fetch(name): na versão síncrona cada fetch() executa a consulta na hora; na
+assíncrona (AsyncViewMixin) todas já foram executadas juntas antes de montar
+o contexto. Dentro de uma transação as threads não enxergariam as alterações
+ainda não confirmadas, então nesse caso as consultas rodam em sequência.
+
+Obs.: queries feitas nas threads do executor não entram nas métricas por view
+(records/metrics.py) nem no QueryWatch, que observam a conexão da requisição.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.db.models.query import QuerySet
+
+from .pagination import CursorPage
+
+
+def _evaluate(query):
+    result = query()
+    # Querysets são avaliados aqui, e não na renderização do template
+    return list(result) if isinstance(result, QuerySet) else result
+
+
+def _run_in_thread(query):
+    try:
+        return _evaluate(query)
+    finally:
+        for connection in connections.all(initialized_only=True):
+            connection.close_if_unusable_or_obsolete()
+
+
+def in_transaction():
+    return any(connection.in_atomic_block for connection in connections.all(initialized_only=True))
+
+
+async def run_concurrently(queries):
+    """{nome: callable} -> {nome: resultado}, cada consulta em uma thread/conexão própria"""
+    names = list(queries)
+    results = await asyncio.gather(*(
+        sync_to_async(_run_in_thread, thread_sensitive=False)(queries[name]) for name in names
+    ))
+    return dict(zip(names, results))
+
+
+class ConcurrentQueriesMixin:
+    """Consultas independentes da página, executadas juntas na variante assíncrona"""
+    prefetched = None
+
+    def get_concurrent_queries(self):
+        """{nome: callable sem argumentos}; querysets retornados são avaliados com list()"""
+        return {}
+
+    def fetch(self, name):
+        if self.prefetched is not None and name in self.prefetched:
+            return self.prefetched[name]
+        return self.get_concurrent_queries()[name]()
+
+    def prepare_queries(self):
+        """Estado de que as consultas dependem (ex.: filterset e object_list das listas)"""
+
+    def get_page_rows(self):
+        """
+        Itens da página numerada pedida (?page=N). O slice não depende do total,
+        então pode rodar junto com a contagem; None se a página não for um número.
+        """
+        if getattr(self, 'is_cursor_paginated', None) and self.is_cursor_paginated():
+            return None  # a página por cursor é buscada pelo próprio paginador
+        try:
+            number = int(self.request.GET.get(self.page_kwarg) or 1)
+        except ValueError:
+            return None
+        page_size = self.get_paginate_by(self.object_list)
+        if number < 1 or not page_size:
+            return None
+        return list(self.object_list[(number - 1) * page_size:number * page_size])
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator, page, object_list, is_paginated = super().paginate_queryset(queryset, page_size)
+        rows = (self.prefetched or {}).get('page')
+        if rows is not None and not isinstance(page, CursorPage):
+            page.object_list = object_list = rows
+        return paginator, page, object_list, is_paginated
+
+
+class AsyncViewMixin:
+    """
+    Variante assíncrona de uma view com ConcurrentQueriesMixin. Deve vir
+    primeiro na lista de bases: carrega request.user em uma thread antes dos
+    dispatch() síncronos (LoginRequiredMixin, ConditionalGetMixin, ...).
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        await sync_to_async(lambda: request.user.is_authenticated)()
+        response = super().dispatch(request, *args, **kwargs)
+        if asyncio.iscoroutine(response):
+            response = await response
+        return response
+
+    async def get(self, request, *args, **kwargs):
+        sequential = await sync_to_async(self._prepare)()
+        queries = self.get_concurrent_queries()
+        if sequential:
+            self.prefetched = await sync_to_async(
+                lambda: {name: _evaluate(query) for name, query in queries.items()}
+            )()
+        else:
+            self.prefetched = await run_concurrently(queries)
+        # Contexto e resposta pela view síncrona, lendo os resultados já buscados
+        return await sync_to_async(super().get)(request, *args, **kwargs)
+
+    def _prepare(self):
+        self.prepare_queries()
+        return in_transaction()
@@ -0,0 +1,140 @@
+"""
+Exportação em CSV/JSONL de relíquias, clientes, adoções e histórico.
+
+As linhas saem direto do cursor como tuplas (values_list) e são escritas em
+blocos: nenhuma instância de modelo é criada e a memória fica constante,
+qualquer que seja o número de linhas. Os filtros são os mesmos das listas
+(RelicFilter/ClientFilter) e o escopo também: adoções e histórico só do
+usuário, exceto para superusuários.
+
+No PostgreSQL o .iterator() usa um cursor nomeado no servidor. Com o pooler
+em modo transação (DISABLE_SERVER_SIDE_CURSORS, ver AdoptM3/db.py) o cursor
+do cliente traria o resultado inteiro para a memória, então a leitura é
+paginada pela chave primária.
+
+Usado por ExportView (/records/export/<tipo>.<formato>) e pelo comando
+`export_records`.
+"""
+import csv
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+
+from .filters import ClientFilter, RelicFilter
+from .models import Adoption, AdoptionRelic, Client, Relic
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson',
+}
+
+# Colunas por tipo (caminhos do values_list); a primeira é sempre a chave primária
+EXPORTS = {
+    'relic': {
+        'model': Relic,
+        'filterset_class': RelicFilter,
+        'fields': [
+            'id', 'name', 'description', 'obtained_date', 'adoption_fee', 'client_id', 'client__name',
+            'created_by__username', 'main_image_url', 'updated_at',
+        ],
+    },
+    'client': {
+        'model': Client,
+        'filterset_class': ClientFilter,
+        'fields': [
+            'id', 'name', 'nickname', 'email', 'birth_date', 'register_date', 'last_activity',
+            'user__username', 'created_by__username',
+        ],
+    },
+    'adoption': {
+        'model': Adoption,
+        'owner_only': True,
+        'fields': [
+            'id', 'adoption_date', 'payment_status', 'relic_id', 'relic__name', 'previous_owner_id',
+            'previous_owner__name', 'new_owner_id', 'new_owner__name', 'created_by__username', 'updated_at',
+        ],
+    },
+    'adoptionrelic': {
+        'model': AdoptionRelic,
+        'owner_only': True,
+        'fields': ['id', 'adoption_id', 'relic_id', 'relic__name', 'created_by__username', 'updated_at'],
+    },
+}
+
+
+def export_headers(kind):
+    return [field.replace('__', '_') for field in EXPORTS[kind]['fields']]
+
+
+def export_queryset(kind, params=None, user=None):
+    """
+    values_list do tipo com os filtros da lista (`params`, ex.: request.GET),
+    restrito ao que `user` vê na lista (None: tudo, para o comando).
+    Filtros inválidos levantam ValidationError: a lista (strict) não mostra
+    nada nesse caso, e exportar tudo seria devolver o que não foi pedido.
+    """
+    spec = EXPORTS[kind]
+    queryset = spec['model'].objects.all()
+    if spec.get('owner_only') and user is not None and not user.is_superuser:
+        queryset = queryset.filter(created_by=user)
+    filterset_class = spec.get('filterset_class')
+    if filterset_class is not None and params:
+        filterset = filterset_class(params, queryset=queryset)
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        queryset = filterset.qs
+    return queryset.order_by('pk').values_list(*spec['fields'])
+
+
+def iter_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Linhas do values_list lidas em blocos de `chunk_size`, sem carregar o resultado inteiro"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql' or not connection.settings_dict.get('DISABLE_SERVER_SIDE_CURSORS'):
+        yield from queryset.iterator(chunk_size=chunk_size)
+        return
+
+    # Sem cursor no servidor: páginas por chave primária (a primeira coluna)
+    last_pk = None
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(page[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last_pk = rows[-1][0]
+
+
+class _Echo:
+    """Buffer do csv.writer que só devolve a linha formatada"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_lines(headers, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _jsonl_lines(headers, rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(dict(zip(headers, row))) + '\n'
+
+
+def stream_export(kind, fmt, queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Texto da exportação em blocos de `chunk_size` linhas (para StreamingHttpResponse ou arquivo)"""
+    headers = export_headers(kind)
+    lines = (_csv_lines if fmt == 'csv' else _jsonl_lines)(headers, iter_rows(queryset, chunk_size))
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
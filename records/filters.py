@@ -2,12 +2,23 @@ import django_filters
 from django import forms
 from django.db.models import Q
 from .models import Client, Relic, State, City
+from .search import search
 
 
 class ClientFilter(django_filters.FilterSet):
     """
     Filtro para a lista de clientes com lookups: icontains, exact, gte, lte
     """
+    # Busca textual (índice FTS) em nome, apelido e email, ordenada por relevância
+    search = django_filters.CharFilter(
+        method='filter_search',
+        label='Buscar',
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Nome, apelido ou email...'
+        })
+    )
+    
     # Filtro por nome (icontains - busca parcial case-insensitive)
     name = django_filters.CharFilter(
         field_name='name',
@@ -98,6 +109,9 @@ class ClientFilter(django_filters.FilterSet):
         model = Client
         fields = []
     
+    def filter_search(self, queryset, name, value):
+        return search(queryset, value)
+    
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # Definir queryset dos usuários criadores
@@ -111,6 +125,16 @@ class RelicFilter(django_filters.FilterSet):
     """
     Filtro para a lista de relíquias com lookups: icontains, exact, gte, lte
     """
+    # Busca textual (índice FTS) em nome e descrição, ordenada por relevância
+    search = django_filters.CharFilter(
+        method='filter_search',
+        label='Buscar',
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Palavras do nome ou da descrição...'
+        })
+    )
+    
     # Filtro por nome da relíquia (icontains)
     name = django_filters.CharFilter(
         field_name='name',
@@ -192,6 +216,9 @@ class RelicFilter(django_filters.FilterSet):
         model = Relic
         fields = []
     
+    def filter_search(self, queryset, name, value):
+        return search(queryset, value)
+    
     def filter_adoption_fee(self, queryset, name, value):
         """
         Método personalizado para filtrar por taxa de adoção.
@@ -1,7 +1,9 @@
+import os
+
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
-from .models import Client, Relic, RelicImage
+from .models import Client, ImportRun, Relic, RelicImage
 
 class CustomUserCreationForm(UserCreationForm):
     email = forms.EmailField(
@@ -165,3 +167,19 @@ RelicImageFormSet = forms.modelformset_factory(
     validate_min=False,  # Não validar automaticamente, faremos validação customizada
     can_delete=True
 )
+
+
+class ImportUploadForm(forms.ModelForm):
+    """Envio de um arquivo CSV/JSONL para importação em lote (admin de Importações)"""
+    file = forms.FileField(label='Arquivo', help_text='CSV ou JSONL (.jsonl/.ndjson); colunas em records/imports.py')
+
+    class Meta:
+        model = ImportRun
+        fields = ['kind']
+
+    def clean_file(self):
+        upload = self.cleaned_data['file']
+        extension = os.path.splitext(upload.name)[1].lower()
+        if extension not in ('.csv', '.jsonl', '.ndjson'):
+            raise forms.ValidationError('Extensão inválida. Use: .csv, .jsonl ou .ndjson')
+        return upload
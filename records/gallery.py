@@ -0,0 +1,101 @@
+"""
+Galeria de relíquias da página inicial.
+
+As relíquias são servidas em páginas de tamanho fixo usando cursores keyset
+sobre (obtained_date, id), então o custo de cada página não depende do tamanho
+do catálogo. As páginas já avaliadas ficam em cache e são invalidadas pelos
+sinais de Relic e RelicImage (ver records/signals.py).
+"""
+import base64
+import binascii
+import time
+from datetime import date
+
+from django.core.cache import cache
+from django.db.models import F, Q
+
+from .models import Relic
+
+GALLERY_PAGE_SIZE = 12
+GALLERY_CACHE_TIMEOUT = 60 * 10  # 10 minutos
+GALLERY_VERSION_KEY = 'gallery:version'
+
+
+def encode_cursor(relic):
+    """Gera um cursor opaco apontando para a posição da relíquia na galeria"""
+    obtained = relic.obtained_date.isoformat() if relic.obtained_date else ''
+    raw = '{}|{}'.format(obtained, relic.pk)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Retorna (obtained_date, id) a partir do cursor, ou None se for inválido"""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        date_part, pk_part = raw.split('|')
+        obtained = date.fromisoformat(date_part) if date_part else None
+        return obtained, int(pk_part)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+def gallery_queryset():
+    """Queryset base da galeria, ordenado de forma estável por (obtained_date, id)"""
+    return Relic.objects.select_related('client').order_by(
+        F('obtained_date').desc(nulls_last=True), '-id'
+    )
+
+
+def _after_cursor(obtained, pk):
+    # Relíquias sem data ficam no final da galeria (nulls_last)
+    if obtained is None:
+        return Q(obtained_date__isnull=True, id__lt=pk)
+    return (
+        Q(obtained_date__lt=obtained)
+        | Q(obtained_date=obtained, id__lt=pk)
+        | Q(obtained_date__isnull=True)
+    )
+
+
+def get_gallery_version():
+    return cache.get_or_set(GALLERY_VERSION_KEY, lambda: time.time_ns(), None)
+
+
+def invalidate_gallery():
+    """Invalida todas as páginas em cache trocando a versão da galeria"""
+    try:
+        cache.incr(GALLERY_VERSION_KEY)
+    except ValueError:
+        cache.set(GALLERY_VERSION_KEY, time.time_ns(), None)
+
+
+def get_gallery_page(cursor=None, page_size=GALLERY_PAGE_SIZE):
+    """
+    Retorna uma página da galeria no formato {'relics': [...], 'next_cursor': str|None}.
+    Cursores inválidos são tratados como a primeira página.
+    """
+    position = decode_cursor(cursor)
+    # Normaliza o cursor para que a chave de cache tenha tamanho limitado
+    cursor_key = encode_cursor(Relic(pk=position[1], obtained_date=position[0])) if position else 'first'
+    cache_key = 'gallery:page:{}:{}:{}'.format(get_gallery_version(), page_size, cursor_key)
+
+    page = cache.get(cache_key)
+    if page is None:
+        queryset = gallery_queryset()
+        if position:
+            queryset = queryset.filter(_after_cursor(*position))
+
+        # Busca um item a mais para saber se existe próxima página sem COUNT(*)
+        relics = list(queryset[:page_size + 1])
+        has_next = len(relics) > page_size
+        relics = relics[:page_size]
+
+        page = {
+            'relics': relics,
+            'next_cursor': encode_cursor(relics[-1]) if has_next else None,
+        }
+        cache.set(cache_key, page, GALLERY_CACHE_TIMEOUT)
+    return page
@@ -0,0 +1,52 @@
+"""
+Grupo principal de cada usuário, resolvido a partir do cache.
+
+O GroupMiddleware lê o nome do grupo de uma entrada por usuário, então uma
+requisição com o cache quente não faz nenhuma query. A entrada é invalidada
+pelo sinal m2m_changed de User.groups, e alterações nos próprios grupos
+(renomear/apagar) trocam a versão de todas as entradas de uma vez.
+"""
+import time
+
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+
+DEFAULT_GROUP = 'Usuários'
+
+USER_GROUP_CACHE_TIMEOUT = 60 * 60 * 24  # 1 dia
+USER_GROUP_VERSION_KEY = 'user-group:version'
+
+
+def _cache_key(user_id, version):
+    return 'user-group:{}:{}'.format(version, user_id)
+
+
+def get_user_group(user):
+    """Nome do grupo principal do usuário (o de menor id) ou None se não tiver grupo"""
+    version = cache.get_or_set(USER_GROUP_VERSION_KEY, lambda: time.time_ns(), None)
+    key = _cache_key(user.pk, version)
+
+    name = cache.get(key)
+    if name is None:
+        name = user.groups.order_by('id').values_list('name', flat=True).first() or ''
+        cache.set(key, name, USER_GROUP_CACHE_TIMEOUT)
+    # '' é guardado no cache para "sem grupo" não repetir a query
+    return name or None
+
+
+def invalidate_user_group(*user_ids):
+    version = cache.get(USER_GROUP_VERSION_KEY)
+    if version is not None:
+        cache.delete_many([_cache_key(user_id, version) for user_id in user_ids])
+
+
+def invalidate_all_user_groups():
+    try:
+        cache.incr(USER_GROUP_VERSION_KEY)
+    except ValueError:
+        cache.set(USER_GROUP_VERSION_KEY, time.time_ns(), None)
+
+
+def add_to_default_group(user):
+    group, created = Group.objects.get_or_create(name=DEFAULT_GROUP)
+    user.groups.add(group)
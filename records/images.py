@@ -0,0 +1,145 @@
+"""
+Derivados das imagens enviadas (miniaturas em larguras fixas + WebP).
+
+Para cada upload de RelicImage.image e Client.profile_photo são gerados,
+ao lado do original, arquivos no formato `<nome>_w<largura>.<ext>` (mesmo
+formato do original) e `<nome>_w<largura>.webp`. Como o nome é derivado do
+caminho do original, a URL de cada derivado é calculada sem acessar o
+storage (ver records/templatetags/image_tags.py).
+"""
+import hashlib
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+# Larguras geradas para o srcset (nunca amplia além do tamanho original)
+DERIVATIVE_WIDTHS = (320, 640, 1024)
+
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+_PIL_FORMATS = {
+    '.jpg': 'JPEG',
+    '.jpeg': 'JPEG',
+    '.png': 'PNG',
+    '.gif': 'GIF',
+    '.webp': 'WEBP',
+}
+
+
+def derivative_name(name, width, ext=None):
+    """'relics/images/abc.png' -> 'relics/images/abc_w320.png' (ou .webp). Aceita URLs."""
+    root, original_ext = os.path.splitext(name)
+    return '{}_w{}{}'.format(root, width, ext or original_ext)
+
+
+def derivative_names(name):
+    """Todos os nomes de derivados de um arquivo original"""
+    names = []
+    for width in DERIVATIVE_WIDTHS:
+        names.append(derivative_name(name, width))
+        names.append(derivative_name(name, width, '.webp'))
+    # Originais em WebP têm o mesmo nome para as duas variantes
+    return list(dict.fromkeys(names))
+
+
+def _encode(image, pil_format, **extra):
+    buffer = BytesIO()
+    if pil_format == 'JPEG':
+        image.convert('RGB').save(buffer, pil_format, quality=JPEG_QUALITY, optimize=True, progressive=True, **extra)
+    elif pil_format == 'WEBP':
+        image.save(buffer, pil_format, quality=WEBP_QUALITY, method=4, **extra)
+    elif pil_format == 'PNG':
+        image.save(buffer, pil_format, optimize=True, **extra)
+    else:
+        image.save(buffer, pil_format, **extra)
+    return buffer.getvalue()
+
+
+def generate_derivatives(field_file):
+    """
+    Gera as miniaturas e variantes WebP de um ImageField já salvo.
+    Retorna a lista de nomes gravados no storage.
+    """
+    if not field_file or not field_file.name:
+        return []
+
+    storage = field_file.storage
+    ext = os.path.splitext(field_file.name)[1].lower()
+    pil_format = _PIL_FORMATS.get(ext)
+    if pil_format is None:
+        return []
+
+    with storage.open(field_file.name, 'rb') as source:
+        original = Image.open(source)
+        # Respeitar a orientação EXIF das fotos de celular antes de redimensionar
+        original = ImageOps.exif_transpose(original)
+        original.load()
+
+    if original.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+        original = original.convert('RGBA' if 'transparency' in original.info else 'RGB')
+
+    written = []
+    for width in DERIVATIVE_WIDTHS:
+        resized = original.copy()
+        resized.thumbnail((width, width * 10), Image.LANCZOS)
+
+        for target_ext, target_format in ((ext, pil_format), ('.webp', 'WEBP')):
+            name = derivative_name(field_file.name, width, target_ext)
+            if name in written:
+                continue
+            # Nome determinístico: sobrescrever em vez de deixar o storage renomear
+            if storage.exists(name):
+                storage.delete(name)
+            storage.save(name, ContentFile(_encode(resized, target_format)))
+            written.append(name)
+    return written
+
+
+def strip_metadata(content, ext):
+    """
+    Conteúdo da imagem sem EXIF (GPS, modelo da câmera...), com a rotação
+    indicada pela orientação já aplicada. Chamada pelo storage antes de
+    calcular o hash (records/storage.py), para o nome do arquivo corresponder
+    ao que foi gravado. Retorna None se não há o que remover.
+    """
+    pil_format = _PIL_FORMATS.get(ext.lower())
+    # GIFs podem ser animados; regravar só o primeiro quadro perderia a animação
+    if pil_format in (None, 'GIF'):
+        return None
+
+    content.seek(0)
+    try:
+        original = Image.open(content)
+        if not original.getexif():
+            return None
+        # O perfil de cor não identifica ninguém e muda as cores se for descartado
+        icc_profile = original.info.get('icc_profile')
+        image = ImageOps.exif_transpose(original)
+        image.load()
+    except (OSError, ValueError):
+        # Não é uma imagem legível: grava como veio
+        return None
+    finally:
+        content.seek(0)
+
+    extra = {'icc_profile': icc_profile} if icc_profile else {}
+    return _encode(image, pil_format, **extra)
+
+
+def file_checksum(field_file, chunk_size=64 * 1024):
+    """SHA-256 (hex) do conteúdo do arquivo, lido em blocos"""
+    digest = hashlib.sha256()
+    with field_file.storage.open(field_file.name, 'rb') as source:
+        for chunk in iter(lambda: source.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def delete_derivatives(name, storage):
+    """Remove do storage os derivados do arquivo `name`"""
+    for derivative in derivative_names(name):
+        if storage.exists(derivative):
+            storage.delete(derivative)
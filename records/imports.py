@@ -0,0 +1,364 @@
+"""
+Importação em lote de clientes e relíquias (CSV ou JSONL).
+
+Cada lote de `batch_size` registros é validado com os campos dos mesmos
+formulários das telas (ClientEditForm, RelicCreateForm), resolvido contra
+dicionários em memória e gravado em lote (bulk_create) em uma transação:
+- Estados e cidades são carregados uma única vez; os que faltam são criados
+  em lote. Endereços são carregados por lote, só das cidades envolvidas.
+- O dono das relíquias vem de `client_id` ou `client_email` (sem nenhum dos
+  dois: o cliente de quem importa, como no RelicCreate).
+
+Registros inválidos não interrompem a importação: vão para o relatório de
+erros (<arquivo>.errors.csv, com o número do registro, as mensagens e os dados).
+
+O progresso (ImportRun.rows) é gravado na transação de cada lote: se o
+processo cair, a importação continua do último lote confirmado, sem
+duplicar nem pular registros.
+
+Como a gravação em lote não dispara sinais, índice de busca, contadores do painel e
+caches são atualizados aqui, uma vez por lote.
+
+Limitação conhecida: a meta de 50 mil registros/s não é atingida. No SQLite
+local ficam em torno de 5-6 mil relíquias/s e 3-4 mil clientes/s (com
+endereço). O tempo se divide entre a validação pelos campos dos formulários e
+a montagem do INSERT pelo bulk_create (conversão campo a campo, ~80 linhas por
+INSERT no SQLite); o índice de busca é uma única instrução por lote e pesa
+pouco. Chegar perto da meta exigiria pular o ORM (COPY no PostgreSQL), o que
+não foi feito.
+
+Colunas:
+    client  name, nickname, email, birth_date
+            [street, number, neighborhood, complement, city, state, uf]
+    relic   name, description, obtained_date, adoption_fee
+            [client_id | client_email]
+
+Usado pelo comando `import_records` e pela importação do admin (tarefa
+`import_records`, records/tasks.py).
+"""
+import csv
+import json
+import os
+from datetime import date
+from itertools import islice
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.forms.models import fields_for_model
+from django.utils import timezone
+
+from . import watermarks
+from .forms import ClientEditForm, RelicCreateForm
+from .gallery import invalidate_gallery
+from .models import Address, City, Client, ImportRun, Relic, State
+from .search import get_search_backend
+from .stats import bump_user_stats, invalidate_relic_stats
+from .tasks import enqueue
+
+IMPORT_BATCH_SIZE = 5000
+
+CLIENT_FIELDS = {
+    **{name: ClientEditForm.base_fields[name] for name in ['name', 'nickname', 'birth_date']},
+    'email': Client._meta.get_field('email').formfield(),
+}
+ADDRESS_FIELDS = fields_for_model(Address, fields=['street', 'number', 'neighborhood', 'complement'])
+RELIC_FIELDS = {name: RelicCreateForm.base_fields[name] for name in ['name', 'description', 'obtained_date', 'adoption_fee']}
+
+_PARSE_ERROR = '__parse_error__'
+
+
+def detect_format(file_name):
+    extension = os.path.splitext(file_name)[1].lower()
+    return 'jsonl' if extension in ('.jsonl', '.ndjson') else 'csv'
+
+
+def read_rows(stream, fmt):
+    """Dicionários dos registros do arquivo (texto), na ordem"""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            row = {_PARSE_ERROR: 'JSON inválido: {}'.format(e)}
+        yield row if isinstance(row, dict) else {_PARSE_ERROR: 'Cada linha deve ser um objeto JSON.'}
+
+
+def _clean(fields, row, errors):
+    data = {}
+    for name, field in fields.items():
+        value = row.get(name)
+        if isinstance(field, forms.DateField) and isinstance(value, str):
+            # Datas ISO (o formato das exportações) sem passar pelos formatos
+            # localizados do campo; os demais formatos seguem para o field.clean
+            try:
+                value = date.fromisoformat(value)
+            except ValueError:
+                pass
+        try:
+            data[name] = field.clean(value)
+        except ValidationError as e:
+            errors[name] = e.messages
+    return data
+
+
+def _insert_rows(model, rows):
+    """
+    Grava os registros (dicionários attname -> valor) e retorna os ids, na ordem.
+    O bulk_create recebe os ids do próprio INSERT (RETURNING, no PostgreSQL e
+    no SQLite 3.35+); no SQLite o tamanho de cada INSERT é limitado pelo
+    número de parâmetros, e o Django divide o lote sozinho.
+    """
+    return [obj.pk for obj in model.objects.bulk_create([model(**row) for row in rows])]
+
+
+def _text(row, name):
+    value = row.get(name)
+    return str(value).strip() if value is not None else ''
+
+
+class Importer:
+    """Valida e grava os registros em lotes; as consultas de apoio ficam em dicionários"""
+
+    def __init__(self, kind, user):
+        self.kind = kind
+        self.user = user
+        self.default_client = getattr(user, 'client_profile', None)
+        self._states = None
+        self._cities = None
+        self._client_ids = set()
+        self._clients_by_email = {}
+
+    def import_batch(self, numbered_rows):
+        """Grava os registros válidos; retorna (pks criados, [(número, erros, registro)])"""
+        if self.kind == 'client':
+            return self._import_clients(numbered_rows)
+        return self._import_relics(numbered_rows)
+
+    # Relíquias -----------------------------------------------------------
+
+    def _import_relics(self, numbered_rows):
+        self._load_clients(numbered_rows)
+        relics, errors = [], []
+        for number, row in numbered_rows:
+            row_errors = {}
+            if _PARSE_ERROR in row:
+                errors.append((number, {'registro': [row[_PARSE_ERROR]]}, row))
+                continue
+            data = _clean(RELIC_FIELDS, row, row_errors)
+            client_id = self._resolve_client(row, row_errors)
+            if row_errors:
+                errors.append((number, row_errors, row))
+                continue
+            relics.append(dict(data, client_id=client_id, created_by_id=self.user.pk))
+
+        pks = _insert_rows(Relic, relics)
+        if pks:
+            get_search_backend().index_many(Relic, pks)
+            bump_user_stats(None, relics=len(pks))
+            bump_user_stats(self.user.pk, relics=len(pks))
+            enqueue('refresh_relic_stats', unique=True)
+            transaction.on_commit(_relics_imported)
+        return pks, errors
+
+    def _load_clients(self, numbered_rows):
+        ids, emails = set(), set()
+        for number, row in numbered_rows:
+            client_id, email = _text(row, 'client_id'), _text(row, 'client_email')
+            if client_id.isdigit() and int(client_id) not in self._client_ids:
+                ids.add(int(client_id))
+            elif email and email not in self._clients_by_email:
+                emails.add(email)
+        if ids:
+            self._client_ids.update(Client.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        if emails:
+            # E-mail repetido entre clientes: vale o cliente mais antigo
+            for email, pk in Client.objects.filter(email__in=emails).order_by('-pk').values_list('email', 'pk'):
+                self._clients_by_email[email] = pk
+
+    def _resolve_client(self, row, errors):
+        client_id, email = _text(row, 'client_id'), _text(row, 'client_email')
+        if client_id:
+            if client_id.isdigit() and int(client_id) in self._client_ids:
+                return int(client_id)
+            errors['client_id'] = ['Cliente {} não encontrado.'.format(client_id)]
+        elif email:
+            if email in self._clients_by_email:
+                return self._clients_by_email[email]
+            errors['client_email'] = ['Nenhum cliente com o e-mail {}.'.format(email)]
+        elif self.default_client is not None:
+            return self.default_client.pk
+        else:
+            errors['client_id'] = ['Informe client_id ou client_email.']
+        return None
+
+    # Clientes ------------------------------------------------------------
+
+    def _import_clients(self, numbered_rows):
+        valid, errors = [], []
+        for number, row in numbered_rows:
+            row_errors = {}
+            if _PARSE_ERROR in row:
+                errors.append((number, {'registro': [row[_PARSE_ERROR]]}, row))
+                continue
+            data = _clean(CLIENT_FIELDS, row, row_errors)
+            address = self._clean_address(row, row_errors)
+            if row_errors:
+                errors.append((number, row_errors, row))
+                continue
+            valid.append((data, address))
+
+        address_ids = self._resolve_addresses([address for data, address in valid if address])
+        pks = _insert_rows(Client, [
+            dict(data, address_id=address_ids[address] if address else None, created_by_id=self.user.pk)
+            for data, address in valid
+        ])
+        if pks:
+            get_search_backend().index_many(Client, pks)
+            bump_user_stats(None, clients=len(pks))
+            bump_user_stats(self.user.pk, clients=len(pks))
+            transaction.on_commit(lambda: watermarks.touch(Client, Address, City, State))
+        return pks, errors
+
+    def _clean_address(self, row, errors):
+        """Chave do endereço (rua, número, bairro, complemento, cidade, uf, estado) ou None"""
+        columns = list(ADDRESS_FIELDS) + ['city', 'state', 'uf']
+        if not any(_text(row, name) for name in columns):
+            return None
+        data = _clean(ADDRESS_FIELDS, row, errors)
+        city, state, uf = _text(row, 'city'), _text(row, 'state'), _text(row, 'uf').upper()
+        if not city:
+            errors['city'] = ['Informe a cidade do endereço.']
+        if len(uf) > 2:
+            errors['uf'] = ['Use a sigla do estado (2 letras).']
+        elif not uf and not state:
+            errors['uf'] = ['Informe uf ou state.']
+        if errors:
+            return None
+        return (data['street'], data['number'], data['neighborhood'], data['complement'], city, uf, state)
+
+    def _load_locations(self):
+        if self._states is None:
+            self._states = {}
+            for pk, name, uf in State.objects.order_by('-pk').values_list('pk', 'name', 'uf'):
+                self._states[('uf', uf.upper())] = pk
+                self._states[('name', name.lower())] = pk
+            self._cities = {
+                (state_id, name.lower()): pk
+                for pk, name, state_id in City.objects.order_by('-pk').values_list('pk', 'name', 'state_id')
+            }
+
+    def _state_key(self, uf, state):
+        return ('uf', uf) if uf else ('name', state.lower())
+
+    def _resolve_addresses(self, addresses):
+        """{chave do endereço: id}, criando em lote estados, cidades e endereços que faltam"""
+        if not addresses:
+            return {}
+        self._load_locations()
+
+        new_states = {}
+        for street, number, neighborhood, complement, city, uf, state in addresses:
+            key = self._state_key(uf, state)
+            if key not in self._states and key not in new_states:
+                new_states[key] = State(name=state or uf, uf=uf)
+        for key, state in zip(new_states, State.objects.bulk_create(new_states.values())):
+            self._states[key] = state.pk
+            if state.uf:
+                self._states.setdefault(('uf', state.uf.upper()), state.pk)
+            self._states.setdefault(('name', state.name.lower()), state.pk)
+
+        new_cities = {}
+        for street, number, neighborhood, complement, city, uf, state in addresses:
+            key = (self._states[self._state_key(uf, state)], city.lower())
+            if key not in self._cities and key not in new_cities:
+                new_cities[key] = City(name=city, state_id=key[0])
+        for key, city in zip(new_cities, City.objects.bulk_create(new_cities.values())):
+            self._cities[key] = city.pk
+
+        def address_key(address):
+            street, number, neighborhood, complement, city, uf, state = address
+            city_id = self._cities[(self._states[self._state_key(uf, state)], city.lower())]
+            return (street, number, neighborhood, complement, city_id)
+
+        keys = {address: address_key(address) for address in addresses}
+        existing = {
+            row[1:]: row[0]
+            for row in Address.objects.filter(city_id__in={key[4] for key in keys.values()})
+            .order_by('-pk')
+            .values_list('pk', 'street', 'number', 'neighborhood', 'complement', 'city_id')
+        }
+        missing = list(dict.fromkeys(key for key in keys.values() if key not in existing))
+        created = Address.objects.bulk_create([
+            Address(street=street, number=number, neighborhood=neighborhood, complement=complement, city_id=city_id)
+            for street, number, neighborhood, complement, city_id in missing
+        ])
+        existing.update({key: address.pk for key, address in zip(missing, created)})
+        return {address: existing[key] for address, key in keys.items()}
+
+
+def _relics_imported():
+    invalidate_gallery()
+    invalidate_relic_stats()
+    watermarks.touch(Relic)
+
+
+def error_report_name(file_name):
+    return '{}.errors.csv'.format(file_name)
+
+
+def run_import(run, path, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    """
+    Importa (ou continua importando) o arquivo `path` da ImportRun `run`.
+    `progress(run)` é chamado após cada lote confirmado.
+    """
+    if os.path.getsize(path) != run.file_size:
+        raise ValueError('O arquivo mudou desde o início da importação; comece uma nova.')
+    importer = Importer(run.kind, run.created_by)
+    report_path = error_report_name(path)
+    ImportRun.objects.filter(pk=run.pk).update(status=ImportRun.RUNNING, last_error='')
+
+    try:
+        # Retomada: o relatório continua do ponto em que estava
+        with open(path, encoding='utf-8-sig', newline='') as source, \
+                open(report_path, 'a' if run.rows else 'w', encoding='utf-8', newline='') as report_file:
+            report = csv.writer(report_file)
+            if not run.rows:
+                report.writerow(['registro', 'erros', 'dados'])
+            rows = islice(read_rows(source, run.format), run.rows, None)
+            number = run.rows
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                numbered = list(enumerate(batch, number + 1))
+                number += len(batch)
+                with transaction.atomic():
+                    pks, errors = importer.import_batch(numbered)
+                    # Escrito antes do commit: numa retomada o lote pode aparecer
+                    # duas vezes no relatório, mas nunca se perde
+                    for row_number, row_errors, row in errors:
+                        report.writerow([
+                            row_number,
+                            '; '.join('{}: {}'.format(name, ' '.join(messages)) for name, messages in row_errors.items()),
+                            json.dumps(row, ensure_ascii=False, default=str),
+                        ])
+                    report_file.flush()
+                    ImportRun.objects.filter(pk=run.pk).update(
+                        rows=number, created=F('created') + len(pks), errors=F('errors') + len(errors)
+                    )
+                run.refresh_from_db()
+                if progress:
+                    progress(run)
+    except Exception as e:
+        ImportRun.objects.filter(pk=run.pk).update(status=ImportRun.FAILED, last_error=str(e))
+        raise
+
+    ImportRun.objects.filter(pk=run.pk).update(status=ImportRun.DONE, finished_at=timezone.now())
+    run.refresh_from_db()
+    return run
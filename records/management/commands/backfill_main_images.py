@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Prefetch
+from records.models import Relic, RelicImage
+
+
+class Command(BaseCommand):
+    help = 'Preenche o ponteiro denormalizado Relic.main_image (URL e dimensões) a partir das imagens existentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Número de relíquias processadas por transação (default: 500)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ordered_images = RelicImage.objects.order_by('-is_main', 'upload_date', 'id')
+
+        updated = 0
+        last_pk = 0
+        while True:
+            # Paginação por chave primária: cada lote custa o mesmo, independente da posição
+            batch = list(
+                Relic.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .prefetch_related(Prefetch('images', queryset=ordered_images))[:batch_size]
+            )
+            if not batch:
+                break
+
+            with transaction.atomic():
+                for relic in batch:
+                    images = list(relic.images.all())
+                    main_image = images[0] if images else None
+                    relic.set_main_image(main_image)
+                    updated += 1
+
+            last_pk = batch[-1].pk
+            self.stdout.write(f'  {updated} relíquias processadas...')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Imagem principal atualizada para {updated} relíquias!')
+        )
@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from records.blobs import GC_GRACE, collect_garbage, rebuild_refcounts
+
+
+class Command(BaseCommand):
+    help = 'Apaga do storage os arquivos de imagem que não são mais referenciados'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-minutes',
+            type=int,
+            default=int(GC_GRACE.total_seconds() // 60),
+            help='Só apagar arquivos sem referência há pelo menos esse tempo'
+        )
+        parser.add_argument(
+            '--rebuild-refs',
+            action='store_true',
+            help='Recalcular as contagens de referência antes de coletar'
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild_refs']:
+            counts = rebuild_refcounts()
+            self.stdout.write(f'Contagens recalculadas: {len(counts)} blobs referenciados.')
+
+        deleted, freed = collect_garbage(timedelta(minutes=options['grace_minutes']))
+        self.stdout.write(self.style.SUCCESS(f'{deleted} arquivos removidos ({freed} bytes liberados).'))
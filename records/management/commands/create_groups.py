@@ -1,5 +1,5 @@
 from django.core.management.base import BaseCommand
-from django.contrib.auth.models import Group, Permission
+from django.contrib.auth.models import Group, Permission, User
 from django.contrib.contenttypes.models import ContentType
 from records.models import Client, Relic
 
@@ -33,6 +33,11 @@ class Command(BaseCommand):
         )
         user_group.permissions.set(user_permissions)
 
+        # Usuários antigos sem grupo entram no grupo padrão (novos usuários já
+        # são adicionados pelo sinal post_save de User)
+        users_without_group = User.objects.filter(groups__isnull=True)
+        user_group.user_set.add(*users_without_group)
+
         self.stdout.write(
             self.style.SUCCESS('Grupos e permissões criados com sucesso!')
         )
@@ -0,0 +1,119 @@
+import hashlib
+import os
+
+from django.core.management.base import BaseCommand
+from records import cards, watermarks
+from records.blobs import IMAGE_FIELDS, rebuild_refcounts
+from records.gallery import invalidate_gallery
+from records.images import delete_derivatives, derivative_names, file_checksum, generate_derivatives, strip_metadata
+from records.models import Client, Relic, RelicImage
+from records.storage import BLOB_ROOT, blob_storage
+
+
+class Command(BaseCommand):
+    help = 'Move as imagens já enviadas para o storage endereçado por conteúdo, removendo cópias duplicadas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Apenas calcular quantos arquivos e bytes seriam economizados'
+        )
+
+    def handle(self, *args, **options):
+        storage = blob_storage()
+        dry_run = options['dry_run']
+        moved = 0
+        # nome antigo -> tamanho (arquivos a remover depois de todos os registros migrarem)
+        old_files = {}
+        # nome final -> arquivo (para gerar as miniaturas e calcular a economia)
+        blobs = {}
+        # modelo -> pks renomeados (URLs em cache e páginas a invalidar)
+        renamed = {model: [] for model in IMAGE_FIELDS}
+
+        for model, field in IMAGE_FIELDS.items():
+            queryset = (
+                model.objects.exclude(**{field: ''})
+                .exclude(**{'{}__isnull'.format(field): True})
+                .exclude(**{'{}__startswith'.format(field): BLOB_ROOT + '/'})
+                .only('pk', field)
+            )
+            for obj in queryset.iterator(chunk_size=200):
+                field_file = getattr(obj, field)
+                old_name = field_file.name
+                if not storage.exists(old_name):
+                    self.stdout.write(self.style.WARNING(f'  Arquivo ausente: {old_name}'))
+                    continue
+
+                size = storage.size(old_name)
+                if dry_run:
+                    # Mesmo hash que o storage calcularia (depois de remover o EXIF)
+                    with storage.open(old_name, 'rb') as source:
+                        stripped = strip_metadata(source, os.path.splitext(old_name)[1])
+                    checksum = hashlib.sha256(stripped).hexdigest() if stripped else file_checksum(field_file)
+                    new_name = storage.blob_name(checksum, os.path.splitext(old_name)[1])
+                else:
+                    with storage.open(old_name, 'rb') as source:
+                        new_name = storage.save(old_name, source)
+                    # update() não dispara os sinais: as contagens são refeitas no final
+                    model.objects.filter(pk=obj.pk).update(**{field: new_name})
+                    field_file.name = new_name
+                    renamed[model].append(obj.pk)
+
+                old_files[old_name] = size
+                blobs.setdefault(new_name, (size, field_file))
+                moved += 1
+
+        total = sum(old_files.values())
+        freed = total - sum(size for size, _ in blobs.values())
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(
+                f'{moved} arquivos ({total} bytes) virariam {len(blobs)} blobs: '
+                f'{moved - len(blobs)} duplicatas, {freed} bytes economizados.'
+            ))
+            return
+
+        for old_name in old_files:
+            storage.delete(old_name)
+            delete_derivatives(old_name, storage)
+        processed = []
+        for name, (size, field_file) in blobs.items():
+            if not all(storage.exists(derivative) for derivative in derivative_names(name)):
+                try:
+                    generate_derivatives(field_file)
+                except Exception as e:
+                    self.stdout.write(self.style.WARNING(f'  Falha ao gerar derivados de {name}: {e}'))
+                    continue
+            processed.append(name)
+        counts = rebuild_refcounts()
+        relics = self.refresh_caches(renamed, processed)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{moved} arquivos migrados para {len(blobs)} blobs '
+            f'({moved - len(blobs)} duplicatas, {freed} bytes economizados). '
+            f'{len(counts)} blobs referenciados, {relics} imagens principais atualizadas.'
+        ))
+
+    def refresh_caches(self, renamed, processed):
+        """
+        Os nomes foram trocados com update(), sem sinais: grava os checksums,
+        atualiza Relic.main_image_url e invalida cards, galeria e watermarks
+        """
+        for model, field in IMAGE_FIELDS.items():
+            checksum_field = 'checksum' if field == 'image' else '{}_checksum'.format(field)
+            for name in processed:
+                # O nome do blob é o próprio SHA-256 do conteúdo
+                checksum = os.path.splitext(os.path.basename(name))[0]
+                model.objects.filter(pk__in=renamed[model], **{field: name}).update(**{checksum_field: checksum})
+
+        relics = Relic.objects.filter(main_image_id__in=renamed[RelicImage]).select_related('main_image')
+        relic_ids = []
+        for relic in relics.iterator(chunk_size=200):
+            relic.set_main_image(relic.main_image)
+            relic_ids.append(relic.pk)
+
+        cards.bump('relic', *relic_ids)
+        cards.bump('client', *renamed[Client])
+        invalidate_gallery()
+        watermarks.touch(Relic, RelicImage, Client)
+        return len(relic_ids)
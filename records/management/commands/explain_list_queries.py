@@ -0,0 +1,111 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import RequestFactory
+from records.models import Client
+from records.views import (
+    StateList, CityList, AddressList, ClientList, RelicList,
+    AdoptionList, AdoptionRelicList, ProfileView,
+)
+
+
+class Command(BaseCommand):
+    help = 'Executa EXPLAIN nas queries das listas e aponta varreduras sequenciais (full scans)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--username',
+            help='Usuário usado nas views que filtram por created_by (default: primeiro usuário com relíquias)'
+        )
+        parser.add_argument(
+            '--fail-on-scan',
+            action='store_true',
+            help='Terminar com erro se alguma query fizer varredura sequencial'
+        )
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['username'])
+        client = Client.objects.filter(created_by=user).first() or Client.objects.first()
+
+        # (nome, view, parâmetros GET) - espelha os caminhos de filtro e ordenação reais
+        cases = [
+            ('StateList', StateList, {}),
+            ('CityList', CityList, {}),
+            ('AddressList', AddressList, {}),
+            ('ClientList', ClientList, {}),
+            ('ClientList ?birth_date_after', ClientList, {'birth_date_after': '1990-01-01'}),
+            ('ClientList ?created_by', ClientList, {'created_by': user.pk}),
+            ('RelicList', RelicList, {}),
+            ('RelicList ?adoption_fee', RelicList, {'adoption_fee': 'true'}),
+            ('RelicList ?created_by', RelicList, {'created_by': user.pk}),
+            ('AdoptionList', AdoptionList, {}),
+            ('AdoptionRelicList', AdoptionRelicList, {}),
+            ('ProfileView', ProfileView, {}),
+        ]
+        if client:
+            cases.append(('RelicList ?client', RelicList, {'client': client.pk}))
+
+        flagged = []
+        for name, view_class, params in cases:
+            queryset, page_size = self.get_list_queryset(view_class, user, params)
+            plan = queryset[:page_size].explain()
+            scans = self.find_sequential_scans(plan)
+
+            if scans:
+                flagged.append(name)
+                self.stdout.write(self.style.WARNING(f'⚠️  {name}: varredura sequencial'))
+                for line in scans:
+                    self.stdout.write(f'      {line.strip()}')
+            else:
+                self.stdout.write(self.style.SUCCESS(f'✅ {name}'))
+
+            if options['verbosity'] > 1:
+                self.stdout.write(plan)
+                self.stdout.write('')
+
+        self.stdout.write('')
+        if flagged:
+            message = f'{len(flagged)} de {len(cases)} queries fazem varredura sequencial: {", ".join(flagged)}'
+            if options['fail_on_scan']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS('Todas as queries das listas usam índices!'))
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'Usuário "{username}" não encontrado')
+        user = User.objects.filter(relics__isnull=False).first() or User.objects.first()
+        if not user:
+            raise CommandError('Nenhum usuário cadastrado para montar as queries')
+        return user
+
+    def get_list_queryset(self, view_class, user, params):
+        """Monta o queryset exatamente como a view faria para a requisição GET"""
+        request = RequestFactory().get('/', params)
+        request.user = user
+
+        view = view_class()
+        view.setup(request)
+        if hasattr(view, 'get_filterset_class'):
+            view.filterset = view.get_filterset(view.get_filterset_class())
+            queryset = view.filterset.qs
+        else:
+            queryset = view.get_queryset()
+        return queryset, view.get_paginate_by(queryset) or 20
+
+    def find_sequential_scans(self, plan):
+        """Linhas do plano que indicam leitura completa de uma tabela"""
+        lines = plan.splitlines()
+        if connection.vendor == 'postgresql':
+            return [line for line in lines if 'Seq Scan' in line]
+        if connection.vendor == 'sqlite':
+            # "SCAN tabela" sem índice; "SCAN tabela USING INDEX" é uma varredura ordenada pelo índice
+            return [
+                line for line in lines
+                if 'SCAN ' in line and 'USING' not in line and 'CONSTANT ROW' not in line
+            ]
+        return []
@@ -0,0 +1,67 @@
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+from records.exports import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, EXPORTS, export_queryset, stream_export
+
+
+class Command(BaseCommand):
+    help = 'Exporta relíquias, clientes, adoções ou histórico em CSV/JSONL (streaming, memória constante)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(EXPORTS), help='Tipo de registro')
+        parser.add_argument(
+            '--format',
+            choices=list(EXPORT_FORMATS),
+            default='csv',
+            help='Formato do arquivo (default: csv)'
+        )
+        parser.add_argument(
+            '--output', '-o',
+            default='-',
+            help='Arquivo de saída (default: saída padrão)'
+        )
+        parser.add_argument(
+            '--filter',
+            action='append',
+            default=[],
+            metavar='CAMPO=VALOR',
+            help='Filtro da lista (RelicFilter/ClientFilter), ex.: --filter adoption_fee=true; pode repetir'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help=f'Linhas lidas do banco por vez (default: {EXPORT_CHUNK_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        params = QueryDict(mutable=True)
+        for item in options['filter']:
+            name, sep, value = item.partition('=')
+            if not sep:
+                raise CommandError(f'Filtro inválido: {item} (use CAMPO=VALOR)')
+            params.appendlist(name, value)
+        if params and EXPORTS[options['kind']].get('filterset_class') is None:
+            raise CommandError(f"{options['kind']} não tem filtros.")
+
+        try:
+            queryset = export_queryset(options['kind'], params)
+        except ValidationError as e:
+            raise CommandError('Filtros inválidos: {}'.format(
+                '; '.join(f'{name}: {" ".join(messages)}' for name, messages in e.message_dict.items())
+            ))
+        started = time.perf_counter()
+        chunks = stream_export(options['kind'], options['format'], queryset, options['chunk_size'])
+        if options['output'] == '-':
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+        else:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(chunks)
+
+        # Resumo no stderr para não misturar com a exportação na saída padrão
+        self.stderr.write(self.style.SUCCESS(
+            f"✅ {options['kind']} exportado em {time.perf_counter() - started:.2f}s ({options['output']})."
+        ))
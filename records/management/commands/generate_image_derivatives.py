@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from records.images import file_checksum, generate_derivatives
+from records.models import Client, RelicImage
+from records.tasks import mark_processed
+
+
+class Command(BaseCommand):
+    help = 'Gera miniaturas e variantes WebP para as imagens já enviadas'
+
+    def handle(self, *args, **options):
+        generated = 0
+        failed = 0
+
+        sources = [
+            (RelicImage.objects.exclude(image='').only('id', 'image'), 'image'),
+            (Client.objects.exclude(profile_photo='').exclude(profile_photo__isnull=True).only('id', 'profile_photo'), 'profile_photo'),
+        ]
+        for queryset, field_name in sources:
+            for obj in queryset.iterator(chunk_size=200):
+                field_file = getattr(obj, field_name)
+                try:
+                    generate_derivatives(field_file)
+                    # Derivados prontos: libera o srcset nos templates
+                    mark_processed(type(obj), obj.pk, field_name, file_checksum(field_file))
+                    generated += 1
+                except Exception as e:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f'  Falha em {field_file.name}: {e}'))
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Derivados gerados para {generated} imagens ({failed} falhas).')
+        )
@@ -0,0 +1,99 @@
+import os
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from records.imports import IMPORT_BATCH_SIZE, detect_format, error_report_name, run_import
+from records.models import ImportRun
+
+
+class Command(BaseCommand):
+    help = 'Importa clientes ou relíquias de um arquivo CSV/JSONL em lotes (bulk_create, com checkpoint)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=[kind for kind, label in ImportRun.KIND_CHOICES], help='Tipo de registro')
+        parser.add_argument('path', help='Arquivo CSV ou JSONL (.jsonl/.ndjson)')
+        parser.add_argument(
+            '--format',
+            choices=[fmt for fmt, label in ImportRun.FORMAT_CHOICES],
+            default=None,
+            help='Formato do arquivo (default: pela extensão)'
+        )
+        parser.add_argument(
+            '--user',
+            default=None,
+            help='Usuário registrado como autor dos registros (default: primeiro superusuário)'
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continuar a última importação inacabada deste arquivo a partir do checkpoint'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help=f'Registros por lote/transação (default: {IMPORT_BATCH_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        path = os.path.abspath(options['path'])
+        if not os.path.isfile(path):
+            raise CommandError(f'Arquivo não encontrado: {path}')
+
+        run = None
+        if options['resume']:
+            run = (
+                ImportRun.objects.filter(kind=options['kind'], file_name=path)
+                .exclude(status=ImportRun.DONE)
+                .order_by('-pk')
+                .first()
+            )
+            if run is None:
+                raise CommandError('Nenhuma importação inacabada deste arquivo para continuar.')
+            self.stdout.write(f'Continuando a importação #{run.pk} a partir do registro {run.rows + 1}...')
+        else:
+            run = ImportRun.objects.create(
+                kind=options['kind'],
+                format=options['format'] or detect_format(path),
+                file_name=path,
+                file_size=os.path.getsize(path),
+                error_report=error_report_name(path),
+                created_by=self.get_user(options['user']),
+            )
+
+        started = time.perf_counter()
+        initial = run.rows
+
+        def progress(run):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'  {run.rows} registros ({run.created} criados, {run.errors} com erro) '
+                f'- {(run.rows - initial) / elapsed:.0f} registros/s'
+            )
+
+        try:
+            run = run_import(run, path, batch_size=options['batch_size'], progress=progress)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Importação #{run.pk}: {run.created} {run.get_kind_display().lower()} criados em {elapsed:.2f}s '
+            f'({(run.rows - initial) / elapsed:.0f} registros/s).'
+        ))
+        if run.errors:
+            self.stdout.write(self.style.WARNING(
+                f'⚠️  {run.errors} registros com erro: veja {run.error_report}'
+            ))
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'Usuário {username} não encontrado.')
+        user = User.objects.filter(is_superuser=True).order_by('pk').first()
+        if user is None:
+            raise CommandError('Nenhum superusuário encontrado: informe --user.')
+        return user
@@ -1,8 +1,65 @@
 from django.core.management.base import BaseCommand
-from django.contrib.auth.models import User
-from records.models import Client, State, City, Address, Relic
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
+from records.models import Client, State, City, Address, Relic, RelicImage, Adoption
+import multiprocessing
+import os
 import random
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date, timedelta
+from io import BytesIO
+
+
+# Dados de teste sem usar Faker
+NOMES = ['João', 'Maria', 'José', 'Ana', 'Pedro', 'Carla', 'Paulo', 'Lucia', 'Carlos', 'Fernanda',
+         'Roberto', 'Patricia', 'Antonio', 'Sandra', 'Francisco', 'Monica', 'Marcos', 'Juliana',
+         'Luis', 'Claudia', 'Daniel', 'Silvia', 'Rafael', 'Cristina', 'Eduardo', 'Adriana']
+
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira',
+              'Lima', 'Gomes', 'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Rocha', 'Barbosa',
+              'Pinto', 'Teixeira', 'Araujo', 'Machado', 'Nascimento', 'Castro', 'Moreira', 'Campos']
+
+RUAS = ['Rua das Flores', 'Av. Principal', 'Rua do Comércio', 'Rua da Paz', 'Av. Central',
+        'Rua São João', 'Rua da Igreja', 'Av. Brasil', 'Rua XV de Novembro', 'Rua do Sol',
+        'Rua da Liberdade', 'Av. Paulista', 'Rua das Palmeiras', 'Rua do Centro', 'Av. JK']
+
+BAIRROS = ['Centro', 'Vila Nova', 'Jardim das Flores', 'Bela Vista', 'Alto da Colina',
+           'Santa Rita', 'São Pedro', 'Vila Esperança', 'Novo Horizonte', 'Parque Industrial']
+
+CIDADES_POR_ESTADO = {
+    'SP': ['São Paulo', 'Campinas', 'Santos', 'Ribeirão Preto', 'Sorocaba'],
+    'RJ': ['Rio de Janeiro', 'Niterói', 'Nova Iguaçu', 'Campos', 'Petrópolis'],
+    'MG': ['Belo Horizonte', 'Uberlândia', 'Contagem', 'Juiz de Fora', 'Montes Claros'],
+    'BA': ['Salvador', 'Feira de Santana', 'Vitória da Conquista', 'Camaçari', 'Itabuna'],
+    'PR': ['Curitiba', 'Londrina', 'Maringá', 'Ponta Grossa', 'Cascavel'],
+    'RS': ['Porto Alegre', 'Caxias do Sul', 'Pelotas', 'Santa Maria', 'Novo Hamburgo']
+}
+
+RELIC_NAMES = [
+    'Anel Ancestral', 'Medalha da Família', 'Relógio do Avô', 'Colar da Bisavó',
+    'Livro Antigo', 'Carta de Guerra', 'Fotografia Antiga', 'Joia da Família',
+    'Documento Histórico', 'Moeda Antiga', 'Broche Vintage', 'Óculos Antigos',
+    'Caneta Tinteiro', 'Mala de Viagem', 'Espelho Antigo', 'Vaso da Vovó',
+    'Quadro Familiar', 'Biblia Antiga', 'Rosário', 'Terço Abençoado',
+    'Chaveiro Militar', 'Distintivo', 'Fivela Antiga', 'Botão Especial',
+    'Dedal da Costureira', 'Agulha de Tricô', 'Linha Especial', 'Pano Bordado'
+]
+
+DESCRIPTIONS = [
+    'Uma peça única com grande valor sentimental para a família.',
+    'Herdada de gerações passadas, carrega histórias preciosas.',
+    'Encontrada no sótão da casa da avó, muito bem preservada.',
+    'Pertenceu a um ancestral querido e tem muito significado.',
+    'Item raro que passou por várias gerações da família.',
+    'Descoberta em uma caixa antiga, guarda memórias especiais.',
+    'Peça delicada que representa a história familiar.',
+    'Objeto com valor histórico e sentimental incalculável.'
+]
 
 
 class Command(BaseCommand):
@@ -26,39 +83,49 @@ class Command(BaseCommand):
             action='store_true',
             help='Limpar dados de teste existentes antes de criar novos'
         )
+        # Modo em massa (testes de carga): bulk_create em lotes, sem sinais por registro
+        parser.add_argument(
+            '--bulk',
+            action='store_true',
+            help='Gerar os dados com bulk_create em lotes (para volumes grandes, ex.: 1M relíquias)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Registros por lote no modo --bulk (default: 5000)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Processos em paralelo no modo --bulk (default: 1; no SQLite sempre 1)'
+        )
+        parser.add_argument(
+            '--images',
+            action='store_true',
+            help='No modo --bulk, criar também imagens das relíquias (1 a 10 por relíquia, maioria com 1-2)'
+        )
+        parser.add_argument(
+            '--adoption-rate',
+            type=float,
+            default=0.0,
+            help='No modo --bulk, fração das relíquias que recebem uma adoção (ex.: 0.2)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            help='Semente aleatória para gerar sempre os mesmos dados'
+        )
 
     def handle(self, *args, **options):
-        # Dados de teste sem usar Faker
-        nomes = ['João', 'Maria', 'José', 'Ana', 'Pedro', 'Carla', 'Paulo', 'Lucia', 'Carlos', 'Fernanda',
-                'Roberto', 'Patricia', 'Antonio', 'Sandra', 'Francisco', 'Monica', 'Marcos', 'Juliana',
-                'Luis', 'Claudia', 'Daniel', 'Silvia', 'Rafael', 'Cristina', 'Eduardo', 'Adriana']
-        
-        sobrenomes = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira',
-                     'Lima', 'Gomes', 'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Rocha', 'Barbosa',
-                     'Pinto', 'Teixeira', 'Araujo', 'Machado', 'Nascimento', 'Castro', 'Moreira', 'Campos']
-        
-        ruas = ['Rua das Flores', 'Av. Principal', 'Rua do Comércio', 'Rua da Paz', 'Av. Central',
-               'Rua São João', 'Rua da Igreja', 'Av. Brasil', 'Rua XV de Novembro', 'Rua do Sol',
-               'Rua da Liberdade', 'Av. Paulista', 'Rua das Palmeiras', 'Rua do Centro', 'Av. JK']
-        
-        bairros = ['Centro', 'Vila Nova', 'Jardim das Flores', 'Bela Vista', 'Alto da Colina',
-                  'Santa Rita', 'São Pedro', 'Vila Esperança', 'Novo Horizonte', 'Parque Industrial']
-        
-        cidades_por_estado = {
-            'SP': ['São Paulo', 'Campinas', 'Santos', 'Ribeirão Preto', 'Sorocaba'],
-            'RJ': ['Rio de Janeiro', 'Niterói', 'Nova Iguaçu', 'Campos', 'Petrópolis'],
-            'MG': ['Belo Horizonte', 'Uberlândia', 'Contagem', 'Juiz de Fora', 'Montes Claros'],
-            'BA': ['Salvador', 'Feira de Santana', 'Vitória da Conquista', 'Camaçari', 'Itabuna'],
-            'PR': ['Curitiba', 'Londrina', 'Maringá', 'Ponta Grossa', 'Cascavel'],
-            'RS': ['Porto Alegre', 'Caxias do Sul', 'Pelotas', 'Santa Maria', 'Novo Hamburgo']
-        }
-        
         self.stdout.write('🚀 Iniciando população do banco de dados...')
         
         # Limpar dados existentes se solicitado
         if options['clear']:
             self.stdout.write('🧹 Limpando dados existentes...')
             # Limpar na ordem correta para evitar conflitos de chave estrangeira
+            Adoption.objects.all().delete()
             Relic.objects.all().delete()
             Client.objects.all().delete()
             User.objects.filter(is_superuser=False).delete()
@@ -108,7 +175,7 @@ class Command(BaseCommand):
         # Criar algumas cidades
         cities = []
         for state in states:
-            state_cities = cidades_por_estado.get(state.uf, ['Cidade A', 'Cidade B', 'Cidade C'])
+            state_cities = CIDADES_POR_ESTADO.get(state.uf, ['Cidade A', 'Cidade B', 'Cidade C'])
             for cidade_nome in state_cities[:3]:  # 3 cidades por estado
                 city, created = City.objects.get_or_create(
                     name=cidade_nome,
@@ -120,13 +187,17 @@ class Command(BaseCommand):
 
         self.stdout.write(f'✅ {len(cities)} cidades criadas')
 
+        if options['bulk']:
+            self.handle_bulk(options, admin_user, cities)
+            return
+
         # Criar endereços
         addresses = []
         for i in range(options['clients']):
             address = Address.objects.create(
-                street=random.choice(ruas),
+                street=random.choice(RUAS),
                 number=random.randint(1, 9999),
-                neighborhood=random.choice(bairros),
+                neighborhood=random.choice(BAIRROS),
                 complement=f'Apto {random.randint(1, 50)}' if random.choice([True, False]) else '',
                 city=random.choice(cities)
             )
@@ -138,8 +209,8 @@ class Command(BaseCommand):
         clients = []
         for i in range(options['clients']):
             # Criar usuário
-            primeiro_nome = random.choice(nomes)
-            ultimo_nome = random.choice(sobrenomes)
+            primeiro_nome = random.choice(NOMES)
+            ultimo_nome = random.choice(SOBRENOMES)
             username = f'{primeiro_nome.lower()}{ultimo_nome.lower()}{i}'
             
             # Garantir que o username seja único
@@ -181,27 +252,6 @@ class Command(BaseCommand):
         self.stdout.write(f'✅ {options["clients"]} clientes criados')
 
         # Criar relíquias
-        relic_names = [
-            'Anel Ancestral', 'Medalha da Família', 'Relógio do Avô', 'Colar da Bisavó',
-            'Livro Antigo', 'Carta de Guerra', 'Fotografia Antiga', 'Joia da Família',
-            'Documento Histórico', 'Moeda Antiga', 'Broche Vintage', 'Óculos Antigos',
-            'Caneta Tinteiro', 'Mala de Viagem', 'Espelho Antigo', 'Vaso da Vovó',
-            'Quadro Familiar', 'Biblia Antiga', 'Rosário', 'Terço Abençoado',
-            'Chaveiro Militar', 'Distintivo', 'Fivela Antiga', 'Botão Especial',
-            'Dedal da Costureira', 'Agulha de Tricô', 'Linha Especial', 'Pano Bordado'
-        ]
-        
-        descriptions = [
-            'Uma peça única com grande valor sentimental para a família.',
-            'Herdada de gerações passadas, carrega histórias preciosas.',
-            'Encontrada no sótão da casa da avó, muito bem preservada.',
-            'Pertenceu a um ancestral querido e tem muito significado.',
-            'Item raro que passou por várias gerações da família.',
-            'Descoberta em uma caixa antiga, guarda memórias especiais.',
-            'Peça delicada que representa a história familiar.',
-            'Objeto com valor histórico e sentimental incalculável.'
-        ]
-
         relics_created = 0
         for i in range(options['relics']):
             # Gerar data aleatória nos últimos 30 anos
@@ -210,8 +260,8 @@ class Command(BaseCommand):
             data_obtencao = hoje - timedelta(days=dias_atras)
             
             relic = Relic.objects.create(
-                name=random.choice(relic_names) + f" #{i+1}",
-                description=random.choice(descriptions),
+                name=random.choice(RELIC_NAMES) + f" #{i+1}",
+                description=random.choice(DESCRIPTIONS),
                 obtained_date=data_obtencao,
                 adoption_fee=random.choice([True, False]),
                 client=random.choice(clients),
@@ -235,4 +285,256 @@ class Command(BaseCommand):
         self.stdout.write(f'👥 Clientes: {total_clients}')
         self.stdout.write(f'💎 Relíquias: {total_relics}')
         self.stdout.write('\n🔍 Agora você pode testar a paginação!')
-        self.stdout.write('📄 Acesse as listas para ver a paginação funcionando.')
\ No newline at end of file
+        self.stdout.write('📄 Acesse as listas para ver a paginação funcionando.')
+
+    def handle_bulk(self, options, admin_user, cities):
+        """
+        Gera os dados em lotes com bulk_create, divididos entre processos.
+        Os sinais por registro (perfil de cliente, índice de busca, contadores)
+        não disparam no bulk_create: o trabalho equivalente é feito uma vez no final.
+        """
+        batch_size = max(options['batch_size'], 1)
+        workers = max(options['workers'], 1)
+        if connection.vendor == 'sqlite' and workers > 1:
+            # O SQLite serializa as escritas: processos extras só disputariam o lock
+            self.stdout.write(self.style.WARNING('⚠️  SQLite: usando 1 processo'))
+            workers = 1
+        seed = options['seed'] if options['seed'] is not None else random.randrange(2 ** 32)
+        run_token = uuid.uuid4().hex[:6]
+
+        # Hash calculado uma única vez (PBKDF2 por usuário tornaria a geração inviável)
+        password_hash = make_password('password123')
+        default_group, created = Group.objects.get_or_create(name='Usuários')
+        city_ids = [city.pk for city in cities]
+        placeholders = _placeholder_images() if options['images'] else []
+
+        pool = None
+        if workers > 1:
+            from records.worker import init_worker
+            # Conexões abertas não podem ser herdadas pelos processos filhos
+            connection.close()
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker,
+                initargs=(os.environ['DJANGO_SETTINGS_MODULE'],),
+            )
+
+        def run(func, total, *args):
+            chunks = [(start, min(batch_size, total - start)) for start in range(0, total, batch_size)]
+            calls = [(start, size, seed) + args for start, size in chunks]
+            if pool:
+                return list(pool.map(_call, [func] * len(calls), calls))
+            return [func(*call) for call in calls]
+
+        started = time.perf_counter()
+        try:
+            phase = time.perf_counter()
+            owners = []
+            for chunk in run(_create_clients, options['clients'], run_token, password_hash, city_ids, default_group.pk):
+                owners.extend(chunk)
+            # Cada cliente gera 4 linhas: endereço, usuário, grupo do usuário e cliente
+            self.report_rate('clientes (+ usuários e endereços)', len(owners), phase, rows=len(owners) * 4)
+            client_rows = len(owners) * 4
+            if not owners:
+                owners = list(Client.objects.values_list('pk', 'created_by_id'))
+            if not owners:
+                self.stdout.write(self.style.WARNING('Nenhum cliente para receber relíquias.'))
+                return
+
+            phase = time.perf_counter()
+            totals = {'relics': 0, 'images': 0, 'adoptions': 0}
+            for counts in run(_create_relics, options['relics'], owners, placeholders, options['adoption_rate']):
+                for name, value in counts.items():
+                    totals[name] += value
+            self.report_rate(
+                f'relíquias, {totals["images"]} imagens e {totals["adoptions"]} adoções',
+                totals['relics'], phase, rows=sum(totals.values())
+            )
+        finally:
+            if pool:
+                pool.shutdown()
+
+        phase = time.perf_counter()
+        self.finish_bulk(bool(placeholders))
+        self.stdout.write(f'✅ Índices, contadores e caches atualizados ({time.perf_counter() - phase:.1f}s)')
+
+        rows = client_rows + sum(totals.values())
+        elapsed = time.perf_counter() - started
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(f'🎉 {rows} linhas em {elapsed:.1f}s ({rows / elapsed:,.0f} linhas/s, semente {seed})')
+        self.stdout.write('='*50)
+
+    def report_rate(self, label, count, started, rows=None):
+        elapsed = time.perf_counter() - started
+        rows = count if rows is None else rows
+        rate = rows / elapsed if elapsed else 0
+        self.stdout.write(f'✅ {count} {label} em {elapsed:.1f}s ({rate:,.0f} linhas/s)')
+
+    def finish_bulk(self, with_images):
+        """O que os sinais fariam registro a registro, feito uma vez para o lote inteiro"""
+        from records.gallery import invalidate_gallery
+        from records.search import get_search_backend
+        from records.stats import rebuild_user_stats
+        from records.watermarks import WATERMARKED_MODELS, touch
+
+        backend = get_search_backend()
+        backend.rebuild(Relic)
+        backend.rebuild(Client)
+        rebuild_user_stats()
+        if with_images:
+            from records.blobs import rebuild_refcounts
+            rebuild_refcounts()
+        invalidate_gallery()
+        touch(*WATERMARKED_MODELS)
+
+
+# ---------------------------------------------------------------------------
+# Modo --bulk: funções executadas nos processos do pool (ou no próprio processo)
+# ---------------------------------------------------------------------------
+
+# Expoente da distribuição dos donos: poucos clientes concentram muitas relíquias
+# (com 3, os 10% maiores ficam com cerca de 46% das relíquias)
+OWNER_SKEW = 3
+
+
+def _call(func, args):
+    return func(*args)
+
+
+def _skewed_choice(rng, items):
+    return items[int(len(items) * rng.random() ** OWNER_SKEW)]
+
+
+def _image_count(rng):
+    """1 a 10 imagens por relíquia, a maioria com 1 ou 2"""
+    return 1 + min(int(rng.expovariate(0.7)), 9)
+
+
+def _placeholder_images(count=8):
+    """Algumas imagens reais no storage, compartilhadas pelas relíquias geradas"""
+    from PIL import Image
+    from records.images import generate_derivatives
+
+    storage = RelicImage._meta.get_field('image').storage
+    placeholders = []
+    for i in range(count):
+        width, height = random.choice([(1200, 900), (900, 1200), (1024, 1024), (1600, 900)])
+        color = tuple(random.randrange(40, 220) for _ in range(3))
+        buffer = BytesIO()
+        Image.new('RGB', (width, height), color).save(buffer, 'JPEG', quality=80)
+        name = storage.save('populate.jpg', ContentFile(buffer.getvalue()))
+        generate_derivatives(RelicImage(image=name).image)
+        placeholders.append({'name': name, 'url': storage.url(name), 'width': width, 'height': height})
+    return placeholders
+
+
+def _create_clients(start, size, seed, run_token, password_hash, city_ids, group_id):
+    """Cria `size` endereços, usuários e clientes. Retorna [(client_id, user_id)]."""
+    rng = random.Random(seed + start)
+    today = date.today()
+    with transaction.atomic():
+        addresses = Address.objects.bulk_create([
+            Address(
+                street=rng.choice(RUAS),
+                number=rng.randint(1, 9999),
+                neighborhood=rng.choice(BAIRROS),
+                complement=f'Apto {rng.randint(1, 50)}' if rng.random() < 0.5 else '',
+                city_id=rng.choice(city_ids),
+            )
+            for _ in range(size)
+        ])
+
+        users = []
+        for i in range(start, start + size):
+            first_name = rng.choice(NOMES)
+            last_name = rng.choice(SOBRENOMES)
+            # O token da execução garante nomes únicos sem consultar o banco
+            username = f'{first_name.lower()}{last_name.lower()}{run_token}{i}'
+            users.append(User(
+                username=username,
+                email=f'{username}@email.com',
+                first_name=first_name,
+                last_name=last_name,
+                password=password_hash,
+            ))
+        users = User.objects.bulk_create(users)
+        User.groups.through.objects.bulk_create([
+            User.groups.through(user_id=user.pk, group_id=group_id) for user in users
+        ])
+
+        # Mesmo perfil que o sinal post_save de User criaria
+        clients = Client.objects.bulk_create([
+            Client(
+                user=user,
+                name=f'{user.first_name} {user.last_name}',
+                nickname=user.username,
+                email=user.email,
+                birth_date=date(today.year - rng.randint(18, 80), rng.randint(1, 12), rng.randint(1, 28)),
+                address=address,
+                created_by=user,
+            )
+            for user, address in zip(users, addresses)
+        ])
+    return [(client.pk, client.created_by_id) for client in clients]
+
+
+def _create_relics(start, size, seed, owners, placeholders, adoption_rate):
+    """Cria `size` relíquias (com imagens e adoções opcionais). Retorna as contagens."""
+    rng = random.Random(seed + start)
+    today = date.today()
+    with transaction.atomic():
+        relics = []
+        main_images = []
+        for i in range(start, start + size):
+            client_id, user_id = _skewed_choice(rng, owners)
+            main = rng.choice(placeholders) if placeholders else None
+            main_images.append(main)
+            relics.append(Relic(
+                name=rng.choice(RELIC_NAMES) + f' #{i + 1}',
+                description=rng.choice(DESCRIPTIONS),
+                obtained_date=today - timedelta(days=rng.randint(1, 30 * 365)),
+                adoption_fee=rng.random() < 0.5,
+                client_id=client_id,
+                created_by_id=user_id,
+                main_image_url=main['url'] if main else '',
+                main_image_width=main['width'] if main else None,
+                main_image_height=main['height'] if main else None,
+            ))
+        relics = Relic.objects.bulk_create(relics)
+
+        images = []
+        for relic, main in zip(relics, main_images):
+            if main is None:
+                break
+            images.append(RelicImage(relic=relic, image=main['name'], is_main=True, created_by_id=relic.created_by_id))
+            for _ in range(_image_count(rng) - 1):
+                images.append(RelicImage(
+                    relic=relic,
+                    image=rng.choice(placeholders)['name'],
+                    created_by_id=relic.created_by_id,
+                ))
+        if images:
+            RelicImage.objects.bulk_create(images)
+            # Ponteiro denormalizado (Relic.main_image) em um único UPDATE para o lote
+            Relic.objects.filter(pk__in=[relic.pk for relic in relics]).update(
+                main_image=Subquery(
+                    RelicImage.objects.filter(relic=OuterRef('pk'), is_main=True).values('pk')[:1]
+                )
+            )
+
+        adoptions = []
+        if adoption_rate:
+            for relic in relics:
+                if rng.random() >= adoption_rate:
+                    continue
+                new_owner_id, new_owner_user_id = _skewed_choice(rng, owners)
+                adoptions.append(Adoption(
+                    relic=relic,
+                    previous_owner_id=relic.client_id,
+                    new_owner_id=new_owner_id,
+                    payment_status=relic.adoption_fee and rng.random() < 0.7,
+                    created_by_id=new_owner_user_id,
+                ))
+            Adoption.objects.bulk_create(adoptions)
+    return {'relics': len(relics), 'images': len(images), 'adoptions': len(adoptions)}
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from records.search import SEARCH_FIELDS, get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o índice de busca textual de relíquias e clientes'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+
+        for model in SEARCH_FIELDS:
+            with transaction.atomic():
+                indexed = backend.rebuild(model)
+            self.stdout.write(f'  {model._meta.verbose_name_plural}: {indexed} registros indexados')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Índice de busca reconstruído ({type(backend).__name__})!')
+        )
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from records.stats import rebuild_user_stats
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os contadores materializados do painel (UserStats) a partir dos registros'
+
+    def handle(self, *args, **options):
+        created, fixed = rebuild_user_stats()
+        self.stdout.write(
+            self.style.SUCCESS(f'Estatísticas reconciliadas: {created} linhas criadas, {fixed} corrigidas.')
+        )
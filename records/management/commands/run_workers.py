@@ -0,0 +1,93 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from records import tasks
+from records.worker import init_worker, run_job
+
+
+class Command(BaseCommand):
+    help = 'Executa as tarefas em segundo plano (imagens, estatísticas...) em um pool de processos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=os.cpu_count() or 2,
+            help='Número de processos do pool (0 executa no próprio processo)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Tarefas reservadas por vez (default: 2x o número de processos)'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Segundos de espera quando a fila está vazia'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Esvaziar a fila e terminar, em vez de continuar aguardando novas tarefas'
+        )
+
+    def handle(self, *args, **options):
+        processes = max(options['processes'], 0)
+        batch_size = options['batch_size'] or max(processes, 1) * 2
+        self.done = 0
+        self.failed = 0
+
+        pool = None
+        if processes:
+            # "spawn": cada processo abre suas próprias conexões com o banco
+            pool = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker,
+                initargs=(os.environ['DJANGO_SETTINGS_MODULE'],),
+            )
+        self.stdout.write(f'Worker iniciado ({processes or "sem"} processos, lotes de {batch_size})')
+
+        try:
+            while True:
+                requeued = tasks.requeue_stale_jobs()
+                if requeued:
+                    self.stdout.write(self.style.WARNING(f'{requeued} tarefas travadas voltaram para a fila'))
+
+                job_ids = tasks.claim_jobs(batch_size)
+                if not job_ids:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                if pool:
+                    results = pool.map(run_job, job_ids)
+                else:
+                    results = ((job_id, tasks.execute(job_id)) for job_id in job_ids)
+                for job_id, ok in results:
+                    self.report(job_id, ok, options['verbosity'])
+        except KeyboardInterrupt:
+            # Tarefas interrompidas voltam para a fila via requeue_stale_jobs
+            self.stdout.write(self.style.WARNING('Interrompido.'))
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'{self.done} tarefas concluídas, {self.failed} falhas.')
+        )
+
+    def report(self, job_id, ok, verbosity):
+        if ok:
+            self.done += 1
+        else:
+            self.failed += 1
+            self.stdout.write(self.style.WARNING(f'  Tarefa #{job_id} falhou (ver Job.last_error)'))
+            return
+        if verbosity > 1:
+            self.stdout.write(f'  Tarefa #{job_id} concluída')
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from records.routers import REPLICA_DB_ALIAS, replica_configured
+
+
+class Command(BaseCommand):
+    help = 'Copia o banco principal para a réplica SQLite (simula a replicação em desenvolvimento)'
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            raise CommandError('Nenhuma réplica configurada (defina REPLICA_DATABASE_URL).')
+        primary = connections['default']
+        replica = connections[REPLICA_DB_ALIAS]
+        if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError('Só para SQLite: em produção a réplica é mantida pela replicação do banco.')
+
+        primary.ensure_connection()
+        replica.ensure_connection()
+        # API de backup do SQLite: cópia consistente mesmo com o principal em uso
+        primary.connection.backup(replica.connection)
+        self.stdout.write(self.style.SUCCESS(
+            f"Réplica {replica.settings_dict['NAME']} sincronizada com {primary.settings_dict['NAME']}."
+        ))
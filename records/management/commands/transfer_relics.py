@@ -0,0 +1,91 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from records.adoptions import TRANSFER_BATCH_SIZE, TransferConflict, transfer_relics
+from records.models import Client, Relic
+
+
+class Command(BaseCommand):
+    help = 'Transfere relíquias para um cliente em uma única transação (uma adoção por relíquia)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'relic_ids',
+            nargs='*',
+            type=int,
+            help='IDs das relíquias (ou use --from-client)'
+        )
+        parser.add_argument(
+            '--to',
+            type=int,
+            required=True,
+            help='ID do cliente que recebe as relíquias'
+        )
+        parser.add_argument(
+            '--from-client',
+            type=int,
+            default=None,
+            help='Transferir todas as relíquias deste cliente'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Número máximo de relíquias transferidas'
+        )
+        parser.add_argument(
+            '--user',
+            default=None,
+            help='Usuário registrado como autor das adoções (default: primeiro superusuário)'
+        )
+        parser.add_argument(
+            '--paid',
+            action='store_true',
+            help='Marcar as adoções (e as anteriores das relíquias) como pagas'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=TRANSFER_BATCH_SIZE,
+            help=f'Relíquias por query dentro da transação (default: {TRANSFER_BATCH_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            new_owner = Client.objects.get(pk=options['to'])
+        except Client.DoesNotExist:
+            raise CommandError(f"Cliente {options['to']} não encontrado.")
+        user = self.get_user(options['user'])
+
+        relic_ids = list(options['relic_ids'])
+        if options['from_client'] is not None:
+            relic_ids += Relic.objects.filter(client_id=options['from_client']).order_by('pk').values_list('pk', flat=True)
+        relic_ids = sorted(set(relic_ids))[:options['limit']]
+        if not relic_ids:
+            raise CommandError('Nenhuma relíquia para transferir (informe IDs ou --from-client).')
+
+        started = time.perf_counter()
+        try:
+            adoptions = transfer_relics(
+                relic_ids, new_owner, user, payment_status=options['paid'], batch_size=options['batch_size']
+            )
+        except TransferConflict as e:
+            raise CommandError(f'Nada foi transferido: {e}')
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {len(adoptions)} relíquias transferidas para {new_owner.name} em {elapsed:.2f}s '
+            f'({len(adoptions) / elapsed:.0f} transferências/s).'
+        ))
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'Usuário {username} não encontrado.')
+        user = User.objects.filter(is_superuser=True).order_by('pk').first()
+        if user is None:
+            raise CommandError('Nenhum superusuário encontrado: informe --user.')
+        return user
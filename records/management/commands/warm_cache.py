@@ -0,0 +1,100 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client, RequestFactory
+from django.urls import resolve, reverse
+from records.cache_policy import get_policy, page_cache_key
+from records.gallery import GALLERY_VERSION_KEY, get_gallery_page
+from records.stats import refresh_relic_stats
+from records.watermarks import WATERMARKED_MODELS, get_watermarks
+
+
+class Command(BaseCommand):
+    help = 'Aquece o cache (páginas públicas, galeria, estatísticas) ou mostra o que está em cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--inspect',
+            action='store_true',
+            help='Apenas mostrar o backend e o estado das entradas, sem aquecer'
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Limpar todo o cache antes de aquecer'
+        )
+        parser.add_argument(
+            '--host',
+            default=None,
+            help='Host usado nas requisições internas (default: primeiro de ALLOWED_HOSTS)'
+        )
+
+    def handle(self, *args, **options):
+        if options['inspect']:
+            self.inspect()
+            return
+
+        if options['clear']:
+            cache.clear()
+            self.stdout.write('🧹 Cache limpo.')
+
+        started = time.perf_counter()
+        get_watermarks(WATERMARKED_MODELS)
+        get_gallery_page()
+        refresh_relic_stats()
+        self.stdout.write('Marcas d\'água, primeira página da galeria e estatísticas das relíquias em cache.')
+
+        client = Client(HTTP_HOST=options['host'] or self.default_host())
+        for view_name, url in self.policy_urls():
+            if not get_policy(view_name).get('anonymous'):
+                continue
+            response = client.get(url)
+            self.stdout.write(f'  {url:<30} {response.status_code}')
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Cache aquecido em {time.perf_counter() - started:.2f}s.'
+        ))
+
+    def default_host(self):
+        hosts = [host for host in settings.ALLOWED_HOSTS if host != '*']
+        return hosts[0].lstrip('.') if hosts else 'localhost'
+
+    def policy_urls(self):
+        for view_name in settings.CACHE_POLICIES:
+            yield view_name, reverse(view_name)
+
+    def inspect(self):
+        config = settings.CACHES['default']
+        self.stdout.write(f"Backend: {config['BACKEND']}")
+        self.stdout.write(f"Local:   {config.get('LOCATION') or '-'}")
+        entries = self.count_entries()
+        if entries is not None:
+            self.stdout.write(f'Entradas: {entries}')
+
+        self.stdout.write('\nMarcas d\'água:')
+        for label, (version, updated_at) in sorted(get_watermarks(WATERMARKED_MODELS).items()):
+            self.stdout.write(f'  {label:<24} v{version:<8} {updated_at or "-"}')
+        self.stdout.write(f'\nVersão da galeria: {cache.get(GALLERY_VERSION_KEY) or "(ausente)"}')
+
+        self.stdout.write('\nPáginas (visitante):')
+        factory = RequestFactory()
+        for view_name, url in self.policy_urls():
+            policy = get_policy(view_name)
+            request = factory.get(url)
+            request.resolver_match = match = resolve(url)
+            key = page_cache_key(request, getattr(match.func, 'view_class', None), user=AnonymousUser())
+            state = 'em cache' if cache.has_key(key) else 'ausente'
+            self.stdout.write(
+                f"  {url:<30} {state:<9} anônimo {policy.get('anonymous') or 0}s, "
+                f"logado {policy.get('authenticated') or 0}s"
+            )
+
+    def count_entries(self):
+        # Só os backends locais permitem contar as entradas
+        if hasattr(cache, '_list_cache_files'):
+            return len(cache._list_cache_files())
+        if hasattr(cache, '_cache') and isinstance(cache._cache, dict):
+            return len(cache._cache)
+        return None
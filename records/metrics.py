@@ -0,0 +1,162 @@
+"""
+Métricas de desempenho por view, expostas em formato texto do Prometheus.
+
+O MetricsMiddleware (records/middleware.py) mede cada requisição e chama
+`record` com o nome da URL resolvida (`records:RelicList`, `pages-HomePage`...):
+latência, número e tempo das queries (via `connection.execute_wrapper`), tempo
+de renderização do template e tamanho da resposta. Os valores vão para
+histogramas com buckets fixos, então a memória não cresce com o tráfego; o
+número de views também é limitado (METRICS_MAX_VIEWS, o excedente vai para
+"other").
+
+Os agregados ficam na memória do processo: cada worker/instância é lido
+separadamente pelo Prometheus em /metrics.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+PREFIX = 'adoptm3'
+
+# Buckets (limite superior de cada faixa)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+DB_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+UNRESOLVED_VIEW = '<unresolved>'
+OVERFLOW_VIEW = 'other'
+
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        """(le, contagem acumulada) de cada bucket, incluindo +Inf"""
+        total = 0
+        for bound, count in zip(self.bounds, self.counts):
+            total += count
+            yield _format_number(bound), total
+        yield '+Inf', self.count
+
+
+class ViewMetrics:
+    __slots__ = ('responses', 'latency', 'queries', 'db_time', 'template_time', 'size')
+
+    def __init__(self):
+        self.responses = {}  # classe do status ('2xx', '5xx'...) -> contagem
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.db_time = Histogram(DB_TIME_BUCKETS)
+        self.template_time = Histogram(LATENCY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+
+
+# nome da métrica, atributo de ViewMetrics, descrição
+HISTOGRAMS = [
+    ('request_duration_seconds', 'latency', 'Tempo total da requisição'),
+    ('db_queries', 'queries', 'Queries por requisição'),
+    ('db_duration_seconds', 'db_time', 'Tempo gasto no banco por requisição'),
+    ('template_render_seconds', 'template_time', 'Tempo de renderização do template'),
+    ('response_size_bytes', 'size', 'Tamanho do corpo da resposta'),
+]
+
+_lock = threading.Lock()
+_views = {}
+_started_at = time.time()
+
+
+class QueryTimer:
+    """Wrapper para `connection.execute_wrapper`: conta e cronometra as queries"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+def record(view, status, duration, queries, db_time, template_time=None, size=None):
+    view = view or UNRESOLVED_VIEW
+    status_class = '{}xx'.format(status // 100)
+    with _lock:
+        metrics = _views.get(view)
+        if metrics is None:
+            if len(_views) >= getattr(settings, 'METRICS_MAX_VIEWS', 200):
+                view = OVERFLOW_VIEW
+            metrics = _views.setdefault(view, ViewMetrics())
+        metrics.responses[status_class] = metrics.responses.get(status_class, 0) + 1
+        metrics.latency.observe(duration)
+        metrics.queries.observe(queries)
+        metrics.db_time.observe(db_time)
+        # Só views com TemplateResponse (as genéricas) e respostas sem streaming
+        if template_time is not None:
+            metrics.template_time.observe(template_time)
+        if size is not None:
+            metrics.size.observe(size)
+
+
+def reset():
+    with _lock:
+        _views.clear()
+
+
+def _format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render():
+    """Todas as métricas no formato texto do Prometheus (versão 0.0.4)"""
+    with _lock:
+        snapshot = sorted(_views.items())
+        lines = [
+            f'# HELP {PREFIX}_requests_total Respostas por view e classe de status',
+            f'# TYPE {PREFIX}_requests_total counter',
+        ]
+        for view, metrics in snapshot:
+            for status_class, count in sorted(metrics.responses.items()):
+                lines.append(f'{PREFIX}_requests_total{{view="{_escape(view)}",status="{status_class}"}} {count}')
+
+        for name, attribute, description in HISTOGRAMS:
+            metric = f'{PREFIX}_{name}'
+            lines.append(f'# HELP {metric} {description}')
+            lines.append(f'# TYPE {metric} histogram')
+            for view, metrics in snapshot:
+                histogram = getattr(metrics, attribute)
+                if not histogram.count:
+                    continue
+                label = f'view="{_escape(view)}"'
+                for le, count in histogram.samples():
+                    lines.append(f'{metric}_bucket{{{label},le="{le}"}} {count}')
+                lines.append(f'{metric}_sum{{{label}}} {histogram.sum!r}')
+                lines.append(f'{metric}_count{{{label}}} {histogram.count}')
+
+    lines.append(f'# HELP {PREFIX}_process_start_time_seconds Início da coleta neste processo')
+    lines.append(f'# TYPE {PREFIX}_process_start_time_seconds gauge')
+    lines.append(f'{PREFIX}_process_start_time_seconds {_started_at!r}')
+    return '\n'.join(lines) + '\n'
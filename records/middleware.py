@@ -1,29 +1,154 @@
-from django.contrib.auth.models import Group
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from . import cache_policy, metrics, querywatch, routers
+from .groups import get_user_group
 
 class GroupMiddleware:
     """
-    Middleware para adicionar o grupo do usuário ao contexto da requisição
+    Middleware para adicionar o grupo do usuário ao contexto da requisição.
+    O grupo vem do cache por usuário (records/groups.py): com o cache quente
+    não há nenhuma query extra. A atribuição do grupo padrão fica no sinal
+    post_save de User (records/signals.py).
     """
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
         if hasattr(request, 'user') and request.user.is_authenticated:
-            try:
-                # Adiciona o grupo principal do usuário
-                user_groups = request.user.groups.all()
-                if user_groups.exists():
-                    request.user_group = user_groups.first().name
-                else:
-                    # Se não tem grupo, adiciona ao grupo "Usuários" por padrão
-                    user_group, created = Group.objects.get_or_create(name='Usuários')
-                    request.user.groups.add(user_group)
-                    request.user_group = 'Usuários'
-            except Exception as e:
-                # Em caso de erro, define como None
-                request.user_group = None
+            request.user_group = get_user_group(request.user)
         else:
             request.user_group = None
 
         response = self.get_response(request)
         return response
+
+class MetricsMiddleware:
+    """
+    Mede cada requisição por nome de URL resolvida: latência, queries (número
+    e tempo), renderização do template e tamanho da resposta. Os agregados
+    ficam em records/metrics.py e são expostos em /metrics.
+    Deve ficar no topo do MIDDLEWARE para incluir o custo dos demais.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = metrics.QueryTimer()
+        request._metrics_template_time = None
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        metrics.record(
+            view=match.view_name if match else None,
+            status=response.status_code,
+            duration=duration,
+            queries=timer.count,
+            db_time=timer.duration,
+            template_time=request._metrics_template_time,
+            size=None if response.streaming else len(response.content),
+        )
+        return response
+
+    def process_template_response(self, request, response):
+        # Chamado logo antes do render(): o callback marca o fim
+        started = time.perf_counter()
+
+        def rendered(response):
+            request._metrics_template_time = time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+class QueryWatchMiddleware:
+    """
+    Detecta N+1 (a mesma forma de query repetida) e queries lentas, e registra
+    o trecho de código/template responsável no logger `records.queries`
+    (records/querywatch.py). A detecção de N+1 roda só em uma amostra das
+    requisições (QUERY_WATCH_SAMPLE_RATE).
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        watcher = querywatch.start()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(watcher))
+            response = self.get_response(request)
+        watcher.report(request)
+        return response
+
+class CachePolicyMiddleware:
+    """
+    Serve e guarda páginas inteiras conforme settings.CACHE_POLICIES
+    (records/cache_policy.py). Deve ficar depois da autenticação e das
+    mensagens: páginas com mensagens pendentes nunca vêm do cache.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request._page_cache = None
+        response = self.get_response(request)
+        if request._page_cache and cache_policy.is_cacheable(request, response):
+            key, timeout = request._page_cache
+            cache_policy.store(key, response, timeout)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        policy = cache_policy.get_policy(request.resolver_match.view_name)
+        if not policy:
+            return None
+        timeout = cache_policy.get_timeout(policy, request.user)
+        storage = getattr(request, '_messages', None)
+        if not timeout or (storage is not None and len(storage)):
+            return None
+
+        key = cache_policy.page_cache_key(request, getattr(view_func, 'view_class', None))
+        response = cache_policy.load(key)
+        if response is None:
+            request._page_cache = (key, timeout)
+            return None
+        # A página guardada tem o ETag/Last-Modified da view: ainda vale o 304
+        return get_conditional_response(
+            request,
+            etag=response.get('ETag'),
+            last_modified=parse_http_date_safe(response.get('Last-Modified', '')),
+            response=response,
+        )
+
+class ReplicaRoutingMiddleware:
+    """
+    Estado de roteamento por requisição para o ReplicaRouter (records/routers.py).
+    Se a requisição escreveu no banco, o cookie fixa as leituras no principal
+    por REPLICA_STICKY_SECONDS (atraso de replicação).
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = routers.begin_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            state = routers.end_request(token)
+        if state.wrote and routers.replica_configured():
+            window = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                routers.STICKY_COOKIE, '{:.0f}'.format(time.time() + window),
+                max_age=window, httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.20 on 2026-10-18 13:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0009_relic_main_image'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(fields=['street', 'number'], name='address_street_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='adoption',
+            index=models.Index(fields=['created_by', '-adoption_date'], name='adoption_creator_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='city',
+            index=models.Index(fields=['name'], name='city_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['-register_date'], name='client_register_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['birth_date'], name='client_birth_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['created_by', '-register_date'], name='client_creator_register_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='relic',
+            index=models.Index(fields=['-obtained_date', '-id'], name='relic_obtained_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='relic',
+            index=models.Index(fields=['created_by', '-obtained_date'], name='relic_creator_obtained_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='relic',
+            index=models.Index(fields=['client', '-obtained_date'], name='relic_client_obtained_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='relic',
+            index=models.Index(fields=['adoption_fee', '-obtained_date'], name='relic_fee_obtained_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='relic',
+            index=models.Index(fields=['created_by', '-id'], name='relic_creator_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='relicimage',
+            index=models.Index(fields=['relic', '-is_main', 'upload_date'], name='relicimage_relic_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='state',
+            index=models.Index(fields=['name'], name='state_name_idx'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+from django.db import migrations
+
+# Campos indexados por tabela (devem coincidir com records.search.SEARCH_FIELDS)
+SEARCH_TABLES = {
+    'records_relic': ['name', 'description'],
+    'records_client': ['name', 'nickname', 'email'],
+}
+
+
+def pg_vector(columns):
+    joined = " || ' ' || ".join('coalesce("{}", \'\')'.format(column) for column in columns)
+    return "to_tsvector('records_pt', {})".format(joined)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for table, columns in SEARCH_TABLES.items():
+            schema_editor.execute(
+                'CREATE VIRTUAL TABLE IF NOT EXISTS "{0}_search" USING fts5({1}, '
+                'tokenize=\'unicode61 remove_diacritics 2\')'.format(table, ', '.join(columns))
+            )
+            schema_editor.execute(
+                'INSERT INTO "{0}_search" (rowid, {1}) SELECT id, {2} FROM "{0}"'.format(
+                    table,
+                    ', '.join(columns),
+                    ', '.join("coalesce({}, '')".format(column) for column in columns),
+                )
+            )
+    elif vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS unaccent')
+        schema_editor.execute(
+            "DO $$ BEGIN "
+            "IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'records_pt') THEN "
+            "CREATE TEXT SEARCH CONFIGURATION records_pt (COPY = portuguese); "
+            "ALTER TEXT SEARCH CONFIGURATION records_pt "
+            "ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem; "
+            "END IF; END $$"
+        )
+        for table, columns in SEARCH_TABLES.items():
+            schema_editor.execute(
+                'CREATE INDEX IF NOT EXISTS "{0}_search_gin" ON "{0}" USING GIN ({1})'.format(
+                    table, pg_vector(columns)
+                )
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table in SEARCH_TABLES:
+        if vendor == 'sqlite':
+            schema_editor.execute('DROP TABLE IF EXISTS "{}_search"'.format(table))
+        elif vendor == 'postgresql':
+            schema_editor.execute('DROP INDEX IF EXISTS "{}_search_gin"'.format(table))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0010_list_view_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
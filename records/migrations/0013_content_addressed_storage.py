@@ -0,0 +1,38 @@
+# Generated by Django 4.2.20 on 2026-10-18 14:05
+
+from django.db import migrations, models
+import records.models
+import records.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0012_job_queue_and_checksums'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='client',
+            name='profile_photo',
+            field=models.ImageField(blank=True, help_text='Foto de perfil do cliente (opcional)', null=True, storage=records.storage.blob_storage, upload_to=records.models.client_photo_upload_path),
+        ),
+        migrations.AlterField(
+            model_name='relicimage',
+            name='image',
+            field=models.ImageField(help_text='Imagem da relíquia', storage=records.storage.blob_storage, upload_to=records.models.relic_image_upload_path),
+        ),
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('refcount', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('refcount', 0)), fields=['updated_at'], name='blob_unreferenced_idx')],
+            },
+        ),
+    ]
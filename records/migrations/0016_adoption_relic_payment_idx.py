@@ -0,0 +1,17 @@
+# Generated by Django 4.2.20 on 2026-10-18 14:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0015_updated_at_watermarks'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='adoption',
+            index=models.Index(fields=['relic', 'payment_status'], name='adoption_relic_payment_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+
+def backfill_main_images(apps, schema_editor):
+    """Preenche Relic.main_image* das relíquias antigas (mesma escolha de refresh_main_image)"""
+    Relic = apps.get_model('records', 'Relic')
+    RelicImage = apps.get_model('records', 'RelicImage')
+    db = schema_editor.connection.alias
+
+    last_pk = 0
+    while True:
+        relic_ids = list(
+            Relic.objects.using(db).filter(pk__gt=last_pk, main_image__isnull=True)
+            .order_by('pk').values_list('pk', flat=True)[:BATCH_SIZE]
+        )
+        if not relic_ids:
+            break
+        last_pk = relic_ids[-1]
+
+        main_images = {}
+        images = RelicImage.objects.using(db).filter(relic_id__in=relic_ids).order_by('relic_id', '-is_main', 'upload_date', 'id')
+        for image in images:
+            main_images.setdefault(image.relic_id, image)
+
+        for relic_id, image in main_images.items():
+            width = height = None
+            try:
+                width, height = image.image.width, image.image.height
+            except (OSError, ValueError):
+                # Arquivo ausente ou ilegível: mantém apenas a URL
+                pass
+            Relic.objects.using(db).filter(pk=relic_id).update(
+                main_image=image,
+                main_image_url=image.image.url if image.image else '',
+                main_image_width=width,
+                main_image_height=height,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0017_import_runs'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_main_images, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.20 on 2026-10-18 15:05
+
+from django.db import migrations, models
+
+
+def mark_processed_main_images(apps, schema_editor):
+    """Imagens principais já com checksum tiveram os derivados gerados pelo process_image"""
+    Relic = apps.get_model('records', 'Relic')
+    db = schema_editor.connection.alias
+    Relic.objects.using(db).filter(main_image__isnull=False).exclude(main_image__checksum='').update(
+        main_image_processed=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0018_backfill_relic_main_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='relic',
+            name='main_image_processed',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(mark_processed_main_images, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+BATCH_SIZE = 1000
+DEFAULT_GROUP = 'Usuários'
+
+
+def add_users_to_default_group(apps, schema_editor):
+    """Usuários antigos sem grupo entram no grupo padrão (os novos entram pelo sinal post_save)"""
+    Group = apps.get_model('auth', 'Group')
+    User = apps.get_model('auth', 'User')
+    Membership = User.groups.through
+    db = schema_editor.connection.alias
+
+    group, created = Group.objects.using(db).get_or_create(name=DEFAULT_GROUP)
+    user_ids = list(User.objects.using(db).filter(groups__isnull=True).order_by('pk').values_list('pk', flat=True))
+    added = 0
+    for start in range(0, len(user_ids), BATCH_SIZE):
+        memberships = [Membership(user_id=pk, group_id=group.pk) for pk in user_ids[start:start + BATCH_SIZE]]
+        Membership.objects.using(db).bulk_create(memberships)
+        added += len(memberships)
+
+    if added:
+        # Os sinais de m2m_changed não disparam nos modelos históricos: o
+        # "sem grupo" em cache do GroupMiddleware é invalidado aqui
+        from records.groups import invalidate_all_user_groups
+        invalidate_all_user_groups()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('records', '0019_relic_main_image_processed'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_users_to_default_group, migrations.RunPython.noop),
+    ]
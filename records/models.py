@@ -1,8 +1,14 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.utils import timezone
 import os
 from uuid import uuid4
 
+from .storage import blob_storage
+
+# Obs.: com o storage endereçado por conteúdo (records/storage.py) só a extensão
+# destes nomes é aproveitada; o arquivo final fica em blobs/ com o SHA-256 do conteúdo.
+
 # Função para definir o caminho de upload das fotos de perfil dos clientes
 def client_photo_upload_path(instance, filename):
     ext = filename.split('.')[-1]
@@ -19,6 +25,14 @@ def relic_image_upload_path(instance, filename):
 class State(models.Model):
     name = models.CharField(max_length=80)
     uf = models.CharField(max_length=2)
+    # Última alteração (ETag/Last-Modified, ver records/watermarks.py)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # StateList ordena por nome
+            models.Index(fields=['name'], name='state_name_idx'),
+        ]
 
     def __str__(self):
         return "{} - {}".format(self.name, self.uf)
@@ -27,6 +41,14 @@ class State(models.Model):
 class City(models.Model):
     name = models.CharField(max_length=150)
     state = models.ForeignKey(State, on_delete=models.PROTECT)
+    # Última alteração (ETag/Last-Modified, ver records/watermarks.py)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # CityList ordena por nome
+            models.Index(fields=['name'], name='city_name_idx'),
+        ]
 
     def __str__(self):
         return "{}, {}".format(self.name, self.state.name)
@@ -38,6 +60,14 @@ class Address(models.Model):
     neighborhood = models.CharField(max_length=150)
     complement = models.CharField(max_length=100)
     city = models.ForeignKey(City, on_delete=models.PROTECT)
+    # Última alteração (ETag/Last-Modified, ver records/watermarks.py)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # AddressList ordena por rua e número
+            models.Index(fields=['street', 'number'], name='address_street_number_idx'),
+        ]
 
     def __str__(self):
         return "{}, {}. \n{} n{}°, {}".format(self.city.state.name, self.city.name, self.street, self.number, self.neighborhood)
@@ -51,6 +81,7 @@ class Client(models.Model):
     birth_date = models.DateField()
     profile_photo = models.ImageField(
         upload_to=client_photo_upload_path, 
+        storage=blob_storage,
         null=True, 
         blank=True,
         help_text='Foto de perfil do cliente (opcional)'
@@ -59,6 +90,16 @@ class Client(models.Model):
     last_activity = models.DateTimeField(auto_now=True)
     address = models.ForeignKey(Address, on_delete=models.PROTECT, null=True, blank=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='clients', default=1)
+    # SHA-256 da foto de perfil, calculado em segundo plano (tarefa process_image)
+    profile_photo_checksum = models.CharField(max_length=64, blank=True, default='', editable=False)
+
+    class Meta:
+        indexes = [
+            # ClientList ordena por -register_date; ClientFilter filtra por birth_date e created_by
+            models.Index(fields=['-register_date'], name='client_register_idx'),
+            models.Index(fields=['birth_date'], name='client_birth_idx'),
+            models.Index(fields=['created_by', '-register_date'], name='client_creator_register_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         # Automaticamente sincronizar email com o usuário Django
@@ -82,14 +123,73 @@ class Relic(models.Model):
     adoption_fee = models.BooleanField(default=False)
     client = models.ForeignKey(Client, on_delete=models.PROTECT)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='relics', default=1)
+    # Imagem principal denormalizada (mantida por RelicImage.save/delete) para os cards
+    main_image = models.ForeignKey(
+        'RelicImage',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        editable=False
+    )
+    main_image_url = models.CharField(max_length=255, blank=True, default='', editable=False)
+    main_image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    main_image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    # Miniaturas/WebP da imagem principal já geradas (tarefa process_image): só então há srcset
+    main_image_processed = models.BooleanField(default=False, editable=False)
+    # Última alteração (ETag/Last-Modified, ver records/watermarks.py)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # RelicList/galeria ordenam por -obtained_date (com id como desempate do cursor)
+            models.Index(fields=['-obtained_date', '-id'], name='relic_obtained_idx'),
+            # RelicFilter: created_by, client e adoption_fee, sempre com a mesma ordenação
+            models.Index(fields=['created_by', '-obtained_date'], name='relic_creator_obtained_idx'),
+            models.Index(fields=['client', '-obtained_date'], name='relic_client_obtained_idx'),
+            models.Index(fields=['adoption_fee', '-obtained_date'], name='relic_fee_obtained_idx'),
+            # ProfileView lista as relíquias do usuário por -id
+            models.Index(fields=['created_by', '-id'], name='relic_creator_id_idx'),
+        ]
 
     def __str__(self):
         return "{}, {}".format(self.name, self.description)
 
     def get_main_image(self):
-        """Retorna a primeira imagem da relíquia (imagem principal)"""
-        first_image = self.images.first()
-        return first_image.image if first_image else None
+        """Retorna a imagem principal da relíquia (use select_related('main_image') nas listas)"""
+        return self.main_image.image if self.main_image_id else None
+
+    def set_main_image(self, image):
+        """Aponta a imagem principal para `image` (ou nenhuma) e grava os dados em cache"""
+        url, width, height, processed = '', None, None, False
+        if image is not None and image.image:
+            url = image.image.url
+            # O checksum é gravado pelo process_image depois de gerar os derivados
+            processed = bool(image.checksum)
+            try:
+                width, height = image.image.width, image.image.height
+            except (OSError, ValueError):
+                # Arquivo ausente ou ilegível: mantém apenas a URL
+                pass
+
+        self.main_image = image
+        self.main_image_url = url
+        self.main_image_width = width
+        self.main_image_height = height
+        self.main_image_processed = processed
+        self.updated_at = timezone.now()
+        Relic.objects.filter(pk=self.pk).update(
+            main_image=image,
+            main_image_url=url,
+            main_image_width=width,
+            main_image_height=height,
+            main_image_processed=processed,
+            updated_at=self.updated_at
+        )
+
+    def refresh_main_image(self):
+        """Recalcula a imagem principal a partir das imagens existentes"""
+        self.set_main_image(self.images.order_by('-is_main', 'upload_date', 'id').first())
 
     def get_all_images(self):
         """Retorna todas as imagens da relíquia"""
@@ -100,6 +200,7 @@ class RelicImage(models.Model):
     relic = models.ForeignKey(Relic, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(
         upload_to=relic_image_upload_path,
+        storage=blob_storage,
         help_text='Imagem da relíquia'
     )
     is_main = models.BooleanField(
@@ -108,9 +209,17 @@ class RelicImage(models.Model):
     )
     upload_date = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='relic_images', default=1)
+    # SHA-256 do arquivo, calculado em segundo plano (tarefa process_image)
+    checksum = models.CharField(max_length=64, blank=True, default='', editable=False)
+    # Última alteração (ETag/Last-Modified, ver records/watermarks.py)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ['-is_main', 'upload_date']
+        indexes = [
+            # Imagens de uma relíquia na ordem padrão (principal primeiro)
+            models.Index(fields=['relic', '-is_main', 'upload_date'], name='relicimage_relic_order_idx'),
+        ]
         verbose_name = 'Imagem da Relíquia'
         verbose_name_plural = 'Imagens das Relíquias'
 
@@ -119,10 +228,27 @@ class RelicImage(models.Model):
         return f"Imagem de {self.relic.name}{main_text}"
 
     def save(self, *args, **kwargs):
-        # Se esta imagem está sendo marcada como principal, desmarcar as outras
-        if self.is_main:
-            RelicImage.objects.filter(relic=self.relic, is_main=True).update(is_main=False)
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            relic = self.relic
+            # Se esta imagem passou a ser a principal, desmarcar as outras
+            if self.is_main and relic.main_image_id != self.pk:
+                RelicImage.objects.filter(relic=relic, is_main=True).exclude(pk=self.pk).update(is_main=False)
+            super().save(*args, **kwargs)
+
+            # Manter o ponteiro denormalizado Relic.main_image atualizado
+            if self.is_main or relic.main_image_id is None:
+                relic.set_main_image(self)
+            elif relic.main_image_id == self.pk:
+                relic.refresh_main_image()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            relic = self.relic
+            was_main = relic.main_image_id == self.pk
+            result = super().delete(*args, **kwargs)
+            if was_main:
+                relic.refresh_main_image()
+            return result
     
 # -Classe Adoção
 class Adoption(models.Model):
@@ -132,6 +258,16 @@ class Adoption(models.Model):
     new_owner = models.ForeignKey(Client, on_delete=models.PROTECT, related_name='adoptions_received')
     previous_owner = models.ForeignKey(Client, on_delete=models.PROTECT, related_name='adoptions_given')
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='adoptions', default=1)
+    # Última alteração (ETag/Last-Modified, ver records/watermarks.py)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # AdoptionList e ProfileView filtram por created_by e ordenam por -adoption_date
+            models.Index(fields=['created_by', '-adoption_date'], name='adoption_creator_date_idx'),
+            # Pagamento confirmado atualiza as adoções pendentes da relíquia (records/adoptions.py)
+            models.Index(fields=['relic', 'payment_status'], name='adoption_relic_payment_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         # Automatically set previous_owner from the relic's client
@@ -148,10 +284,145 @@ class AdoptionRelic(models.Model):
     adoption = models.ForeignKey(Adoption, on_delete=models.PROTECT)
     relic = models.ForeignKey(Relic, on_delete=models.PROTECT)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='adoption_relics', default=1)
+    # Última alteração (ETag/Last-Modified, ver records/watermarks.py)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return "{}, {}".format(self.adoption.adoption_date, self.relic.name)
     
     class Meta:
         verbose_name = "Adoção-Relíquia (Depreciado)"
-        verbose_name_plural = "Adoções-Relíquias (Depreciado)"
\ No newline at end of file
+        verbose_name_plural = "Adoções-Relíquias (Depreciado)"
+
+# -Classe Tarefa (fila de processamento em segundo plano, ver records/tasks.py)
+class Job(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pendente'),
+        (RUNNING, 'Executando'),
+        (DONE, 'Concluída'),
+        (FAILED, 'Falhou'),
+    ]
+
+    name = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    # Identifica a rodada de claim do worker que pegou a tarefa
+    locked_by = models.CharField(max_length=64, blank=True, default='')
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['run_at', 'id']
+        indexes = [
+            # Os workers buscam as tarefas pendentes já liberadas, na ordem de execução
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+        verbose_name = 'Tarefa'
+        verbose_name_plural = 'Tarefas'
+
+    def __str__(self):
+        return "{} [{}] ({}/{})".format(self.name, self.get_status_display(), self.attempts, self.max_attempts)
+
+# -Classe Arquivo (storage endereçado por conteúdo, ver records/storage.py e records/blobs.py)
+class Blob(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField(default=0)
+    # Quantos RelicImage.image / Client.profile_photo apontam para o arquivo
+    refcount = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # O coletor só percorre os arquivos sem referências
+            models.Index(fields=['updated_at'], condition=models.Q(refcount=0), name='blob_unreferenced_idx'),
+        ]
+
+    def __str__(self):
+        return "{} ({} refs)".format(self.name, self.refcount)
+
+# -Classe Estatísticas do Usuário (contadores do painel, ver records/stats.py)
+class UserStats(models.Model):
+    # user nulo: linha única com os totais do sistema
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='stats', null=True, blank=True)
+    users = models.PositiveIntegerField(default=0)
+    clients = models.PositiveIntegerField(default=0)
+    relics = models.PositiveIntegerField(default=0)
+    adoptions = models.PositiveIntegerField(default=0)
+    adoptions_given = models.PositiveIntegerField(default=0)
+    adoptions_received = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Estatísticas do Usuário'
+        verbose_name_plural = 'Estatísticas dos Usuários'
+
+    def __str__(self):
+        return "Estatísticas de {}".format(self.user.username if self.user_id else 'todo o sistema')
+
+# -Classe Marca d'água (versão de cada modelo para ETag/Last-Modified, ver records/watermarks.py)
+class Watermark(models.Model):
+    # app_label.model_name, ex.: records.relic
+    model = models.CharField(max_length=100, unique=True)
+    # Incrementada a cada alteração (inclusive exclusões, que o max(updated_at) não enxerga)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return "{} v{}".format(self.model, self.version)
+
+# -Classe Importação (importação em lote com checkpoint, ver records/imports.py)
+class ImportRun(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pendente'),
+        (RUNNING, 'Executando'),
+        (DONE, 'Concluída'),
+        (FAILED, 'Falhou'),
+    ]
+    KIND_CHOICES = [
+        ('client', 'Clientes'),
+        ('relic', 'Relíquias'),
+    ]
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('jsonl', 'JSONL'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    format = models.CharField(max_length=5, choices=FORMAT_CHOICES, default='csv')
+    # Caminho do arquivo (comando) ou nome no storage (upload pelo admin)
+    file_name = models.CharField(max_length=255)
+    file_size = models.PositiveBigIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    # Checkpoint: registros já processados, gravado na mesma transação de cada lote
+    rows = models.PositiveIntegerField(default=0)
+    created = models.PositiveIntegerField(default=0)
+    errors = models.PositiveIntegerField(default=0)
+    error_report = models.CharField(max_length=255, blank=True, default='')
+    last_error = models.TextField(blank=True, default='')
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='import_runs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Importação'
+        verbose_name_plural = 'Importações'
+
+    def __str__(self):
+        return "{} {} [{}] ({} registros)".format(
+            self.get_kind_display(), os.path.basename(self.file_name), self.get_status_display(), self.rows
+        )
@@ -0,0 +1,215 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import F, Q
+
+
+class KnownCountPaginator(Paginator):
+    """
+    Paginator que reaproveita um total já calculado (ex.: pelas estatísticas
+    agregadas da lista) em vez de executar outro COUNT(*).
+    """
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        if count is not None:
+            # Paginator.count é um cached_property: preencher o cache evita a query
+            self.__dict__['count'] = count
+
+
+class CursorPage:
+    """Página de resultados da paginação keyset (imita a interface usada do Page)"""
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Paginação keyset sobre (chave de ordenação, id): cada página é um
+    WHERE (chave, id) < (último visto) LIMIT n, então páginas profundas custam
+    o mesmo que a primeira. Os cursores são opacos (base64 de JSON).
+
+    `ordering` é uma lista de nomes de campos locais do modelo no formato do
+    order_by ('-obtained_date', 'name', ...). Valores nulos ficam no final.
+    """
+    def __init__(self, queryset, per_page, ordering, with_count=False):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.model = queryset.model
+        self.ordering = self._normalize_ordering(ordering)
+        # Contagem exata é opcional: evita o COUNT(*) por página
+        self.count = queryset.count() if with_count else None
+
+    def _normalize_ordering(self, ordering):
+        fields = []
+        for name in ordering:
+            descending = name.startswith('-')
+            field = self.model._meta.get_field(name.lstrip('-'))
+            fields.append((field, descending))
+        # Desempate estável pela chave primária, no mesmo sentido da primeira chave
+        if not fields or not fields[-1][0].primary_key:
+            fields.append((self.model._meta.pk, fields[0][1] if fields else False))
+        return fields
+
+    def encode_cursor(self, obj, reverse=False):
+        values = []
+        for field, descending in self.ordering:
+            # Instâncias do modelo ou dicionários do values() (ex.: records/api.py)
+            value = obj[field.attname] if isinstance(obj, dict) else getattr(obj, field.attname)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        raw = json.dumps({'v': values, 'r': reverse}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, token):
+        """Retorna (valores, reverse) ou None para cursores ausentes/inválidos"""
+        if not token:
+            return None
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            raw_values = data['v']
+            if len(raw_values) != len(self.ordering):
+                return None
+            values = [
+                None if value is None else field.to_python(value)
+                for (field, descending), value in zip(self.ordering, raw_values)
+            ]
+            return values, bool(data.get('r'))
+        except (ValueError, KeyError, TypeError, binascii.Error, ValidationError):
+            return None
+
+    def _order_by(self, reverse):
+        expressions = []
+        for field, descending in self.ordering:
+            descending = descending != reverse
+            expression = F(field.name)
+            if field.null:
+                # Nulos sempre no final na ordem normal (logo, no início na reversa)
+                nulls = {'nulls_first': True} if reverse else {'nulls_last': True}
+                expression = expression.desc(**nulls) if descending else expression.asc(**nulls)
+            else:
+                expression = expression.desc() if descending else expression.asc()
+            expressions.append(expression)
+        return expressions
+
+    def _keyset_condition(self, values, reverse):
+        """Q para os itens depois (ou antes, se reverse) da posição `values`"""
+        condition = None
+        equal = Q()
+        for (field, descending), value in zip(self.ordering, values):
+            name = field.name
+            if not reverse:
+                if value is None:
+                    step = None  # nada vem depois de um nulo nesta chave
+                else:
+                    step = Q(**{'{}__{}'.format(name, 'lt' if descending else 'gt'): value})
+                    if field.null:
+                        step |= Q(**{'{}__isnull'.format(name): True})
+            else:
+                if value is None:
+                    step = Q(**{'{}__isnull'.format(name): False})
+                else:
+                    step = Q(**{'{}__{}'.format(name, 'gt' if descending else 'lt'): value})
+
+            if step is not None:
+                step = equal & step
+                condition = step if condition is None else condition | step
+            equal &= Q(**{'{}__isnull'.format(name): True}) if value is None else Q(**{name: value})
+        return condition if condition is not None else Q(pk__in=[])
+
+    def page(self, cursor=None):
+        position = self.decode_cursor(cursor)
+        reverse = bool(position and position[1])
+
+        queryset = self.queryset.order_by(*self._order_by(reverse))
+        if position:
+            queryset = queryset.filter(self._keyset_condition(position[0], reverse))
+
+        # Um item a mais indica se existe página seguinte (no sentido da leitura)
+        items = list(queryset[:self.per_page + 1])
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if reverse:
+            items.reverse()
+
+        if not items:
+            return CursorPage(items)
+
+        if reverse:
+            next_cursor = self.encode_cursor(items[-1])
+            previous_cursor = self.encode_cursor(items[0], reverse=True) if has_more else None
+        else:
+            next_cursor = self.encode_cursor(items[-1]) if has_more else None
+            previous_cursor = self.encode_cursor(items[0], reverse=True) if position else None
+        return CursorPage(items, next_cursor, previous_cursor)
+
+
+class CursorPaginationMixin:
+    """
+    Modo de paginação por cursor para ListView/FilterView.
+
+    Ativado com ?cursor= na URL (vazio = primeira página) ou com
+    `cursor_pagination = True` na view. A ordenação vem de `cursor_ordering`
+    ou, por padrão, do order_by do queryset da view. O total exato só é
+    calculado se `cursor_count = True`.
+
+    Parâmetros em `cursor_exclusive_params` (ex.: a busca, ordenada por
+    relevância, que não tem chave de cursor) desligam o modo cursor quando
+    preenchidos: a página volta a ser numerada e mantém a ordem deles.
+    """
+    cursor_param = 'cursor'
+    cursor_pagination = False
+    cursor_ordering = None
+    cursor_count = False
+    cursor_exclusive_params = ()
+
+    def cursor_available(self):
+        return not any(self.request.GET.get(name) for name in self.cursor_exclusive_params)
+
+    def is_cursor_paginated(self):
+        if not self.cursor_available():
+            return False
+        return self.cursor_pagination or self.cursor_param in self.request.GET
+
+    def get_cursor_ordering(self, queryset):
+        if self.cursor_ordering:
+            return self.cursor_ordering
+        return [name for name in queryset.query.order_by if isinstance(name, str)]
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.is_cursor_paginated():
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = CursorPaginator(
+            queryset,
+            page_size,
+            ordering=self.get_cursor_ordering(queryset),
+            with_count=self.cursor_count
+        )
+        page = paginator.page(self.request.GET.get(self.cursor_param))
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['cursor_paginated'] = bool(self.get_paginate_by(self.object_list)) and self.is_cursor_paginated()
+        context['cursor_available'] = self.cursor_available()
+        return context
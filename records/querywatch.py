@@ -0,0 +1,157 @@
+"""
+Detector de N+1 e de queries lentas por requisição.
+
+O QueryWatchMiddleware (records/middleware.py) instala um `QueryWatcher` em
+todas as conexões. Em uma amostra das requisições (QUERY_WATCH_SAMPLE_RATE)
+cada query é reduzida a uma impressão digital (SQL com literais e listas do
+IN normalizados); quando a mesma forma se repete QUERY_WATCH_THRESHOLD vezes,
+é capturada a pilha Python e de templates que disparou a repetição. Queries
+acima de SLOW_QUERY_MS são registradas em todas as requisições.
+
+No final da requisição cada ocorrência vira um registro de log estruturado
+no logger `records.queries` (em JSON com o JsonFormatter abaixo).
+"""
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+from functools import lru_cache
+
+from django.conf import settings
+
+logger = logging.getLogger('records.queries')
+
+# Literais e listas de tamanho variável não mudam a "forma" da query
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+IN_LIST = re.compile(r'\bIN \((?:\s*(?:%s|\?)\s*,)*\s*(?:%s|\?)\s*\)', re.IGNORECASE)
+
+# A própria instrumentação não interessa na pilha
+INSTRUMENTATION_FILES = {
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    for name in ('querywatch.py', 'metrics.py', 'middleware.py')
+}
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """(SQL normalizado, hash curto) de uma query"""
+    normalized = STRING_LITERAL.sub('?', sql)
+    normalized = NUMBER_LITERAL.sub('?', normalized)
+    normalized = IN_LIST.sub('IN (...)', normalized)
+    return normalized, hashlib.md5(normalized.encode()).hexdigest()[:12]
+
+
+def capture_stack(depth=None):
+    """
+    Frames do projeto (fora do Django e das bibliotecas) e templates em
+    renderização, do mais interno para o mais externo.
+    """
+    depth = depth or getattr(settings, 'QUERY_WATCH_STACK_DEPTH', 8)
+    base_dir = str(settings.BASE_DIR)
+    code = []
+    templates = []
+    frame = sys._getframe(1)
+    while frame is not None and (len(code) < depth or len(templates) < depth):
+        filename = frame.f_code.co_filename
+        if frame.f_code.co_name == 'render_annotated' and filename.endswith(os.path.join('template', 'base.py')):
+            # Node.render_annotated: o nó sabe o template e a linha de origem
+            node = frame.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                entry = '{}:{}'.format(origin.template_name or origin.name, token.lineno)
+                if len(templates) < depth and (not templates or templates[-1] != entry):
+                    templates.append(entry)
+        elif (filename.startswith(base_dir) and filename not in INSTRUMENTATION_FILES
+              and 'site-packages' not in filename and len(code) < depth):
+            code.append('{}:{} in {}'.format(
+                os.path.relpath(filename, base_dir), frame.f_lineno, frame.f_code.co_name
+            ))
+        frame = frame.f_back
+    return code, templates
+
+
+class QueryWatcher:
+    """Wrapper para `connection.execute_wrapper` (um por requisição)"""
+
+    def __init__(self, sampled):
+        self.sampled = sampled
+        self.threshold = getattr(settings, 'QUERY_WATCH_THRESHOLD', 5)
+        self.slow_seconds = getattr(settings, 'SLOW_QUERY_MS', 200) / 1000
+        self.shapes = {}  # hash -> [contagem, tempo total, sql normalizado]
+        self.stacks = {}  # hash -> pilha capturada ao atingir o limite
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            if self.sampled:
+                normalized, key = fingerprint(sql)
+                shape = self.shapes.get(key)
+                if shape is None:
+                    self.shapes[key] = [1, duration, normalized]
+                else:
+                    shape[0] += 1
+                    shape[1] += duration
+                    # Pilha só uma vez por forma: o custo fica restrito às repetições
+                    if shape[0] == self.threshold:
+                        self.stacks[key] = capture_stack()
+            if duration >= self.slow_seconds:
+                self.slow.append((sql, duration, capture_stack()))
+
+    def report(self, request):
+        match = getattr(request, 'resolver_match', None)
+        base = {
+            'view': match.view_name if match else None,
+            'path': request.path,
+            'method': request.method,
+        }
+        for key, (count, duration, normalized) in self.shapes.items():
+            if count < self.threshold:
+                continue
+            code, templates = self.stacks.get(key, ([], []))
+            logger.warning(
+                'N+1: %s queries com a mesma forma em %s', count, base['view'] or request.path,
+                extra={'query': dict(
+                    base, event='n_plus_one', fingerprint=key, count=count,
+                    duration_ms=round(duration * 1000, 2), sql=normalized[:1000],
+                    stack=code, templates=templates,
+                )},
+            )
+        for sql, duration, (code, templates) in self.slow:
+            normalized, key = fingerprint(sql)
+            logger.warning(
+                'Query lenta: %.0f ms em %s', duration * 1000, base['view'] or request.path,
+                extra={'query': dict(
+                    base, event='slow_query', fingerprint=key,
+                    duration_ms=round(duration * 1000, 2), sql=normalized[:1000],
+                    stack=code, templates=templates,
+                )},
+            )
+
+
+def start():
+    """Watcher para uma requisição, sorteando se ela entra na amostra"""
+    return QueryWatcher(sampled=random.random() < getattr(settings, 'QUERY_WATCH_SAMPLE_RATE', 0.1))
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro, com os campos de `extra={'query': ...}`"""
+
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        data.update(getattr(record, 'query', {}))
+        return json.dumps(data, ensure_ascii=False, default=str)
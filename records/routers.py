@@ -0,0 +1,91 @@
+"""
+Leituras em réplica para as views de listagem e do painel.
+
+Com settings.DATABASES['replica'] configurado, as views com ReplicaReadMixin
+leem da réplica durante um GET. Todo o resto usa o banco principal: escritas,
+comandos, tarefas e qualquer leitura fora dessas views.
+
+Depois de uma escrita a requisição passa a ler do principal, e o
+ReplicaRoutingMiddleware grava um cookie que fixa o principal por
+REPLICA_STICKY_SECONDS. Assim o redirect após RelicCreate/AdoptionCreate já
+mostra o registro novo, mesmo com atraso de replicação.
+
+Para testar localmente com dois arquivos SQLite:
+    REPLICA_DATABASE_URL=sqlite:///replica.sqlite3 python manage.py sync_replica
+    REPLICA_DATABASE_URL=sqlite:///replica.sqlite3 python manage.py runserver
+"""
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA_DB_ALIAS = 'replica'
+STICKY_COOKIE = 'db_primary_until'
+
+_state = ContextVar('db_routing_state', default=None)
+
+
+class RoutingState:
+    __slots__ = ('read_replica', 'wrote')
+
+    def __init__(self):
+        self.read_replica = False
+        self.wrote = False
+
+
+def replica_configured():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+def begin_request():
+    """Estado de roteamento da requisição (retorna o token para `end_request`)"""
+    return _state.set(RoutingState())
+
+
+def end_request(token):
+    state = _state.get()
+    _state.reset(token)
+    return state
+
+
+def is_pinned_to_primary(request):
+    try:
+        return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+class ReplicaRouter:
+    """Leituras na réplica só quando a view pediu e nada foi escrito na requisição"""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is not None and state.read_replica and not state.wrote and replica_configured():
+            return REPLICA_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        # A sessão é salva em quase todo login/mensagem e não é lida das listas
+        if state is not None and model._meta.app_label != 'sessions':
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Mesmos dados nos dois bancos
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # A réplica recebe o schema pela replicação (ou pelo sync_replica)
+        return db != REPLICA_DB_ALIAS
+
+
+class ReplicaReadMixin:
+    """Views somente leitura: os GETs leem da réplica (exceto logo após uma escrita)"""
+
+    def dispatch(self, request, *args, **kwargs):
+        state = _state.get()
+        if state is not None and request.method in ('GET', 'HEAD') and not is_pinned_to_primary(request):
+            state.read_replica = True
+        return super().dispatch(request, *args, **kwargs)
@@ -0,0 +1,182 @@
+"""
+Busca textual de relíquias e clientes.
+
+Substitui os filtros icontains (LIKE '%...%', que sempre varrem a tabela
+inteira) por índices de texto completo:
+
+- SQLite: tabelas virtuais FTS5 (`<tabela>_search`) com rowid igual ao id do
+  registro, mantidas em sincronia pelos sinais em records/signals.py.
+- PostgreSQL: índice GIN sobre `to_tsvector` com a configuração `records_pt`
+  (português + unaccent). O próprio banco mantém o índice atualizado.
+
+As tabelas/índices são criados pela migration 0011_search_index.
+
+A ordem por relevância não tem chave de cursor: com `search` as listas usam
+sempre as páginas numeradas (cursor_exclusive_params, records/pagination.py).
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Client, Relic
+
+# Campos indexados por modelo (a ordem define as colunas da tabela FTS5)
+SEARCH_FIELDS = {
+    Relic: ['name', 'description'],
+    Client: ['name', 'nickname', 'email'],
+}
+
+PG_SEARCH_CONFIG = 'records_pt'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def search_table(model):
+    return '{}_search'.format(model._meta.db_table)
+
+
+def pg_vector_sql(model, table=None):
+    """Expressão tsvector do modelo; precisa ser idêntica à do índice GIN"""
+    prefix = '"{}".'.format(table) if table else ''
+    columns = " || ' ' || ".join(
+        'coalesce({}"{}", \'\')'.format(prefix, model._meta.get_field(name).column)
+        for name in SEARCH_FIELDS[model]
+    )
+    return "to_tsvector('{}', {})".format(PG_SEARCH_CONFIG, columns)
+
+
+class SearchBackend:
+    """Backend nulo: usado em bancos sem suporte, cai para icontains"""
+
+    def index(self, instance):
+        pass
+
+    def remove(self, instance):
+        pass
+
+    def index_many(self, model, pks):
+        pass
+
+    def rebuild(self, model):
+        return 0
+
+    def search(self, queryset, query):
+        condition = Q()
+        for token in _TOKEN_RE.findall(query):
+            token_condition = Q()
+            for name in SEARCH_FIELDS[queryset.model]:
+                token_condition |= Q(**{'{}__icontains'.format(name): token})
+            condition &= token_condition
+        return queryset.filter(condition)
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """Busca com FTS5; ranking pelo bm25 (coluna `rank`)"""
+
+    def index(self, instance):
+        model = type(instance)
+        fields = SEARCH_FIELDS[model]
+        table = search_table(model)
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM "{}" WHERE rowid = %s'.format(table), [instance.pk])
+            cursor.execute(
+                'INSERT INTO "{}" (rowid, {}) VALUES (%s, {})'.format(
+                    table, ', '.join(fields), ', '.join(['%s'] * len(fields))
+                ),
+                [instance.pk] + [getattr(instance, name) or '' for name in fields]
+            )
+
+    def remove(self, instance):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM "{}" WHERE rowid = %s'.format(search_table(type(instance))), [instance.pk])
+
+    def index_many(self, model, pks):
+        """Indexa registros recém-criados em lote (bulk_create não dispara sinais)"""
+        fields = SEARCH_FIELDS[model]
+        table = search_table(model)
+        pks = list(pks)
+        with connection.cursor() as cursor:
+            # Em blocos, dentro do limite de parâmetros por query do SQLite
+            for start in range(0, len(pks), 900):
+                chunk = pks[start:start + 900]
+                cursor.execute(
+                    'INSERT INTO "{}" (rowid, {}) SELECT id, {} FROM "{}" WHERE id IN ({})'.format(
+                        table,
+                        ', '.join(fields),
+                        ', '.join("coalesce({}, '')".format(name) for name in fields),
+                        model._meta.db_table,
+                        ', '.join(['%s'] * len(chunk)),
+                    ),
+                    chunk
+                )
+
+    def rebuild(self, model):
+        fields = SEARCH_FIELDS[model]
+        table = search_table(model)
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM "{}"'.format(table))
+            cursor.execute(
+                'INSERT INTO "{}" (rowid, {}) SELECT id, {} FROM "{}"'.format(
+                    table,
+                    ', '.join(fields),
+                    ', '.join("coalesce({}, '')".format(name) for name in fields),
+                    model._meta.db_table,
+                )
+            )
+            return cursor.rowcount
+
+    def build_match(self, query):
+        # Cada palavra vira um termo entre aspas com prefixo (busca parcial),
+        # o que também neutraliza a sintaxe de consulta do FTS5
+        tokens = _TOKEN_RE.findall(query)
+        return ' '.join('"{}"*'.format(token) for token in tokens)
+
+    def search(self, queryset, query):
+        match = self.build_match(query)
+        if not match:
+            return queryset
+        model_table = queryset.model._meta.db_table
+        table = search_table(queryset.model)
+        return queryset.extra(
+            tables=[table],
+            where=[
+                '"{}".rowid = "{}".id'.format(table, model_table),
+                '"{}" MATCH %s'.format(table),
+            ],
+            params=[match],
+            select={'search_rank': '"{}".rank'.format(table)},
+            order_by=['search_rank'],
+        )
+
+
+class PostgreSQLSearchBackend(SearchBackend):
+    """Busca com tsvector/GIN; ranking por ts_rank"""
+
+    def search(self, queryset, query):
+        if not _TOKEN_RE.search(query):
+            return queryset
+        vector = pg_vector_sql(queryset.model, queryset.model._meta.db_table)
+        tsquery = "websearch_to_tsquery('{}', %s)".format(PG_SEARCH_CONFIG)
+        return queryset.extra(
+            where=['{} @@ {}'.format(vector, tsquery)],
+            params=[query],
+            select={'search_rank': 'ts_rank({}, {})'.format(vector, tsquery)},
+            select_params=[query],
+            order_by=['-search_rank'],
+        )
+
+
+_BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgreSQLSearchBackend,
+}
+
+
+def get_search_backend():
+    return _BACKENDS.get(connection.vendor, SearchBackend)()
+
+
+def search(queryset, query):
+    """Filtra o queryset pelo texto `query`, ordenando pela relevância"""
+    return get_search_backend().search(queryset, query)
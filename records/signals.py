@@ -1,7 +1,17 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
 from django.dispatch import receiver
-from django.contrib.auth.models import User
-from .models import Client
+from django.contrib.auth.models import Group, User
+from .models import Adoption, Client, Relic, RelicImage
+from .gallery import invalidate_gallery
+from .search import SEARCH_FIELDS, get_search_backend
+from .blobs import IMAGE_FIELDS, add_reference, release_reference
+from .tasks import enqueue
+from .groups import add_to_default_group, invalidate_user_group, invalidate_all_user_groups
+from .stats import bump_user_stats, invalidate_relic_stats
+from . import cards, watermarks
+from .watermarks import WATERMARKED_MODELS, model_label
 
 @receiver(post_save, sender=User)
 def create_or_update_client_profile(sender, instance, created, **kwargs):
@@ -10,7 +20,8 @@ def create_or_update_client_profile(sender, instance, created, **kwargs):
     ou atualiza o perfil existente quando o usuário é modificado
     """
     if created:
-        # Usuário recém criado - criar perfil de cliente
+        # Usuário recém criado - adicionar ao grupo padrão e criar perfil de cliente
+        add_to_default_group(instance)
         Client.objects.create(
             user=instance,
             name=instance.get_full_name() or instance.username,
@@ -38,3 +49,188 @@ def create_or_update_client_profile(sender, instance, created, **kwargs):
                 birth_date='1990-01-01',  # Data padrão
                 created_by=instance
             )
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_cached_user_group(sender, instance, action, reverse, pk_set, **kwargs):
+    """Invalida o grupo em cache dos usuários afetados (usado pelo GroupMiddleware)"""
+    if action not in ('post_add', 'post_remove', 'pre_clear', 'post_clear'):
+        return
+    if not reverse:
+        # user.groups.add/remove/clear
+        user_ids = [instance.pk]
+    elif action == 'pre_clear':
+        # group.user_set.clear(): os usuários só são conhecidos antes de limpar
+        user_ids = list(instance.user_set.values_list('pk', flat=True))
+    else:
+        user_ids = list(pk_set or [])
+    if user_ids:
+        transaction.on_commit(lambda: invalidate_user_group(*user_ids))
+
+
+@receiver([post_save, post_delete], sender=Group)
+def invalidate_cached_user_groups(sender, **kwargs):
+    """Grupo renomeado ou apagado: invalida o grupo em cache de todos os usuários"""
+    transaction.on_commit(invalidate_all_user_groups)
+
+
+@receiver([post_save, post_delete], sender=Relic)
+@receiver([post_save, post_delete], sender=RelicImage)
+@receiver([post_save, post_delete], sender=Client)
+def invalidate_relic_gallery(sender, **kwargs):
+    """
+    Invalida as páginas em cache da galeria quando uma relíquia, imagem
+    ou proprietário (nome exibido no card) muda. A invalidação só acontece
+    após o commit para não repopular o cache com dados antigos.
+    """
+    transaction.on_commit(invalidate_gallery)
+
+
+@receiver([post_save, post_delete], sender=Relic)
+def invalidate_relic_list_stats(sender, **kwargs):
+    """Totais da lista de relíquias (e do paginador) valem até a próxima alteração"""
+    transaction.on_commit(invalidate_relic_stats)
+
+
+@receiver([post_save, post_delete], sender=Relic)
+@receiver([post_save, post_delete], sender=Client)
+@receiver([post_save, post_delete], sender=RelicImage)
+@receiver(post_save, sender=User)
+def invalidate_cards(sender, instance, update_fields=None, **kwargs):
+    """
+    Troca a versão do registro nos cards em cache (records/cards.py). Imagens
+    contam como alteração da relíquia; o login (só last_login) não muda nada
+    exibido.
+    """
+    if sender is User and update_fields and set(update_fields) <= {'last_login'}:
+        return
+    if sender is RelicImage:
+        kind, pk = 'relic', instance.relic_id
+    else:
+        kind, pk = sender._meta.model_name, instance.pk
+    transaction.on_commit(lambda: cards.bump(kind, pk))
+
+
+def touch_watermark(sender, update_fields=None, **kwargs):
+    """Nova versão do modelo para o GET condicional (records/watermarks.py)"""
+    if sender is User and update_fields and set(update_fields) <= {'last_login'}:
+        return
+    transaction.on_commit(lambda: watermarks.touch(sender))
+
+
+for model in WATERMARKED_MODELS:
+    post_save.connect(touch_watermark, sender=model, dispatch_uid='watermark-save-{}'.format(model_label(model)))
+    post_delete.connect(touch_watermark, sender=model, dispatch_uid='watermark-delete-{}'.format(model_label(model)))
+
+
+@receiver(post_save, sender=Relic)
+@receiver(post_save, sender=Client)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    """Mantém o índice de busca textual em sincronia com o registro salvo"""
+    # Saves parciais que não tocam nos campos indexados (ex.: last_activity) não precisam reindexar
+    if update_fields and not set(update_fields) & set(SEARCH_FIELDS[sender]):
+        return
+    get_search_backend().index(instance)
+
+
+@receiver(post_delete, sender=Relic)
+@receiver(post_delete, sender=Client)
+def remove_from_search_index(sender, instance, **kwargs):
+    get_search_backend().remove(instance)
+
+
+@receiver(pre_save, sender=RelicImage)
+@receiver(pre_save, sender=Client)
+def detect_new_upload(sender, instance, update_fields=None, **kwargs):
+    """
+    Marca a instância quando o save vai gravar um arquivo recém-enviado e
+    guarda o arquivo referenciado antes do save (para a contagem de referências)
+    """
+    field_name = IMAGE_FIELDS[sender]
+    field_file = getattr(instance, field_name)
+    instance._new_image_upload = bool(field_file) and not field_file._committed
+
+    instance._previous_file_name = None
+    if instance.pk and (update_fields is None or field_name in update_fields):
+        instance._previous_file_name = sender.objects.filter(pk=instance.pk).values_list(field_name, flat=True).first()
+
+
+@receiver(post_save, sender=RelicImage)
+@receiver(post_save, sender=Client)
+def update_file_references(sender, instance, update_fields=None, **kwargs):
+    """Atualiza a contagem de referências quando o arquivo do registro muda"""
+    field_name = IMAGE_FIELDS[sender]
+    if update_fields is not None and field_name not in update_fields:
+        return
+    previous = getattr(instance, '_previous_file_name', None) or ''
+    current = getattr(instance, field_name).name or ''
+    if previous != current:
+        add_reference(current)
+        release_reference(previous)
+
+
+@receiver(post_save, sender=RelicImage)
+@receiver(post_save, sender=Client)
+def process_uploaded_image(sender, instance, **kwargs):
+    """Agenda o pós-processamento do upload (checksum, miniaturas/WebP)"""
+    if not getattr(instance, '_new_image_upload', False):
+        return
+    instance._new_image_upload = False
+    field_name = IMAGE_FIELDS[sender]
+    enqueue(
+        'process_image',
+        model=sender._meta.label,
+        pk=instance.pk,
+        field=field_name,
+        file_name=getattr(instance, field_name).name,
+    )
+
+
+@receiver(post_delete, sender=RelicImage)
+@receiver(post_delete, sender=Client)
+def release_file_reference(sender, instance, **kwargs):
+    """O arquivo (compartilhado) só é apagado quando a última referência some"""
+    release_reference(getattr(instance, IMAGE_FIELDS[sender]).name)
+
+
+def _counter_delta(signal, created):
+    """+1 para registros criados, -1 para apagados e 0 para simples atualizações"""
+    if signal is post_delete:
+        return -1
+    return 1 if created else 0
+
+
+@receiver([post_save, post_delete], sender=User)
+def count_users(sender, signal, created=False, **kwargs):
+    bump_user_stats(None, users=_counter_delta(signal, created))
+
+
+@receiver([post_save, post_delete], sender=Client)
+@receiver([post_save, post_delete], sender=Relic)
+def count_clients_and_relics(sender, instance, signal, created=False, **kwargs):
+    """Mantém os contadores materializados do painel (UserStats)"""
+    delta = _counter_delta(signal, created)
+    if not delta:
+        return
+    field = 'clients' if sender is Client else 'relics'
+    bump_user_stats(None, **{field: delta})
+    bump_user_stats(instance.created_by_id, **{field: delta})
+
+
+@receiver([post_save, post_delete], sender=Adoption)
+def count_adoptions(sender, instance, signal, created=False, **kwargs):
+    delta = _counter_delta(signal, created)
+    if not delta:
+        return
+    bump_user_stats(None, adoptions=delta)
+    bump_user_stats(instance.created_by_id, adoptions=delta)
+
+    # Doadas/recebidas contam para quem cadastrou o cliente dono/novo dono
+    owners = dict(
+        Client.objects.filter(pk__in=[instance.previous_owner_id, instance.new_owner_id])
+        .values_list('pk', 'created_by_id')
+    )
+    if instance.previous_owner_id in owners:
+        bump_user_stats(owners[instance.previous_owner_id], adoptions_given=delta)
+    if instance.new_owner_id in owners:
+        bump_user_stats(owners[instance.new_owner_id], adoptions_received=delta)
@@ -0,0 +1,201 @@
+"""
+Estatísticas agregadas das listas de registros.
+
+Todas as contagens exibidas no topo da lista de relíquias são calculadas em
+uma única query com agregação condicional e guardadas em cache por conjunto
+normalizado de filtros, com TTL curto. As chaves incluem uma versão que é
+trocada após o commit de qualquer relíquia salva/apagada (sinais) ou
+alteração em massa, como na galeria: o total alimenta o KnownCountPaginator
+e não pode ficar defasado até o TTL vencer.
+
+Os contadores do painel (página inicial e perfil) ficam materializados na
+tabela UserStats: os sinais de Client, Relic, Adoption e User somam/subtraem
+a cada registro criado/apagado, e o comando `rebuild_stats` reconcilia.
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Value
+from django.db.models.functions import Greatest
+
+from .models import Adoption, Client, Relic, UserStats
+
+RELIC_STATS_CACHE_TIMEOUT = 60  # segundos
+RELIC_STATS_VERSION_KEY = 'relic-stats:version'
+
+
+def normalize_filter_params(filterset):
+    """Parâmetros de filtro preenchidos, em ordem estável (ignora page e afins)"""
+    data = filterset.data
+    items = sorted(
+        (name, data.get(name))
+        for name in filterset.filters
+        if data.get(name) not in (None, '')
+    )
+    return urlencode(items)
+
+
+def get_relic_stats_version():
+    return cache.get_or_set(RELIC_STATS_VERSION_KEY, lambda: time.time_ns(), None)
+
+
+def invalidate_relic_stats():
+    """Invalida as estatísticas de todos os filtros trocando a versão"""
+    try:
+        cache.incr(RELIC_STATS_VERSION_KEY)
+    except ValueError:
+        cache.set(RELIC_STATS_VERSION_KEY, time.time_ns(), None)
+
+
+def relic_stats_cache_key(params=''):
+    return 'relic-stats:{}:{}'.format(get_relic_stats_version(), hashlib.md5(params.encode()).hexdigest())
+
+
+def compute_relic_stats(queryset):
+    return queryset.order_by().aggregate(
+        total=Count('id'),
+        without_fee=Count('id', filter=Q(adoption_fee=False)),
+        with_fee=Count('id', filter=Q(adoption_fee=True)),
+        unique_owners=Count('client', distinct=True),
+    )
+
+
+def get_relic_stats(queryset, filterset):
+    """
+    Retorna total, com/sem taxa e proprietários distintos do queryset filtrado
+    em uma única passada pela tabela.
+    """
+    cache_key = relic_stats_cache_key(normalize_filter_params(filterset))
+
+    stats = cache.get(cache_key)
+    if stats is None:
+        stats = compute_relic_stats(queryset)
+        cache.set(cache_key, stats, RELIC_STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def refresh_relic_stats():
+    """Invalida as estatísticas e recalcula as da lista sem filtros (a mais acessada)"""
+    invalidate_relic_stats()
+    stats = compute_relic_stats(Relic.objects.all())
+    cache.set(relic_stats_cache_key(), stats, RELIC_STATS_CACHE_TIMEOUT)
+    return stats
+
+
+# ---------------------------------------------------------------------------
+# Contadores do painel (UserStats)
+# ---------------------------------------------------------------------------
+
+COUNTER_FIELDS = ['users', 'clients', 'relics', 'adoptions', 'adoptions_given', 'adoptions_received']
+
+
+def compute_user_stats(user=None):
+    """Contagens reais a partir das tabelas (user=None: totais do sistema)"""
+    if user is None:
+        return {
+            'users': User.objects.count(),
+            'clients': Client.objects.count(),
+            'relics': Relic.objects.count(),
+            'adoptions': Adoption.objects.count(),
+        }
+    return {
+        'clients': Client.objects.filter(created_by=user).count(),
+        'relics': Relic.objects.filter(created_by=user).count(),
+        'adoptions': Adoption.objects.filter(created_by=user).count(),
+        'adoptions_given': Adoption.objects.filter(previous_owner__created_by=user).count(),
+        'adoptions_received': Adoption.objects.filter(new_owner__created_by=user).count(),
+    }
+
+
+def _create_user_stats(user):
+    try:
+        with transaction.atomic():
+            return UserStats.objects.create(user=user, **compute_user_stats(user))
+    except IntegrityError:
+        # Criada por outra requisição ao mesmo tempo
+        return UserStats.objects.get(user=user)
+
+
+def get_dashboard_stats(user=None):
+    """
+    Retorna (totais do sistema, estatísticas do usuário) em uma única query.
+    Linhas que ainda não existem são calculadas e gravadas na primeira leitura.
+    """
+    condition = Q(user__isnull=True)
+    if user is not None:
+        condition |= Q(user=user)
+    rows = {row.user_id: row for row in UserStats.objects.filter(condition)}
+
+    site_stats = rows.get(None) or _create_user_stats(None)
+    user_stats = None
+    if user is not None:
+        user_stats = rows.get(user.pk) or _create_user_stats(user)
+    return site_stats, user_stats
+
+
+def get_user_stats(user):
+    return UserStats.objects.filter(user=user).first() or _create_user_stats(user)
+
+
+def bump_user_stats(user_id, **deltas):
+    """
+    Soma `deltas` aos contadores da linha (user_id=None: totais do sistema).
+    Se a linha ainda não existe nada é feito: ela é calculada na primeira leitura.
+    """
+    changes = {
+        name: Greatest(F(name) + delta, Value(0))
+        for name, delta in deltas.items() if delta
+    }
+    if changes:
+        UserStats.objects.filter(user_id=user_id).update(**changes)
+
+
+def rebuild_user_stats():
+    """
+    Recalcula todas as linhas de UserStats com uma query agrupada por contador.
+    Retorna (linhas criadas, linhas corrigidas).
+    """
+    grouped = {
+        'clients': Client.objects.values_list('created_by'),
+        'relics': Relic.objects.values_list('created_by'),
+        'adoptions': Adoption.objects.values_list('created_by'),
+        'adoptions_given': Adoption.objects.values_list('previous_owner__created_by'),
+        'adoptions_received': Adoption.objects.values_list('new_owner__created_by'),
+    }
+    expected = {}
+    for name, queryset in grouped.items():
+        for user_id, total in queryset.order_by().annotate(total=Count('pk')):
+            if user_id is not None:
+                expected.setdefault(user_id, {})[name] = total
+
+    with transaction.atomic():
+        existing = {}
+        for row in UserStats.objects.order_by('pk'):
+            if row.user_id in existing:
+                # Linha de totais duplicada (criada em paralelo na primeira leitura)
+                row.delete()
+            else:
+                existing[row.user_id] = row
+        expected[None] = compute_user_stats(None)
+
+        to_create = []
+        to_update = []
+        for user_id in User.objects.values_list('pk', flat=True).iterator():
+            expected.setdefault(user_id, {})
+        for user_id, counts in expected.items():
+            values = {name: counts.get(name, 0) for name in COUNTER_FIELDS}
+            row = existing.get(user_id)
+            if row is None:
+                to_create.append(UserStats(user_id=user_id, **values))
+            elif any(getattr(row, name) != value for name, value in values.items()):
+                for name, value in values.items():
+                    setattr(row, name, value)
+                to_update.append(row)
+
+        UserStats.objects.bulk_create(to_create, batch_size=500)
+        UserStats.objects.bulk_update(to_update, COUNTER_FIELDS, batch_size=500)
+    return len(to_create), len(to_update)
@@ -0,0 +1,90 @@
+"""
+Storage endereçado por conteúdo para os uploads de imagens.
+
+Cada upload é lido em blocos para calcular o SHA-256 e gravado uma única vez
+em `blobs/<aa>/<bb>/<sha256>.<ext>`: enviar de novo a mesma foto não grava
+outro arquivo e reaproveita o existente na hora. Os registros que apontam
+para cada arquivo são contados na tabela Blob (ver records/blobs.py), e o
+arquivo é apagado quando a última referência some.
+
+O EXIF das fotos é removido antes do hash (records/images.py), então o
+nome sempre corresponde ao conteúdo gravado e um arquivo nunca é regravado.
+Nomes que já estão em `blobs/` (miniaturas de records/images.py) são salvos
+exatamente com o nome pedido.
+"""
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import FileSystemStorage
+
+from .images import strip_metadata
+
+BLOB_ROOT = 'blobs'
+
+# Mesma imagem enviada como .jpeg ou .JPG vira um único arquivo
+_EXTENSION_ALIASES = {
+    '.jpeg': '.jpg',
+}
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    chunk_size = 64 * 1024
+
+    def is_blob(self, name):
+        return name.replace('\\', '/').startswith(BLOB_ROOT + '/')
+
+    def blob_name(self, digest, ext):
+        ext = ext.lower()
+        return '/'.join([BLOB_ROOT, digest[:2], digest[2:4], digest + _EXTENSION_ALIASES.get(ext, ext)])
+
+    def get_available_name(self, name, max_length=None):
+        if self.is_blob(name):
+            # O nome identifica o conteúdo: nunca gerar um nome alternativo
+            if self.exists(name):
+                raise FileExistsError(name)
+            return name
+        return super().get_available_name(name, max_length=max_length)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if self.is_blob(name):
+            return super().save(name, content, max_length=max_length)
+
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        ext = os.path.splitext(name)[1]
+        stripped = strip_metadata(content, ext)
+        if stripped is not None:
+            content = ContentFile(stripped, name=name)
+        digest = hashlib.sha256()
+        for chunk in content.chunks(self.chunk_size):
+            digest.update(chunk)
+        content.seek(0)
+
+        name = self.blob_name(digest.hexdigest(), ext)
+        if self.exists(name):
+            # Upload repetido: marca o uso recente para o coletor não apagar o
+            # arquivo antes de o registro que vai referenciá-lo ser confirmado
+            os.utime(self.path(name))
+            return name
+        try:
+            return self._save(name, content)
+        except FileExistsError:
+            # Outro processo gravou o mesmo conteúdo ao mesmo tempo
+            return name
+
+
+_blob_storage = ContentAddressedStorage()
+
+
+def blob_storage():
+    """Storage dos campos de imagem (callable: não fica fixo nas migrations)"""
+    return _blob_storage
+
+
+def import_storage():
+    """Arquivos de importação e relatórios de erros: privados, sem URL pública (settings.IMPORTS_ROOT)"""
+    return FileSystemStorage(location=settings.IMPORTS_ROOT, base_url=None)
@@ -0,0 +1,242 @@
+"""
+Fila de tarefas em segundo plano, armazenada no banco (modelo Job).
+
+Views e sinais apenas registram o trabalho pesado com `enqueue`, dentro da
+mesma transação dos registros principais: se a requisição falhar, a tarefa
+some junto. O comando `run_workers` executa as tarefas pendentes em um pool
+de processos, com novas tentativas e backoff exponencial.
+
+Com TASKS_EAGER = True (desenvolvimento sem worker rodando) as tarefas são
+executadas no próprio processo logo após o commit.
+"""
+import logging
+import random
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Backoff entre tentativas: 30s, 1min, 2min, 4min... (com jitter) até 1h
+BACKOFF_BASE = 30
+BACKOFF_MAX = 60 * 60
+# Tarefas "executando" há mais tempo que isso são de um worker que morreu
+STALE_TIMEOUT = timedelta(minutes=10)
+
+TASKS = {}
+
+
+def task(func=None, *, name=None, max_attempts=5):
+    """Registra uma função como tarefa (`@task` ou `@task(max_attempts=3)`)"""
+    def register(func):
+        func.task_name = name or func.__name__
+        func.max_attempts = max_attempts
+        TASKS[func.task_name] = func
+        return func
+    return register(func) if func else register
+
+
+def enqueue(name, unique=False, delay=None, **kwargs):
+    """
+    Agenda a tarefa `name` com os argumentos nomeados `kwargs` (serializáveis em JSON).
+    Com unique=True não cria outra se já houver uma pendente igual.
+    Retorna o Job criado (ou None se a tarefa rodou/vai rodar de forma síncrona).
+    """
+    func = TASKS.get(name)
+    if func is None:
+        raise ValueError('Tarefa desconhecida: {}'.format(name))
+
+    if getattr(settings, 'TASKS_EAGER', False):
+        transaction.on_commit(lambda: _run_eager(func, kwargs))
+        return None
+
+    run_at = timezone.now() + (delay or timedelta())
+    if unique:
+        existing = Job.objects.filter(name=name, kwargs=kwargs, status=Job.PENDING).first()
+        if existing:
+            # Com atraso, a tarefa pendente é adiada (debounce) para cobrir também este pedido
+            if existing.run_at < run_at:
+                Job.objects.filter(pk=existing.pk, status=Job.PENDING).update(run_at=run_at)
+            return existing
+
+    return Job.objects.create(
+        name=name,
+        kwargs=kwargs,
+        max_attempts=func.max_attempts,
+        run_at=run_at,
+    )
+
+
+def _run_eager(func, kwargs):
+    try:
+        func(**kwargs)
+    except Exception:
+        # Mesmo comportamento do worker: a falha não derruba a requisição já confirmada
+        logger.exception('Falha ao executar a tarefa %s', func.task_name)
+
+
+def backoff(attempts):
+    """Espera antes da próxima tentativa (exponencial, com jitter)"""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** max(attempts - 1, 0))
+    return timedelta(seconds=random.uniform(delay / 2, delay))
+
+
+def requeue_stale_jobs():
+    """Devolve para a fila as tarefas presas em 'executando' por worker que morreu"""
+    return Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=timezone.now() - STALE_TIMEOUT,
+    ).update(status=Job.PENDING, locked_at=None, locked_by='')
+
+
+def claim_jobs(limit):
+    """
+    Reserva até `limit` tarefas pendentes já liberadas e retorna seus ids.
+    No PostgreSQL, SKIP LOCKED deixa vários workers disputarem a fila sem
+    esperar um pelo outro; o UPDATE condicional com `locked_by` garante que
+    cada tarefa seja reservada uma única vez também nos outros bancos.
+    """
+    token = uuid.uuid4().hex
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.PENDING, run_at__lte=now)
+            .order_by('run_at', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        Job.objects.filter(id__in=ids, status=Job.PENDING).update(
+            status=Job.RUNNING,
+            locked_at=now,
+            locked_by=token,
+            attempts=F('attempts') + 1,
+        )
+    return list(Job.objects.filter(id__in=ids, locked_by=token).values_list('id', flat=True))
+
+
+def execute(job_id):
+    """Executa uma tarefa já reservada e registra o resultado. Retorna True se concluiu."""
+    job = Job.objects.get(pk=job_id)
+    func = TASKS.get(job.name)
+    try:
+        if func is None:
+            raise LookupError('Tarefa desconhecida: {}'.format(job.name))
+        func(**job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning('Tarefa %s #%s falhou (tentativa %s/%s)', job.name, job.pk, job.attempts, job.max_attempts)
+        if job.attempts >= job.max_attempts:
+            changes = {'status': Job.FAILED, 'finished_at': timezone.now()}
+        else:
+            changes = {'status': Job.PENDING, 'run_at': timezone.now() + backoff(job.attempts)}
+        Job.objects.filter(pk=job.pk).update(last_error=error, locked_at=None, locked_by='', **changes)
+        return False
+
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.DONE,
+        finished_at=timezone.now(),
+        last_error='',
+        locked_at=None,
+        locked_by='',
+    )
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Tarefas
+# ---------------------------------------------------------------------------
+
+@task
+def process_image(model, pk, field, file_name):
+    """
+    Pós-processamento de um upload: calcula o checksum e gera as
+    miniaturas/WebP (records/images.py). O EXIF já foi removido pelo storage.
+    """
+    from .images import derivative_names, file_checksum, generate_derivatives
+
+    model_class = apps.get_model(model)
+    instance = model_class.objects.filter(pk=pk).first()
+    field_file = getattr(instance, field, None)
+    # Registro apagado ou arquivo trocado depois do agendamento: nada a fazer
+    if not field_file or field_file.name != file_name:
+        return
+
+    checksum = file_checksum(field_file)
+    # Upload idêntico a um arquivo já existente (storage endereçado por conteúdo):
+    # as miniaturas já foram geradas
+    storage = field_file.storage
+    if not all(storage.exists(name) for name in derivative_names(field_file.name)):
+        generate_derivatives(field_file)
+
+    mark_processed(model_class, pk, field, checksum)
+
+
+def mark_processed(model_class, pk, field, checksum):
+    """
+    Grava o checksum, que também marca os derivados como prontos: a partir daí
+    os templates emitem srcset (records/templatetags/image_tags.py)
+    """
+    from . import cards, watermarks
+    from .gallery import invalidate_gallery
+    from .models import Relic
+
+    checksum_field = 'checksum' if field == 'image' else '{}_checksum'.format(field)
+    # update() não dispara os sinais de post_save (evita reprocessar o arquivo),
+    # então os caches das páginas são invalidados aqui
+    model_class.objects.filter(pk=pk).update(**{checksum_field: checksum})
+    if field == 'image':
+        relic_ids = list(Relic.objects.filter(main_image_id=pk).values_list('pk', flat=True))
+        if relic_ids:
+            Relic.objects.filter(pk__in=relic_ids).update(main_image_processed=True, updated_at=timezone.now())
+
+            def invalidate():
+                cards.bump('relic', *relic_ids)
+                invalidate_gallery()
+                watermarks.touch(Relic)
+            transaction.on_commit(invalidate)
+    else:
+        transaction.on_commit(lambda: (cards.bump('client', pk), watermarks.touch(model_class)))
+
+
+@task
+def refresh_relic_stats():
+    """Recalcula as estatísticas da lista de relíquias depois de uma alteração"""
+    from .stats import refresh_relic_stats as refresh
+    refresh()
+
+
+@task
+def collect_blobs():
+    """Apaga os arquivos do storage que ficaram sem referências (records/blobs.py)"""
+    from .blobs import collect_garbage
+    collect_garbage()
+
+
+@task
+def touch_client_activity(client_id, timestamp):
+    """Atualiza last_activity do cliente sem segurar a linha durante a requisição"""
+    from .models import Client
+
+    Client.objects.filter(pk=client_id, last_activity__lt=timestamp).update(last_activity=timestamp)
+
+
+@task(max_attempts=3)
+def import_records(run_id):
+    """Importação enviada pelo admin; uma nova tentativa continua do último lote confirmado"""
+    from .imports import run_import
+    from .models import ImportRun
+    from .storage import import_storage
+
+    run = ImportRun.objects.filter(pk=run_id).exclude(status=ImportRun.DONE).first()
+    if run is not None:
+        run_import(run, import_storage().path(run.file_name))
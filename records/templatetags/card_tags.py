@@ -0,0 +1,15 @@
+from django import template
+
+from records.cards import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def cards(objects, template_name, images=False):
+    """
+    Renderiza os cards dos objetos com o cache por objeto de records.cards
+    Uso: {% cards relics 'records/partials/relic_row.html' images=True as relic_cards %}
+         {% for relic, card in relic_cards %}...{{ card }}...{% endfor %}
+    """
+    return render_cards(objects, template_name, images=images)
@@ -0,0 +1,55 @@
+from django import template
+from django.utils.html import format_html
+
+from records.images import DERIVATIVE_WIDTHS, derivative_name
+
+register = template.Library()
+
+
+def _source_url(source):
+    # Aceita tanto um FieldFile (image.image, client.profile_photo) quanto uma URL pronta
+    if not source:
+        return ''
+    return getattr(source, 'url', source)
+
+
+@register.simple_tag
+def srcset(source, ext=None):
+    """
+    Monta o atributo srcset com as miniaturas geradas por records.images.
+    Não verifica se elas já existem: nos templates prefira responsive_image
+    Uso: {% srcset relic.main_image_url '.webp' %}
+    """
+    url = _source_url(source)
+    if not url:
+        return ''
+    return ', '.join(
+        '{} {}w'.format(derivative_name(url, width, ext), width)
+        for width in DERIVATIVE_WIDTHS
+    )
+
+
+@register.simple_tag
+def responsive_image(source, alt='', css_class='', sizes='100vw', style='', processed=False):
+    """
+    Emite <picture> com variante WebP e miniaturas no formato original.
+    Só com `processed` (derivados já gerados pelo process_image) há srcset;
+    antes disso, ou para imagens antigas, sai apenas o <img src> do original.
+    Uso: {% responsive_image relic.main_image_url alt=relic.name sizes='33vw' processed=relic.main_image_processed %}
+    """
+    url = _source_url(source)
+    if not url:
+        return ''
+    if not processed:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" style="{}" loading="lazy" decoding="async">',
+            url, alt, css_class, style,
+        )
+    return format_html(
+        '<picture style="display: contents;">'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" style="{}" loading="lazy" decoding="async">'
+        '</picture>',
+        srcset(url, '.webp'), sizes,
+        url, srcset(url), sizes, alt, css_class, style,
+    )
@@ -8,8 +8,12 @@ def url_replace(context, **kwargs):
     """
     Adiciona ou substitui parâmetros GET na URL atual
     Uso: {% url_replace page=2 %}
+    Passar None remove o parâmetro: {% url_replace cursor=page_obj.next_cursor page=None %}
     """
     query = context['request'].GET.copy()
     for key, value in kwargs.items():
-        query[key] = value
+        if value is None:
+            query.pop(key, None)
+        else:
+            query[key] = value
     return query.urlencode()
\ No newline at end of file
@@ -1,3 +1,852 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import adoptions
+from .adoptions import TransferConflict, transfer_relics
+from .blobs import GC_GRACE, collect_garbage
+from .imports import error_report_name, run_import
+from . import tasks
+from .models import Adoption, AdoptionRelic, Blob, ImportRun, Job, Relic, RelicImage
+from .pagination import CursorPaginator
+from .search import PostgreSQLSearchBackend, SQLiteSearchBackend, get_search_backend, search
+from .storage import blob_storage
+
+
+def _png(name='foto.png', color=(255, 0, 0)):
+    buffer = BytesIO()
+    Image.new('RGB', (4, 4), color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class MediaRootMixin:
+    """MEDIA_ROOT temporário: os uploads dos testes não ficam em media/"""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        # O storage por conteúdo acompanha MEDIA_ROOT (sinal setting_changed)
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+
+def _raw_cursor(data):
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip('=')
+
+
+class CursorPaginatorTests(TestCase):
+    """Paginação keyset (records/pagination.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', 'alice@example.com', 'senha-123')
+        cls.client_profile = cls.user.client_profile
+        # Datas repetidas (desempate pelo id) e algumas nulas (sempre no final)
+        for i in range(23):
+            Relic.objects.create(
+                name='R{}'.format(i),
+                obtained_date=None if i % 5 == 0 else date(2020, 1, 1) + timedelta(days=i // 3),
+                client=cls.client_profile,
+                created_by=cls.user,
+            )
+
+    def paginator(self, per_page=5, ordering=('-obtained_date',)):
+        return CursorPaginator(Relic.objects.all(), per_page, ordering=list(ordering))
+
+    def expected_ids(self):
+        dated = Relic.objects.filter(obtained_date__isnull=False).order_by('-obtained_date', '-id')
+        undated = Relic.objects.filter(obtained_date__isnull=True).order_by('-id')
+        return list(dated.values_list('id', flat=True)) + list(undated.values_list('id', flat=True))
+
+    def walk_forward(self, paginator):
+        pages, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            pages.append([relic.pk for relic in page])
+            if not page.has_next():
+                return pages
+            cursor = page.next_cursor
+
+    def test_forward_walk_visits_every_row_once_with_nulls_last(self):
+        pages = self.walk_forward(self.paginator())
+        self.assertEqual([pk for page in pages for pk in page], self.expected_ids())
+        self.assertEqual([len(page) for page in pages], [5, 5, 5, 5, 3])
+
+    def test_backward_walk_returns_the_same_pages(self):
+        paginator = self.paginator()
+        forward = self.walk_forward(paginator)
+
+        # Da última página para trás pelos cursores "anterior"
+        page = paginator.page(None)
+        while page.has_next():
+            page = paginator.page(page.next_cursor)
+        backward = [[relic.pk for relic in page]]
+        while page.has_previous():
+            page = paginator.page(page.previous_cursor)
+            backward.append([relic.pk for relic in page])
+
+        self.assertEqual(backward[::-1], forward)
+        self.assertFalse(page.has_previous())
+
+    def test_ascending_ordering(self):
+        pages = self.walk_forward(self.paginator(per_page=4, ordering=('obtained_date',)))
+        dated = list(
+            Relic.objects.filter(obtained_date__isnull=False).order_by('obtained_date', 'id').values_list('id', flat=True)
+        )
+        undated = list(Relic.objects.filter(obtained_date__isnull=True).order_by('id').values_list('id', flat=True))
+        self.assertEqual([pk for page in pages for pk in page], dated + undated)
+
+    def test_cursor_round_trip(self):
+        paginator = self.paginator()
+        relic = Relic.objects.filter(obtained_date__isnull=False).first()
+        values, reverse = paginator.decode_cursor(paginator.encode_cursor(relic, reverse=True))
+        self.assertEqual(values, [relic.obtained_date, relic.pk])
+        self.assertTrue(reverse)
+
+    def test_tampered_cursors_fall_back_to_first_page(self):
+        paginator = self.paginator()
+        first = [relic.pk for relic in paginator.page(None)]
+        tampered = [
+            'não-é-base64!!',
+            base64.urlsafe_b64encode(b'not json').decode(),
+            _raw_cursor({'v': ['2020-01-01']}),  # número errado de chaves
+            _raw_cursor({'v': ['data inválida', 1]}),
+            _raw_cursor({'x': []}),
+            _raw_cursor(['lista']),
+        ]
+        for cursor in tampered:
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(paginator.decode_cursor(cursor))
+                self.assertEqual([relic.pk for relic in paginator.page(cursor)], first)
+
+    def test_empty_queryset(self):
+        page = CursorPaginator(Relic.objects.none(), 5, ordering=['-obtained_date']).page(None)
+        self.assertEqual(len(page), 0)
+        self.assertFalse(page.has_other_pages())
+
+
+class CursorPaginationMixinTests(TestCase):
+    """Modo cursor das listas e links entre os dois modos"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', 'alice@example.com', 'senha-123')
+        for i in range(15):
+            Relic.objects.create(
+                name='R{}'.format(i),
+                obtained_date=date(2020, 1, 1) + timedelta(days=i),
+                client=cls.user.client_profile,
+                created_by=cls.user,
+            )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_numbered_list_links_to_cursor_mode(self):
+        response = self.client.get(reverse('records:RelicList'))
+        self.assertFalse(response.context['cursor_paginated'])
+        self.assertContains(response, 'href="?cursor="')
+
+    def test_cursor_mode_pages_and_links(self):
+        url = reverse('records:RelicList')
+        response = self.client.get(url, {'cursor': ''})
+        self.assertTrue(response.context['cursor_paginated'])
+        page = response.context['page_obj']
+        self.assertEqual(len(page), 12)
+        self.assertContains(response, 'cursor={}'.format(page.next_cursor))
+        self.assertContains(response, 'Ver páginas numeradas')
+
+        response = self.client.get(url, {'cursor': page.next_cursor})
+        self.assertEqual(len(response.context['page_obj']), 3)
+        self.assertFalse(response.context['page_obj'].has_next())
+
+
+class TransferRelicsTests(TestCase):
+    """Transferência de relíquias (records/adoptions.py) e comando transfer_relics"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('root', 'root@example.com', 'senha-123')
+        cls.alice = User.objects.create_user('alice', 'alice@example.com', 'senha-123').client_profile
+        cls.bob = User.objects.create_user('bob', 'bob@example.com', 'senha-123').client_profile
+        cls.carol = User.objects.create_user('carol', 'carol@example.com', 'senha-123').client_profile
+        cls.relics = [
+            Relic.objects.create(name='R{}'.format(i), client=owner, created_by=cls.user)
+            for i, owner in enumerate([cls.alice, cls.alice, cls.bob, cls.bob])
+        ]
+
+    def owners(self):
+        return dict(Relic.objects.filter(pk__in=self.relic_ids()).values_list('pk', 'client_id'))
+
+    def relic_ids(self):
+        return [relic.pk for relic in self.relics]
+
+    def assert_nothing_transferred(self, owners_before):
+        self.assertEqual(self.owners(), owners_before)
+        self.assertFalse(Adoption.objects.exists())
+        self.assertFalse(AdoptionRelic.objects.exists())
+
+    def test_transfer_moves_relics_and_records_history(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            created = transfer_relics(self.relic_ids(), self.carol, self.user, payment_status=True, batch_size=1)
+
+        self.assertEqual(set(self.owners().values()), {self.carol.pk})
+        self.assertEqual([adoption.relic_id for adoption in created], sorted(self.relic_ids()))
+        self.assertEqual(
+            {adoption.relic_id: adoption.previous_owner_id for adoption in Adoption.objects.all()},
+            {relic.pk: relic.client_id for relic in self.relics},
+        )
+        self.assertTrue(all(adoption.payment_status for adoption in created))
+        self.assertEqual(AdoptionRelic.objects.count(), len(self.relics))
+        self.assertTrue(callbacks)
+
+    def test_conditional_update_detects_concurrent_transfer(self):
+        owners_before = self.owners()
+        stolen = self.relics[2]
+        lock_owners = adoptions._lock_owners
+
+        def lock_then_transfer_elsewhere(*args, **kwargs):
+            # Outra operação troca o dono depois da leitura (sem FOR UPDATE no SQLite)
+            owners = lock_owners(*args, **kwargs)
+            Relic.objects.filter(pk=stolen.pk).update(client=self.alice)
+            return owners
+
+        with mock.patch.object(adoptions, '_lock_owners', side_effect=lock_then_transfer_elsewhere):
+            with self.captureOnCommitCallbacks() as callbacks:
+                with self.assertRaises(TransferConflict):
+                    transfer_relics(self.relic_ids(), self.carol, self.user)
+
+        # A transação inteira é desfeita, inclusive a alteração "concorrente" simulada
+        self.assert_nothing_transferred(owners_before)
+        self.assertEqual(callbacks, [])
+
+    def test_missing_relic_is_a_conflict(self):
+        owners_before = self.owners()
+        with self.assertRaisesMessage(TransferConflict, str(self.relics[-1].pk + 100)):
+            transfer_relics(self.relic_ids() + [self.relics[-1].pk + 100], self.carol, self.user)
+        self.assert_nothing_transferred(owners_before)
+
+    def test_partial_failure_rolls_back_earlier_batches(self):
+        owners_before = self.owners()
+        # Relíquias já atualizadas (lotes de 1) quando o histórico falha
+        with mock.patch.object(AdoptionRelic.objects, 'bulk_create', side_effect=RuntimeError('falha')):
+            with self.captureOnCommitCallbacks() as callbacks:
+                with self.assertRaises(RuntimeError):
+                    transfer_relics(self.relic_ids(), self.carol, self.user, payment_status=True, batch_size=1)
+
+        self.assert_nothing_transferred(owners_before)
+        self.assertEqual(callbacks, [])
+
+    def test_command_transfers_ids_and_from_client(self):
+        out = StringIO()
+        call_command('transfer_relics', str(self.relics[0].pk), '--to', str(self.carol.pk), stdout=out)
+        self.assertIn('1 relíquias transferidas', out.getvalue())
+
+        out = StringIO()
+        call_command(
+            'transfer_relics', '--to', str(self.carol.pk), '--from-client', str(self.bob.pk),
+            '--limit', '1', '--paid', '--user', 'root', stdout=out,
+        )
+        self.assertIn('1 relíquias transferidas', out.getvalue())
+
+        owners = self.owners()
+        self.assertEqual(owners[self.relics[0].pk], self.carol.pk)
+        self.assertEqual(owners[self.relics[1].pk], self.alice.pk)
+        self.assertEqual(owners[self.relics[2].pk], self.carol.pk)
+        self.assertEqual(owners[self.relics[3].pk], self.bob.pk)
+        self.assertTrue(Adoption.objects.get(relic=self.relics[2]).payment_status)
+
+    def test_command_errors(self):
+        owners_before = self.owners()
+        missing = self.relics[-1].pk + 100
+        cases = [
+            (['--to', str(self.carol.pk + 100), str(self.relics[0].pk)], 'não encontrado'),
+            (['--to', str(self.carol.pk)], 'Nenhuma relíquia'),
+            (['--to', str(self.carol.pk), '--user', 'ninguem', str(self.relics[0].pk)], 'ninguem'),
+            (['--to', str(self.carol.pk), str(self.relics[0].pk), str(missing)], 'Nada foi transferido'),
+        ]
+        for args, message in cases:
+            with self.subTest(args=args):
+                with self.assertRaisesMessage(CommandError, message):
+                    call_command('transfer_relics', *args, stdout=StringIO())
+        self.assert_nothing_transferred(owners_before)
+
+
+class ExportTests(TestCase):
+    """Exportação em streaming (records/exports.py) com os filtros da lista"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', 'alice@example.com', 'senha-123')
+        for i in range(3):
+            Relic.objects.create(
+                name='R{}'.format(i), obtained_date=date(2020, 1, 1 + i), adoption_fee=bool(i % 2),
+                client=cls.user.client_profile, created_by=cls.user,
+            )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def export(self, **params):
+        return self.client.get(reverse('records:Export', kwargs={'kind': 'relic', 'fmt': 'jsonl'}), params)
+
+    def test_filters_are_applied(self):
+        response = self.export(adoption_fee='true')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['name'] for row in rows], ['R1'])
+
+    def test_invalid_filters_are_rejected_instead_of_exporting_everything(self):
+        response = self.export(obtained_date_after='notadate')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('obtained_date_after', response.json()['errors'])
+
+        with self.assertRaisesMessage(CommandError, 'Filtros inválidos'):
+            call_command('export_records', 'relic', '--filter', 'obtained_date_after=notadate', stdout=StringIO())
+
+
+class ImportUploadTests(TestCase):
+    """Arquivos de importação e relatórios de erros ficam fora do MEDIA_ROOT"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('root', 'root@example.com', 'senha-123')
+        cls.staff = User.objects.create_user('staff', 'staff@example.com', 'senha-123', is_staff=True)
+
+    def setUp(self):
+        self.imports_root = tempfile.mkdtemp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.imports_root)
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(IMPORTS_ROOT=self.imports_root, MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def upload(self):
+        content = 'name,description,obtained_date,adoption_fee\nR1,a,2020-01-01,true\n,sem nome,2020-01-01,false\n'
+        self.client.force_login(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('admin:records_importrun_add'), {
+                'kind': 'relic', 'file': SimpleUploadedFile('relics.csv', content.encode()),
+            })
+        self.assertEqual(response.status_code, 302)
+        return ImportRun.objects.get()
+
+    def test_upload_and_report_are_private(self):
+        run = self.upload()
+        run.refresh_from_db()
+        self.assertEqual((run.status, run.created, run.errors), (ImportRun.DONE, 1, 1))
+
+        self.assertTrue(os.path.exists(os.path.join(self.imports_root, run.file_name)))
+        self.assertTrue(os.path.exists(os.path.join(self.imports_root, run.error_report)))
+        self.assertEqual(os.listdir(self.media_root), [])
+
+        report_url = reverse('admin:records_importrun_report', args=[run.pk])
+        response = self.client.get(reverse('admin:records_importrun_changelist'))
+        self.assertContains(response, report_url)
+        response = self.client.get(report_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('sem nome', b''.join(response.streaming_content).decode())
+
+    def test_report_requires_access_to_the_run(self):
+        run = self.upload()
+        report_url = reverse('admin:records_importrun_report', args=[run.pk])
+
+        self.client.logout()
+        self.assertEqual(self.client.get(report_url).status_code, 302)  # login do admin
+        # Staff sem ser o autor: a importação não está no queryset do admin
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(report_url).status_code, 404)
+
+
+class ImportResumeTests(TestCase):
+    """Retomada de uma importação do último lote confirmado (ImportRun.rows)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', 'alice@example.com', 'senha-123')
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'relics.csv')
+        lines = ['name,description,obtained_date,adoption_fee']
+        lines += ['R{},d,2020-01-01,true'.format(i) for i in range(25)]
+        lines[15] = ',sem nome,2020-01-01,true'  # registro 15 inválido (segundo lote)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        self.run_obj = ImportRun.objects.create(
+            kind='relic', file_name=self.path, file_size=os.path.getsize(self.path),
+            error_report=error_report_name(self.path), created_by=self.user,
+        )
+
+    def test_resume_after_crash_does_not_duplicate_or_skip(self):
+        def crash_after_first_batch(run):
+            raise RuntimeError('processo encerrado')
+
+        with self.assertRaises(RuntimeError):
+            run_import(self.run_obj, self.path, batch_size=10, progress=crash_after_first_batch)
+        self.run_obj.refresh_from_db()
+        self.assertEqual((self.run_obj.status, self.run_obj.rows, self.run_obj.created), (ImportRun.FAILED, 10, 10))
+        self.assertEqual(Relic.objects.count(), 10)
+
+        run = run_import(self.run_obj, self.path, batch_size=10)
+        self.assertEqual((run.status, run.rows, run.created, run.errors), (ImportRun.DONE, 25, 24, 1))
+        names = list(Relic.objects.values_list('name', flat=True))
+        self.assertEqual(sorted(names), sorted('R{}'.format(i) for i in range(25) if i != 14))
+
+        with open(run.error_report, encoding='utf-8') as f:
+            report = f.read().splitlines()
+        self.assertEqual(len(report), 2)
+        self.assertTrue(report[1].startswith('15,'))
+
+    def test_changed_file_is_not_resumed(self):
+        ImportRun.objects.filter(pk=self.run_obj.pk).update(rows=10)
+        self.run_obj.refresh_from_db()
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write('R99,d,2020-01-01,true\n')
+        with self.assertRaisesMessage(ValueError, 'O arquivo mudou'):
+            run_import(self.run_obj, self.path, batch_size=10)
+        self.assertFalse(Relic.objects.exists())
+
+
+class RelicRowLightboxTests(MediaRootMixin, TestCase):
+    """Linha da lista com todas as imagens no lightbox, sem query por card em cache"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', 'alice@example.com', 'senha-123')
+        cls.relic = Relic.objects.create(name='Anel', client=cls.user.client_profile, created_by=cls.user)
+
+    def setUp(self):
+        super().setUp()
+        self.images = [
+            RelicImage.objects.create(relic=self.relic, image=_png(color=(i * 60, 0, 0)), is_main=(i == 0))
+            for i in range(3)
+        ]
+        self.relic.refresh_main_image()
+        self.client.force_login(self.user)
+
+    def test_all_images_are_in_the_lightbox(self):
+        cache.clear()
+        response = self.client.get(reverse('records:RelicList'))
+        for image in self.images:
+            self.assertContains(response, 'href="{}"'.format(image.image.url))
+        self.assertContains(response, 'data-lightbox="relic-{}"'.format(self.relic.pk), count=3)
+
+    def test_cached_cards_do_not_query_images(self):
+        cache.clear()
+        self.client.get(reverse('records:RelicList'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('records:RelicList'))
+        self.assertContains(response, self.images[2].image.url)
+        self.assertFalse([query for query in queries.captured_queries if 'records_relicimage' in query['sql']])
+
+
+class BlobStorageTests(MediaRootMixin, TestCase):
+    """Arquivos compartilhados por conteúdo, contagem de referências e coleta (records/blobs.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', 'alice@example.com', 'senha-123')
+        cls.relic = Relic.objects.create(name='Anel', client=cls.user.client_profile, created_by=cls.user)
+
+    def upload(self, **kwargs):
+        return RelicImage.objects.create(relic=self.relic, image=_png(**kwargs))
+
+    def age(self, name):
+        """Blob sem uso há mais que GC_GRACE (registro e arquivo)"""
+        old = timezone.now() - 2 * GC_GRACE
+        Blob.objects.filter(name=name).update(updated_at=old)
+        os.utime(blob_storage().path(name), (old.timestamp(), old.timestamp()))
+
+    def test_identical_uploads_share_one_blob(self):
+        first, second = self.upload(name='a.png'), self.upload(name='b.PNG')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(blob_storage().is_blob(first.image.name))
+        self.assertEqual(Blob.objects.get(name=first.image.name).refcount, 2)
+        self.assertNotEqual(self.upload(color=(0, 0, 255)).image.name, first.image.name)
+
+    def test_file_is_deleted_only_after_last_reference_and_grace(self):
+        storage = blob_storage()
+        first, second = self.upload(), self.upload()
+        name = first.image.name
+        derivative = storage.save(name.replace('.png', '_w320.png'), ContentFile(b'miniatura'))
+
+        first.delete()
+        self.assertEqual(Blob.objects.get(name=name).refcount, 1)
+        second.delete()
+        self.assertEqual(Blob.objects.get(name=name).refcount, 0)
+
+        # Dentro do GC_GRACE nada é apagado
+        self.assertEqual(collect_garbage(), (0, 0))
+        self.assertTrue(storage.exists(name))
+
+        self.age(name)
+        deleted, freed = collect_garbage()
+        self.assertEqual((deleted, freed), (1, len(_png().read())))
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(storage.exists(derivative))
+        self.assertFalse(Blob.objects.filter(name=name).exists())
+
+    def test_reupload_during_grace_keeps_the_file(self):
+        image = self.upload()
+        name = image.image.name
+        image.delete()
+        self.age(name)
+
+        self.upload()
+        self.assertEqual(collect_garbage(), (0, 0))
+        self.assertTrue(blob_storage().exists(name))
+        self.assertEqual(Blob.objects.get(name=name).refcount, 1)
+
+    def legacy_images(self):
+        """Duas imagens antigas (fora de blobs/) com o mesmo conteúdo"""
+        images = []
+        for name in ('relics/images/a.png', 'relics/images/b.png'):
+            saved = FileSystemStorage.save(blob_storage(), name, ContentFile(_png().read()))
+            image = RelicImage.objects.create(relic=self.relic, image=_png())
+            RelicImage.objects.filter(pk=image.pk).update(image=saved)
+            images.append(saved)
+        return images
+
+    def test_dedupe_media_dry_run_changes_nothing(self):
+        legacy = self.legacy_images()
+        names = list(RelicImage.objects.order_by('pk').values_list('image', flat=True))
+        blobs = list(Blob.objects.values_list('name', 'refcount'))
+
+        out = StringIO()
+        call_command('dedupe_media', dry_run=True, stdout=out)
+        self.assertIn('2 arquivos', out.getvalue())
+        self.assertIn('1 duplicatas', out.getvalue())
+        self.assertEqual(list(RelicImage.objects.order_by('pk').values_list('image', flat=True)), names)
+        self.assertEqual(list(Blob.objects.values_list('name', 'refcount')), blobs)
+        self.assertTrue(all(blob_storage().exists(name) for name in legacy))
+
+    def test_dedupe_media_moves_duplicates_to_one_blob(self):
+        legacy = self.legacy_images()
+        call_command('dedupe_media', stdout=StringIO())
+        names = set(RelicImage.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertEqual(Blob.objects.get(name=name).refcount, 2)
+        self.assertFalse(any(blob_storage().exists(old) for old in legacy))
+        self.relic.refresh_from_db()
+        self.assertEqual(self.relic.main_image_url, blob_storage().url(name))
+
+
+@override_settings(TASKS_EAGER=False)
+class JobQueueTests(TestCase):
+    """Fila de tarefas no banco (records/tasks.py): reserva, novas tentativas e dedupe"""
+
+    def setUp(self):
+        self.calls = []
+
+        def record(**kwargs):
+            self.calls.append(kwargs)
+
+        def fail(**kwargs):
+            raise RuntimeError('falhou')
+
+        for name, func, max_attempts in [('test_record', record, 5), ('test_fail', fail, 2)]:
+            tasks.task(name=name, max_attempts=max_attempts)(func)
+            self.addCleanup(tasks.TASKS.pop, name)
+
+    def claim_at(self, when, limit=10):
+        with mock.patch('records.tasks.timezone.now', return_value=when):
+            return tasks.claim_jobs(limit)
+
+    def test_jobs_are_claimable_from_run_at_and_only_once(self):
+        job = tasks.enqueue('test_record', delay=timedelta(minutes=5), value=1)
+        self.assertEqual(tasks.claim_jobs(10), [])
+        self.assertEqual(self.claim_at(job.run_at), [job.pk])
+        self.assertEqual(self.claim_at(job.run_at), [])
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.RUNNING, 1))
+        self.assertTrue(tasks.execute(job.pk))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(self.calls, [{'value': 1}])
+
+    def test_claim_respects_limit_and_order(self):
+        later = tasks.enqueue('test_record', delay=timedelta(seconds=10), value='b')
+        first = tasks.enqueue('test_record', value='a')
+        self.assertEqual(self.claim_at(later.run_at, limit=1), [first.pk])
+        self.assertEqual(self.claim_at(later.run_at, limit=1), [later.pk])
+
+    def test_failures_back_off_and_stop_after_max_attempts(self):
+        job = tasks.enqueue('test_fail')
+        now = timezone.now()
+        self.assertEqual(self.claim_at(now), [job.pk])
+        with self.assertLogs('records.tasks', 'WARNING'):
+            self.assertFalse(tasks.execute(job.pk))
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.PENDING, 1))
+        self.assertIn('RuntimeError', job.last_error)
+        delay = (job.run_at - now).total_seconds()
+        self.assertTrue(tasks.BACKOFF_BASE / 2 <= delay <= tasks.BACKOFF_BASE + 1, delay)
+        self.assertEqual(self.claim_at(now), [])
+
+        self.assertEqual(self.claim_at(job.run_at), [job.pk])
+        with self.assertLogs('records.tasks', 'WARNING'):
+            self.assertFalse(tasks.execute(job.pk))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(self.claim_at(job.run_at + timedelta(days=1)), [])
+
+    def test_backoff_grows_exponentially_up_to_the_limit(self):
+        for attempts, expected in [(1, 30), (2, 60), (4, 240), (20, tasks.BACKOFF_MAX)]:
+            with self.subTest(attempts=attempts):
+                delay = tasks.backoff(attempts).total_seconds()
+                self.assertTrue(expected / 2 <= delay <= expected, delay)
+
+    def test_unique_deduplicates_and_debounces(self):
+        first = tasks.enqueue('test_record', unique=True, value=1)
+        self.assertEqual(tasks.enqueue('test_record', unique=True, value=1).pk, first.pk)
+        self.assertNotEqual(tasks.enqueue('test_record', unique=True, value=2).pk, first.pk)
+        self.assertEqual(Job.objects.filter(kwargs={'value': 1}).count(), 1)
+
+        # Pedido com atraso adia a tarefa pendente (debounce)
+        delayed = tasks.enqueue('test_record', unique=True, delay=timedelta(minutes=10), value=1)
+        self.assertEqual(delayed.pk, first.pk)
+        first.refresh_from_db()
+        self.assertGreater(first.run_at, timezone.now() + timedelta(minutes=9))
+
+        # Tarefa já reservada não conta: um novo pedido cria outra
+        self.claim_at(first.run_at)
+        self.assertNotEqual(tasks.enqueue('test_record', unique=True, value=1).pk, first.pk)
+        # Sem unique, sempre cria
+        tasks.enqueue('test_record', value=3)
+        tasks.enqueue('test_record', value=3)
+        self.assertEqual(Job.objects.filter(kwargs={'value': 3}).count(), 2)
+
+    def test_stale_running_jobs_are_requeued(self):
+        stale = tasks.enqueue('test_record', value='stale')
+        fresh = tasks.enqueue('test_record', value='fresh')
+        self.assertEqual(len(self.claim_at(timezone.now())), 2)
+        Job.objects.filter(pk=stale.pk).update(locked_at=timezone.now() - tasks.STALE_TIMEOUT - timedelta(seconds=1))
+
+        self.assertEqual(tasks.requeue_stale_jobs(), 1)
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual((stale.status, stale.locked_by), (Job.PENDING, ''))
+        self.assertEqual(fresh.status, Job.RUNNING)
+        self.assertEqual(self.claim_at(timezone.now()), [stale.pk])
+
+    def test_unknown_task(self):
+        with self.assertRaises(ValueError):
+            tasks.enqueue('nao_existe')
+
+
+class ApiTests(TestCase):
+    """API JSON somente leitura (records/api.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user('alice', 'alice@example.com', 'senha-123')
+        cls.bob = User.objects.create_user('bob', 'bob@example.com', 'senha-123')
+        cls.relics = [
+            Relic.objects.create(
+                name='R{}'.format(i), obtained_date=date(2020, 1, 1 + i),
+                client=cls.alice.client_profile, created_by=cls.alice,
+            )
+            for i in range(5)
+        ]
+        cls.own = Adoption.objects.create(
+            relic=cls.relics[0], previous_owner=cls.alice.client_profile,
+            new_owner=cls.bob.client_profile, created_by=cls.alice,
+        )
+        cls.other = Adoption.objects.create(
+            relic=cls.relics[1], previous_owner=cls.alice.client_profile,
+            new_owner=cls.bob.client_profile, created_by=cls.bob,
+        )
+
+    def setUp(self):
+        self.client.force_login(self.alice)
+
+    def get(self, resource, pk=None, **params):
+        if pk is None:
+            url = reverse('api-v1-list', kwargs={'resource': resource})
+        else:
+            url = reverse('api-v1-detail', kwargs={'resource': resource, 'pk': pk})
+        return self.client.get(url, params)
+
+    def test_fields_selection(self):
+        data = self.get('relics', fields='name,id', limit=2).json()
+        self.assertEqual([list(row) for row in data['results']], [['name', 'id'], ['name', 'id']])
+        self.assertEqual([row['name'] for row in data['results']], ['R4', 'R3'])
+
+        detail = self.get('relics', self.relics[0].pk, fields='description').json()
+        self.assertEqual(detail, {'description': ''})
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.get('relics', fields='id,senha')
+        self.assertEqual(response.status_code, 400)
+        data = response.json()
+        self.assertIn('senha', data['detail'])
+        self.assertEqual(list(data['errors']), ['fields'])
+        self.assertTrue(all(isinstance(message, str) for message in data['errors']['fields']))
+
+    def test_errors_have_one_shape(self):
+        for params in [{'obtained_date_after': 'notadate'}, {'client': 'x'}, {'fields': 'nope'}]:
+            with self.subTest(params=params):
+                response = self.get('relics', **params)
+                self.assertEqual(response.status_code, 400)
+                for name, messages in response.json()['errors'].items():
+                    self.assertIsInstance(messages, list)
+                    self.assertTrue(all(isinstance(message, str) for message in messages), messages)
+
+    def test_cursor_paging_and_invalid_cursor(self):
+        seen = []
+        url = reverse('api-v1-list', kwargs={'resource': 'relics'}) + '?limit=2&fields=id'
+        while url:
+            data = self.client.get(url).json()
+            seen += [row['id'] for row in data['results']]
+            url = data['next']
+        self.assertEqual(seen, [relic.pk for relic in reversed(self.relics)])
+
+        response = self.get('relics', cursor='garbage')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['detail'], 'cursor inválido.')
+        self.assertEqual(self.get('relics', cursor='').status_code, 200)
+
+    def test_adoptions_are_scoped_to_the_owner(self):
+        ids = [row['id'] for row in self.get('adoptions').json()['results']]
+        self.assertEqual(ids, [self.own.pk])
+        self.assertEqual(self.get('adoptions', self.other.pk).status_code, 404)
+
+        superuser = User.objects.create_superuser('root', 'root@example.com', 'senha-123')
+        self.client.force_login(superuser)
+        ids = {row['id'] for row in self.get('adoptions').json()['results']}
+        self.assertEqual(ids, {self.own.pk, self.other.pk})
+
+    def test_etag_and_not_modified(self):
+        response = self.get('relics')
+        etag = response['ETag']
+        self.assertTrue(etag)
+        url = reverse('api-v1-list', kwargs={'resource': 'relics'})
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Relic.objects.filter(pk=self.relics[0].pk).first().save()
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_authentication_and_unknown_resource(self):
+        self.assertEqual(self.get('nada').status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.get('relics').status_code, 401)
+
+
+class SearchTestData:
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', 'alice@example.com', 'senha-123')
+        owner = cls.user.client_profile
+
+        def relic(name, description, day):
+            return Relic.objects.create(
+                name=name, description=description, obtained_date=date(2020, 1, day), client=owner, created_by=cls.user,
+            )
+        # A mais relevante para "anel" é a mais antiga: relevância != ordem por data
+        cls.best = relic('Anel de ouro', 'anel anel anel', 1)
+        cls.weak = relic('Caixa', 'uma caixa grande de madeira escura com um anel esquecido dentro dela', 2)
+        cls.other = relic('Colar', 'colar de prata', 3)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'FTS5 só no SQLite')
+class SQLiteSearchBackendTests(SearchTestData, TestCase):
+    """Busca FTS5 (records/search.py), mantida pelos sinais e por index_many"""
+
+    def ids(self, query):
+        return [relic.pk for relic in search(Relic.objects.all(), query)]
+
+    def test_backend_and_relevance_order(self):
+        self.assertIsInstance(get_search_backend(), SQLiteSearchBackend)
+        self.assertEqual(self.ids('anel'), [self.best.pk, self.weak.pk])
+        # Prefixo e todas as palavras
+        self.assertEqual(self.ids('ane our'), [self.best.pk])
+        self.assertEqual(self.ids(''), [self.best.pk, self.weak.pk, self.other.pk])
+
+    def test_query_syntax_is_neutralized(self):
+        # Operadores do FTS5 viram palavras comuns: nada de erro de sintaxe
+        for query in ['"anel', 'anel*', 'anel)', '(anel', '^anel']:
+            with self.subTest(query=query):
+                self.assertEqual(self.ids(query), [self.best.pk, self.weak.pk])
+        for query in ['NEAR(anel', 'anel NOT', 'name:anel', 'AND OR']:
+            with self.subTest(query=query):
+                self.assertNotIn(self.other.pk, self.ids(query))
+
+    def test_index_follows_changes(self):
+        self.other.description = 'colar com um anel'
+        self.other.save()
+        self.assertIn(self.other.pk, self.ids('anel'))
+        self.weak.delete()
+        self.assertNotIn(self.weak.pk, self.ids('anel'))
+
+    def test_index_many_and_rebuild(self):
+        created = Relic.objects.bulk_create([
+            Relic(name='Broche', description='broche antigo', client=self.user.client_profile, created_by=self.user)
+        ])
+        self.assertEqual(self.ids('broche'), [])
+        get_search_backend().index_many(Relic, [relic.pk for relic in created])
+        self.assertEqual(self.ids('broche'), [created[0].pk])
+
+        self.assertEqual(get_search_backend().rebuild(Relic), Relic.objects.count())
+        self.assertEqual(self.ids('broche'), [created[0].pk])
+        self.assertEqual(self.ids('anel'), [self.best.pk, self.weak.pk])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'tsvector só no PostgreSQL')
+class PostgreSQLSearchBackendTests(SearchTestData, TestCase):
+    """Busca tsvector/GIN (records/search.py): o índice é mantido pelo próprio banco"""
+
+    def test_backend_and_relevance_order(self):
+        self.assertIsInstance(get_search_backend(), PostgreSQLSearchBackend)
+        ids = [relic.pk for relic in search(Relic.objects.all(), 'anel')]
+        self.assertEqual(ids, [self.best.pk, self.weak.pk])
+        # Sem acento (unaccent) e websearch_to_tsquery
+        self.assertEqual([relic.pk for relic in search(Relic.objects.all(), 'anel -caixa')], [self.best.pk])
+
+
+class SearchListTests(SearchTestData, TestCase):
+    """Com busca a lista fica nas páginas numeradas, ordenada por relevância"""
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_search_ignores_cursor_mode_and_keeps_relevance(self):
+        url = reverse('records:RelicList')
+        for params in [{'search': 'anel'}, {'search': 'anel', 'cursor': ''}]:
+            with self.subTest(params=params):
+                response = self.client.get(url, params)
+                self.assertFalse(response.context['cursor_paginated'])
+                self.assertEqual([relic.pk for relic in response.context['page_obj']], [self.best.pk, self.weak.pk])
+                self.assertNotContains(response, 'Navegação rápida')
+
+        response = self.client.get(url, {'search': '', 'cursor': ''})
+        self.assertTrue(response.context['cursor_paginated'])
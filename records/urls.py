@@ -1,11 +1,17 @@
+from django.conf import settings
 from django.urls import path
 
 from .views import StateCreate, CityCreate, AddressCreate, ClientCreate, RelicCreate, AdoptionCreate, AdoptionRelicCreate
 from .views import StateUpdate, CityUpdate, AddressUpdate, ClientUpdate, RelicUpdate, AdoptionUpdate, AdoptionRelicUpdate
 from .views import StateDelete, CityDelete, AddressDelete, ClientDelete, RelicDelete, AdoptionDelete, AdoptionRelicDelete
 from .views import StateList, CityList, AddressList, ClientList, RelicList, AdoptionList, AdoptionRelicList, ProfileView
+from .views import AsyncProfileView, AsyncRelicList, ExportView
 from .utils import create_client_profile
 
+# Views assíncronas no perfil ASGI (settings.ASYNC_VIEWS)
+if settings.ASYNC_VIEWS:
+    ProfileView, RelicList = AsyncProfileView, AsyncRelicList
+
 app_name = 'records'
 
 urlpatterns = [
@@ -51,4 +57,7 @@ urlpatterns = [
     path('update/adoptionrelic/<int:pk>', AdoptionRelicUpdate.as_view(), name='AdoptionRelicUpdate'),
     path('delete/adoptionrelic/<int:pk>', AdoptionRelicDelete.as_view(), name='AdoptionRelicDelete'),
     path('list/adoptionrelic', AdoptionRelicList.as_view(), name='AdoptionRelicList'),
+
+    # Exportação em CSV/JSONL (relic, client, adoption, adoptionrelic) com os filtros da lista
+    path('export/<str:kind>.<str:fmt>', ExportView.as_view(), name='Export'),
 ]
@@ -1,9 +1,14 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.crypto import constant_time_compare
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
 from django.views.generic.list import ListView
+from django.views import View
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.core.exceptions import PermissionDenied
+from django.core.exceptions import PermissionDenied, ValidationError
 from django.contrib.auth.views import LoginView
 from django.contrib.auth import login
+from django.contrib.auth.models import User
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.db import transaction
@@ -12,11 +17,22 @@ from django.core.paginator import Paginator
 from django.db.models import Q, Count
 from django.utils import timezone
 from datetime import datetime
+from functools import partial
 
 from django.urls import reverse_lazy
 from .models import State, City, Address, Client, Relic, Adoption, AdoptionRelic, RelicImage
 from .forms import CustomUserCreationForm, ClientEditForm, RelicCreateForm, RelicImageFormSet
 from .filters import ClientFilter, RelicFilter
+from .adoptions import TransferConflict, transfer_relics
+from .exports import EXPORTS, EXPORT_FORMATS, export_queryset, stream_export
+from .api import API_RESOURCES, ApiError, api_queryset, get_object, get_resource, list_page, parse_fields, parse_limit
+from .pagination import KnownCountPaginator, CursorPaginationMixin
+from .watermarks import ConditionalGetMixin
+from .routers import ReplicaReadMixin
+from .concurrency import AsyncViewMixin, ConcurrentQueriesMixin
+from .stats import get_relic_stats, get_user_stats
+from .tasks import enqueue
+from . import metrics
 
 class CustomLoginView(LoginView):
     template_name = 'registration/login.html'
@@ -42,7 +58,7 @@ class StateDelete(LoginRequiredMixin, DeleteView):
     template_name = 'records/delete_confirm.html'
     success_url = reverse_lazy('pages-HomePage')
 
-class StateList(ListView):
+class StateList(ReplicaReadMixin, ConditionalGetMixin, CursorPaginationMixin, ListView):
     model = State
     template_name = 'records/lists/state.html'
     paginate_by = 15  # Paginação de 15 estados por página
@@ -69,8 +85,9 @@ class CityDelete(LoginRequiredMixin, DeleteView):
     template_name = 'records/delete_confirm.html'
     success_url = reverse_lazy('pages-HomePage')
 
-class CityList(ListView):
+class CityList(ReplicaReadMixin, ConditionalGetMixin, CursorPaginationMixin, ListView):
     model = City
+    watermark_models = [City, State]
     template_name = 'records/lists/city.html'
     paginate_by = 20  # Paginação de 20 cidades por página
     
@@ -95,8 +112,9 @@ class AddressDelete(LoginRequiredMixin, DeleteView):
     template_name = 'records/delete_confirm.html'
     success_url = reverse_lazy('pages-HomePage')
 
-class AddressList(ListView):
+class AddressList(ReplicaReadMixin, ConditionalGetMixin, CursorPaginationMixin, ListView):
     model = Address
+    watermark_models = [Address, City, State]
     template_name = 'records/lists/address.html'
     paginate_by = 15  # Paginação de 15 endereços por página
 
@@ -216,12 +234,15 @@ class ClientDelete(LoginRequiredMixin, DeleteView):
             return Client.objects.all()
         return Client.objects.filter(created_by=self.request.user)
 
-class ClientList(FilterView):
+class ClientList(ReplicaReadMixin, ConditionalGetMixin, CursorPaginationMixin, FilterView):
     model = Client
+    watermark_models = [Client, User, Address, City, State]
     template_name = 'records/lists/client.html'
     filterset_class = ClientFilter
     paginate_by = 10
     context_object_name = 'clients'
+    # Busca ordenada por relevância: só com páginas numeradas
+    cursor_exclusive_params = ('search',)
     
     def get_queryset(self):
         # Exibe todos os clientes do sistema com select_related para otimização
@@ -317,28 +338,26 @@ class RelicCreate(LoginRequiredMixin, CreateView):
             image_formset.instance = relic
             images = image_formset.save(commit=False)
             
-            for i, image in enumerate(images):
+            # Garantir que exatamente uma imagem seja principal (a primeira marcada ou a primeira enviada)
+            main_image = next((img for img in images if img.is_main), images[0] if images else None)
+            for image in images:
+                image.is_main = image is main_image
+            
+            # Salvar a principal primeiro: ela define Relic.main_image sem UPDATEs extras
+            for image in sorted(images, key=lambda img: not img.is_main):
                 image.relic = relic
                 image.created_by = self.request.user
                 image.save()
             
-            # Se nenhuma imagem foi marcada como principal, marcar a primeira
-            if images and not any(img.is_main for img in images):
-                images[0].is_main = True
-                images[0].save()
-            
-            # MOVIMENTO: Atualizar estatísticas do cliente proprietário
-            if relic.client:
-                self.update_client_relic_count(relic.client)
-            
             # MOVIMENTO: Criar registro automático de histórico se taxa de adoção > 0
             if relic.adoption_fee:
                 self.create_adoption_availability_record(relic)
             
-            # MOVIMENTO: Atualizar last_activity do cliente proprietário
+            # MOVIMENTO: Efeitos colaterais em segundo plano (last_activity do
+            # proprietário e estatísticas da lista); as imagens são agendadas pelos sinais
             if relic.client:
-                relic.client.last_activity = timezone.now()
-                relic.client.save()
+                enqueue('touch_client_activity', client_id=relic.client.pk, timestamp=timezone.now().isoformat())
+            enqueue('refresh_relic_stats', unique=True)
             
             # Mensagem de sucesso personalizada
             image_count = len(images)
@@ -349,22 +368,8 @@ class RelicCreate(LoginRequiredMixin, CreateView):
                 f'Proprietário: {relic.client.name if relic.client else "N/A"}'
             )
             
-            # Garantir que apenas uma imagem seja principal
-            main_images = [img for img in images if img.is_main]
-            if len(main_images) > 1:
-                for i, img in enumerate(main_images):
-                    if i > 0:
-                        img.is_main = False
-                        img.save()
-            
             return response
     
-    def update_client_relic_count(self, client):
-        """Método auxiliar para atualizar estatísticas de relíquias do cliente"""
-        relic_count = Relic.objects.filter(client=client).count()
-        # Aqui poderíamos salvar em um campo específico se existisse
-        return relic_count
-    
     def create_adoption_availability_record(self, relic):
         """Método auxiliar para criar registro de disponibilidade para adoção"""
         # Criar uma adoção 'pendente' se a relíquia tem taxa de adoção
@@ -438,13 +443,14 @@ class RelicUpdate(LoginRequiredMixin, UpdateView):
                     form.add_error(None, "É obrigatório manter pelo menos uma imagem da relíquia.")
                     return self.form_invalid(form)
                 
-                # Se nenhuma imagem estiver marcada como principal, marcar a primeira
-                if not self.object.images.filter(is_main=True).exists():
-                    first_image = self.object.images.first()
-                    if first_image:
-                        first_image.is_main = True
-                        first_image.save()
+                # Se nenhuma imagem estiver marcada como principal, marcar a que o
+                # ponteiro Relic.main_image escolheu (mantido por RelicImage.save/delete)
+                main_image = self.object.main_image
+                if main_image and not main_image.is_main:
+                    main_image.is_main = True
+                    main_image.save()
                 
+                enqueue('refresh_relic_stats', unique=True)
                 messages.success(self.request, 'Relíquia atualizada com sucesso!')
                 return response
             else:
@@ -461,36 +467,62 @@ class RelicDelete(LoginRequiredMixin, DeleteView):
             return Relic.objects.all()
         return Relic.objects.filter(created_by=self.request.user)
 
-class RelicList(FilterView):
+class RelicList(ReplicaReadMixin, ConditionalGetMixin, CursorPaginationMixin, ConcurrentQueriesMixin, FilterView):
     model = Relic
+    watermark_models = [Relic, RelicImage, Client, User, Address, City, State]
     template_name = 'records/lists/relic.html'
     filterset_class = RelicFilter
     paginate_by = 12
+    paginator_class = KnownCountPaginator
     context_object_name = 'object_list'  # Usar object_list para compatibilidade
+    # Busca ordenada por relevância: só com páginas numeradas
+    cursor_exclusive_params = ('search',)
     
     def get_queryset(self):
-        # Otimizar queries com select_related e prefetch_related
-        qs = Relic.objects.select_related('client', 'created_by', 'client__address__city__state').prefetch_related('images')
+        # Otimizar queries com select_related (a imagem vem dos campos denormalizados main_image_*)
+        qs = Relic.objects.select_related('client', 'created_by', 'client__address__city__state')
         
         # Todos podem ver todas as relíquias para demonstração
         return qs.order_by('-obtained_date')
     
+    def prepare_queries(self):
+        # Mesmo filterset/object_list que o FilterView.get() monta
+        self.filterset = self.get_filterset(self.get_filterset_class())
+        if not self.filterset.is_bound or self.filterset.is_valid() or not self.get_strict():
+            self.object_list = self.filterset.qs
+        else:
+            self.object_list = self.filterset.queryset.none()
+    
+    def get_concurrent_queries(self):
+        # Estatísticas e itens da página são independentes: juntos no AsyncRelicList
+        return {
+            'stats': partial(get_relic_stats, self.object_list, self.filterset),
+            'page': self.get_page_rows,
+        }
+    
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        # Reaproveitar o total das estatísticas em vez de outro COUNT(*)
+        kwargs['count'] = self.stats['total']
+        return super().get_paginator(queryset, per_page, orphans, allow_empty_first_page, **kwargs)
+    
     def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
+        # Calcular estatísticas TOTAIS do queryset filtrado (antes da paginação) em uma só query
+        self.stats = self.fetch('stats')
         
-        # Calcular estatísticas TOTAIS do queryset completo (antes da paginação)
-        filterset = self.get_filterset(self.filterset_class)
-        total_queryset = filterset.qs
-        context['total_relics'] = total_queryset.count()
-        context['without_fee_count'] = total_queryset.filter(adoption_fee=0).count()
-        context['with_fee_count'] = total_queryset.exclude(adoption_fee=0).count()
-        context['unique_owners'] = total_queryset.values('client').distinct().count()
+        context = super().get_context_data(**kwargs)
+        context['total_relics'] = self.stats['total']
+        context['without_fee_count'] = self.stats['without_fee']
+        context['with_fee_count'] = self.stats['with_fee']
+        context['unique_owners'] = self.stats['unique_owners']
         
         # Adicionar alias para compatibilidade com template
         context['relics'] = context['object_list']
         
         return context
 
+class AsyncRelicList(AsyncViewMixin, RelicList):
+    """RelicList para ASGI: estatísticas e itens da página buscados em paralelo"""
+
 class AdoptionCreate(LoginRequiredMixin, CreateView):
     model = Adoption
     fields = ['relic', 'payment_status']
@@ -525,47 +557,34 @@ class AdoptionCreate(LoginRequiredMixin, CreateView):
                 if user_client:
                     form.instance.new_owner = user_client
             
-            # 3. Salvar a adoção primeiro
-            response = super().form_valid(form)
-            adoption = form.instance
-            
-            # 4. MOVIMENTO PRINCIPAL: Transferir propriedade da relíquia
-            if adoption.relic:
-                old_owner = adoption.relic.client
-                adoption.relic.client = adoption.new_owner
-                adoption.relic.save()
-                
-                # 5. Atualizar last_activity dos clientes envolvidos
-                adoption.new_owner.last_activity = timezone.now()
-                adoption.new_owner.save()
-                
-                if old_owner != adoption.new_owner:
-                    old_owner.last_activity = timezone.now()
-                    old_owner.save()
-                
-                # 6. Criar registro de AdoptionRelic (histórico detalhado)
-                AdoptionRelic.objects.create(
-                    adoption=adoption,
-                    relic=adoption.relic,
-                    created_by=self.request.user
-                )
-                
-                # 7. Adicionar mensagem de sucesso com detalhes
-                messages.success(
-                    self.request,
-                    f'Adoção realizada com sucesso! '
-                    f'A relíquia "{adoption.relic.name}" foi transferida '
-                    f'de {old_owner.name} para {adoption.new_owner.name}.'
+            relic = form.cleaned_data.get('relic')
+            if not relic:
+                return super().form_valid(form)
+
+            # 3. MOVIMENTO PRINCIPAL: transferir a relíquia (records/adoptions.py):
+            # troca do dono condicionada ao dono atual, adoção, histórico
+            # (AdoptionRelic), last_activity dos clientes e, com pagamento
+            # confirmado, as adoções anteriores da relíquia
+            try:
+                adoption, = transfer_relics(
+                    [relic.pk],
+                    form.instance.new_owner,
+                    self.request.user,
+                    payment_status=form.cleaned_data['payment_status'],
                 )
-                
-                # 8. Se pagamento confirmado, atualizar status de todas as adoções da relíquia
-                if adoption.payment_status:
-                    Adoption.objects.filter(
-                        relic=adoption.relic,
-                        payment_status=False
-                    ).update(payment_status=True)
-            
-            return response
+            except TransferConflict as e:
+                form.add_error('relic', str(e))
+                return self.form_invalid(form)
+            self.object = adoption
+
+            # 4. Adicionar mensagem de sucesso com detalhes
+            messages.success(
+                self.request,
+                f'Adoção realizada com sucesso! '
+                f'A relíquia "{relic.name}" foi transferida '
+                f'de {adoption.previous_owner.name} para {adoption.new_owner.name}.'
+            )
+            return redirect(self.get_success_url())
     
     def get_form(self, form_class=None):
         form = super().get_form(form_class)
@@ -626,8 +645,9 @@ class AdoptionDelete(LoginRequiredMixin, DeleteView):
             return Adoption.objects.all()
         return Adoption.objects.filter(created_by=self.request.user)
 
-class AdoptionList(ListView):
+class AdoptionList(ReplicaReadMixin, ConditionalGetMixin, CursorPaginationMixin, ListView):
     model = Adoption
+    watermark_models = [Adoption, Relic, Client, User]
     template_name = 'records/lists/adoption.html'
     context_object_name = 'adoptions'
     paginate_by = 10
@@ -672,8 +692,9 @@ class AdoptionRelicDelete(LoginRequiredMixin, DeleteView):
     def get_queryset(self):
         return AdoptionRelic.objects.filter(created_by=self.request.user)
 
-class AdoptionRelicList(ListView):
+class AdoptionRelicList(ReplicaReadMixin, ConditionalGetMixin, CursorPaginationMixin, ListView):
     model = AdoptionRelic
+    watermark_models = [AdoptionRelic, Adoption, Relic, Client, User]
     template_name = 'records/lists/adoptionrelic.html'
     context_object_name = 'object_list'
     paginate_by = 10  # Paginação de 10 itens por página
@@ -691,38 +712,60 @@ class AdoptionRelicList(ListView):
         return AdoptionRelic.objects.none()
 
 
-class ProfileView(LoginRequiredMixin, ListView):
+class ProfileView(LoginRequiredMixin, ReplicaReadMixin, ConditionalGetMixin, CursorPaginationMixin, ConcurrentQueriesMixin, ListView):
     model = Relic
+    watermark_models = [Relic, RelicImage, Client, Adoption, User, Address, City, State]
     template_name = 'records/profile.html'
     context_object_name = 'user_relics'
     paginate_by = 6
+    paginator_class = KnownCountPaginator
     
     def get_queryset(self):
-        return Relic.objects.select_related('client', 'created_by').prefetch_related('images').filter(created_by=self.request.user).order_by('-id')
+        return Relic.objects.select_related('client', 'created_by').filter(created_by=self.request.user).order_by('-id')
     
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        
+    def prepare_queries(self):
+        self.object_list = self.get_queryset()
+    
+    def get_concurrent_queries(self):
+        # Consultas independentes: executadas juntas no AsyncProfileView
+        user = self.request.user
+        return {
+            'stats': partial(get_user_stats, user),
+            'page': self.get_page_rows,
+            'client_profile': partial(self.get_client_profile, user),
+            # Adoções do usuário com select_related otimizado (apenas as 5 mais recentes)
+            'user_adoptions': lambda: Adoption.objects.select_related(
+                'new_owner',
+                'previous_owner',
+                'relic__client',
+                'created_by'
+            ).filter(created_by=user).order_by('-adoption_date')[:5],
+        }
+    
+    def get_client_profile(self, user):
         # Tentar obter o perfil do cliente com select_related otimizado
         try:
-            client_profile = getattr(self.request.user, 'client_profile', None)
+            client_profile = getattr(user, 'client_profile', None)
             if not client_profile:
                 # Se não encontrar, procurar por clientes criados pelo usuário com otimização
-                client_profile = Client.objects.select_related('address__city__state').filter(created_by=self.request.user).first()
+                client_profile = Client.objects.select_related('address__city__state').filter(created_by=user).first()
         except:
             client_profile = None
-            
-        context['client_profile'] = client_profile
-        context['total_relics'] = self.get_queryset().count()
-        context['total_adoptions'] = Adoption.objects.filter(created_by=self.request.user).count()
+        return client_profile
+    
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        # Total vem dos contadores materializados em vez de outro COUNT(*)
+        kwargs['count'] = self.stats.relics
+        return super().get_paginator(queryset, per_page, orphans, allow_empty_first_page, **kwargs)
+    
+    def get_context_data(self, **kwargs):
+        self.stats = self.fetch('stats')
+        context = super().get_context_data(**kwargs)
         
-        # Adicionar adoções do usuário com select_related otimizado (limitadas para não sobrecarregar)
-        context['user_adoptions'] = Adoption.objects.select_related(
-            'new_owner', 
-            'previous_owner', 
-            'relic__client', 
-            'created_by'
-        ).filter(created_by=self.request.user).order_by('-adoption_date')[:5]  # Apenas 5 mais recentes
+        context['client_profile'] = self.fetch('client_profile')
+        context['total_relics'] = self.stats.relics
+        context['total_adoptions'] = self.stats.adoptions
+        context['user_adoptions'] = self.fetch('user_adoptions')
         
         # Informações de paginação para as relíquias
         if hasattr(context, 'is_paginated') and context['is_paginated']:
@@ -731,3 +774,109 @@ class ProfileView(LoginRequiredMixin, ListView):
             context['showing_count'] = context['total_relics']
         
         return context
+
+
+class AsyncProfileView(AsyncViewMixin, ProfileView):
+    """ProfileView para ASGI: contadores, página, perfil e adoções recentes buscados em paralelo"""
+
+
+class ExportView(LoginRequiredMixin, ReplicaReadMixin, View):
+    """
+    Exportação em streaming (records/exports.py) com os filtros da lista na
+    querystring, ex.: /records/export/relic.csv?adoption_fee=true
+    """
+
+    def get(self, request, kind, fmt):
+        if kind not in EXPORTS or fmt not in EXPORT_FORMATS:
+            raise Http404
+        try:
+            queryset = export_queryset(kind, request.GET, user=request.user)
+        except ValidationError as e:
+            return JsonResponse({'detail': 'Filtros inválidos.', 'errors': e.message_dict}, status=400)
+        # O corpo é gerado depois que a view retorna (e o roteamento da
+        # requisição termina): fixa agora o banco escolhido para a leitura
+        queryset = queryset.using(queryset.db)
+        response = StreamingHttpResponse(stream_export(kind, fmt, queryset), content_type=EXPORT_FORMATS[fmt])
+        filename = '{}-{}.{}'.format(kind, timezone.now().strftime('%Y%m%d-%H%M%S'), fmt)
+        response['Content-Disposition'] = 'attachment; filename="{}"'.format(filename)
+        response['Cache-Control'] = 'private, no-store'
+        return response
+
+
+class ApiView(ReplicaReadMixin, ConditionalGetMixin, View):
+    """
+    Base da API JSON v1 (records/api.py): exige sessão, responde erros em
+    JSON e usa ETag/304 com as marcas d'água dos modelos do recurso
+    """
+    http_method_names = ['get', 'head', 'options']
+
+    def get_watermark_models(self):
+        resource = API_RESOURCES.get(self.kwargs.get('resource'))
+        return resource['watermark_models'] if resource else []
+
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return self.render_json({'detail': 'Autenticação necessária.'}, status=401)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except ApiError as e:
+            data = {'detail': e.detail}
+            if e.errors:
+                data['errors'] = e.errors
+            return self.render_json(data, status=e.status)
+
+    def render_json(self, data, status=200):
+        return JsonResponse(data, status=status, json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')})
+
+
+class ApiListView(ApiView):
+    """
+    Lista paginada por cursor, ex.:
+    /api/v1/relics/?fields=id,name&adoption_fee=true&limit=100
+    """
+
+    def get(self, request, resource):
+        spec = get_resource(resource)
+        names = parse_fields(spec, request.GET.get('fields'))
+        limit = parse_limit(request.GET.get('limit'))
+        queryset = api_queryset(spec, request.GET, request.user)
+        results, next_cursor, previous_cursor = list_page(spec, queryset, names, request.GET.get('cursor'), limit)
+        return self.render_json({
+            'results': results,
+            'next': self.page_url(next_cursor),
+            'previous': self.page_url(previous_cursor),
+        })
+
+    def page_url(self, cursor):
+        if cursor is None:
+            return None
+        params = self.request.GET.copy()
+        params['cursor'] = cursor
+        return self.request.build_absolute_uri('{}?{}'.format(self.request.path, params.urlencode()))
+
+
+class ApiDetailView(ApiView):
+    """Um registro, ex.: /api/v1/relics/42/?fields=id,name,description"""
+
+    def get(self, request, resource, pk):
+        spec = get_resource(resource)
+        names = parse_fields(spec, request.GET.get('fields'))
+        return self.render_json(get_object(spec, api_queryset(spec, {}, request.user), names, pk))
+
+
+def metrics_view(request):
+    """
+    Métricas por view no formato do Prometheus (records/metrics.py).
+    Acesso: staff, token em METRICS_TOKEN (Authorization: Bearer ...) ou,
+    sem token configurado, requisições de INTERNAL_IPS.
+    """
+    token = settings.METRICS_TOKEN
+    authorization = request.headers.get('Authorization', '')
+    allowed = (
+        request.user.is_staff
+        or (token and constant_time_compare(authorization, 'Bearer {}'.format(token)))
+        or (not token and request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS)
+    )
+    if not allowed:
+        raise PermissionDenied
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,159 @@
+"""
+Marcas d'água por modelo e GET condicional (ETag/Last-Modified).
+
+Cada modelo exibido nas listas tem uma linha em Watermark com uma versão que
+os sinais (records/signals.py) incrementam após o commit de qualquer
+alteração, inclusive exclusões. Uma página é identificada pelas versões dos
+modelos que ela exibe, pelo usuário e pela URL completa: se nada mudou, o
+ConditionalGetMixin responde 304 Not Modified sem executar a view.
+
+As marcas d'água também ficam no cache (TTL curto), então conferir a versão
+de uma página normalmente não consulta o banco.
+"""
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import condition
+
+from .models import Address, Adoption, AdoptionRelic, City, Client, Relic, RelicImage, State, Watermark
+
+# Modelos versionados pelos sinais de records/signals.py
+WATERMARKED_MODELS = [State, City, Address, Client, Relic, RelicImage, Adoption, AdoptionRelic, User]
+
+# Limita o tempo de uma versão antiga no cache se uma leitura concorrente
+# repovoar a entrada logo depois de um touch()
+WATERMARK_CACHE_TIMEOUT = 60
+
+
+def _cache_key(label):
+    return 'watermark:{}'.format(label)
+
+
+def model_label(model):
+    return model._meta.label_lower
+
+
+def touch(*models):
+    """Nova versão para os modelos (após alterações feitas sem sinais, ex.: update())"""
+    now = timezone.now()
+    for model in models:
+        label = model_label(model)
+        if Watermark.objects.filter(model=label).update(version=F('version') + 1, updated_at=now):
+            continue
+        try:
+            with transaction.atomic():
+                Watermark.objects.create(model=label, version=1, updated_at=now)
+        except IntegrityError:
+            # Criada por outra requisição ao mesmo tempo
+            Watermark.objects.filter(model=label).update(version=F('version') + 1, updated_at=now)
+    cache.delete_many([_cache_key(model_label(model)) for model in models])
+
+
+def get_watermarks(models):
+    """{label: (versão, updated_at)} dos modelos: do cache ou, para as ausentes, em uma única query"""
+    labels = [model_label(model) for model in models]
+    cached = cache.get_many([_cache_key(label) for label in labels])
+    watermarks = {label: cached[_cache_key(label)] for label in labels if _cache_key(label) in cached}
+
+    missing = [label for label in labels if label not in watermarks]
+    if missing:
+        rows = Watermark.objects.filter(model__in=missing).values_list('model', 'version', 'updated_at')
+        found = {label: (version, updated_at) for label, version, updated_at in rows}
+        # Modelo ainda sem alterações: versão 0 (também guardada, para não consultar de novo)
+        found.update({label: (0, None) for label in missing if label not in found})
+        cache.set_many({_cache_key(label): value for label, value in found.items()}, WATERMARK_CACHE_TIMEOUT)
+        watermarks.update(found)
+    return watermarks
+
+
+def models_for_view(view_class):
+    """Modelos cujas marcas d'água identificam as páginas da view"""
+    return getattr(view_class, 'watermark_models', None) or (
+        [view_class.model] if getattr(view_class, 'model', None) else []
+    )
+
+
+class ConditionalGetMixin:
+    """
+    ETag e Last-Modified para views de leitura, a partir das marcas d'água.
+    `watermark_models` lista os modelos exibidos na página (default: `model`).
+    Deve vir depois do LoginRequiredMixin para o redirecionamento acontecer antes.
+    """
+    watermark_models = None
+
+    def get_watermark_models(self):
+        return models_for_view(type(self))
+
+    def _page_watermarks(self):
+        # Calculado uma vez por requisição (o decorator pede ETag e Last-Modified)
+        if not hasattr(self, '_watermarks'):
+            self._watermarks = get_watermarks(self.get_watermark_models())
+        return self._watermarks
+
+    def _is_conditional(self, request):
+        # Mensagens pendentes são exibidas uma única vez: a página precisa ser renderizada
+        storage = getattr(request, '_messages', None)
+        return not (storage is not None and len(storage))
+
+    def get_etag(self, request):
+        if not self._is_conditional(request):
+            return None
+        watermarks = self._page_watermarks()
+        versions = ['{}={}'.format(model_label(model), watermarks.get(model_label(model), (0,))[0])
+                    for model in self.get_watermark_models()]
+        user = request.user
+        raw = '|'.join([
+            request.get_full_path(),
+            str(user.pk or 'anon'),
+            # Outro login do mesmo usuário (nova sessão/token CSRF) gera outra página
+            user.last_login.isoformat() if getattr(user, 'last_login', None) else '',
+        ] + versions)
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def get_last_modified(self, request):
+        if not self._is_conditional(request):
+            return None
+        dates = [updated_at for version, updated_at in self._page_watermarks().values() if updated_at]
+        last_login = getattr(request.user, 'last_login', None)
+        if last_login:
+            dates.append(last_login)
+        return max(dates) if dates else None
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+        if self.view_is_async:
+            return self._async_dispatch(request, *args, **kwargs)
+        view = condition(
+            etag_func=lambda request, *args, **kwargs: self.get_etag(request),
+            last_modified_func=lambda request, *args, **kwargs: self.get_last_modified(request),
+        )(super().dispatch)
+        response = view(request, *args, **kwargs)
+        # A página varia com a sessão: caches compartilhados não podem reaproveitá-la
+        response.headers.setdefault('Cache-Control', 'private, no-cache')
+        return response
+
+    async def _async_dispatch(self, request, *args, **kwargs):
+        # O decorator condition() do Django 4.2 não aceita views assíncronas:
+        # mesma lógica, com as marcas d'água lidas em uma thread
+        etag, last_modified = await sync_to_async(
+            lambda: (self.get_etag(request), self.get_last_modified(request))
+        )()
+        etag = quote_etag(etag) if etag is not None else None
+        last_modified = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = await super().dispatch(request, *args, **kwargs)
+            if last_modified and not response.has_header('Last-Modified'):
+                response.headers['Last-Modified'] = http_date(last_modified)
+            if etag:
+                response.headers.setdefault('ETag', etag)
+        response.headers.setdefault('Cache-Control', 'private, no-cache')
+        return response
@@ -0,0 +1,25 @@
+"""
+Funções executadas nos processos filhos do comando `run_workers`.
+
+Os processos são iniciados com "spawn" (sem herdar conexões abertas do pai),
+então este módulo não pode importar modelos no topo: o Django só é
+configurado em `init_worker`.
+"""
+import os
+
+
+def init_worker(settings_module):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def run_job(job_id):
+    from django.db import close_old_connections
+    from records.tasks import execute
+
+    close_old_connections()
+    try:
+        return job_id, execute(job_id)
+    finally:
+        close_old_connections()